@@ -0,0 +1,204 @@
+import hashlib
+import json
+import time
+from typing import Any, Dict, List, Optional
+import numpy as np
+from fastapi import Response
+from sqlalchemy.orm import Session
+from .config import settings
+from .embedding_cache import EmbeddingCache
+from .models import AnswerCacheEntry
+
+
+class AnswerCache:
+    """Per-user cache of generated answers, stored in the answer_cache table.
+
+    Entries are keyed by normalized question, model name and the ids of the chunks that
+    were put in the prompt, expire after ANSWER_CACHE_TTL seconds, and are dropped for a
+    user whenever one of their documents is (re-)ingested. With ANSWER_CACHE_SEMANTIC the
+    question embedding is also stored, so a near-duplicate question can be answered
+    before retrieval runs.
+    """
+
+    def __init__(self, enabled: bool, ttl: int, semantic: bool, similarity: float, scan_limit: int):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.semantic = enabled and semantic
+        self.similarity = similarity
+        self.scan_limit = scan_limit
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(question: str) -> str:
+        return EmbeddingCache.normalize(question).casefold().rstrip(" ?.!")
+
+    def _question_hash(self, question: str) -> str:
+        return hashlib.sha256(self.normalize(question).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def chunk_key(chunk_ids: List[int]) -> str:
+        if not chunk_ids:
+            return ""
+        return hashlib.sha256(",".join(str(i) for i in chunk_ids).encode("utf-8")).hexdigest()
+
+    def get(self, db: Session, user_id: int, scope: str, model: str, question: str, chunk_ids: Optional[List[int]] = None) -> Optional[AnswerCacheEntry]:
+        """Exact lookup on (user, scope, model, question, chunk ids)"""
+        if not self.enabled:
+            return None
+        entry = (
+            db.query(AnswerCacheEntry)
+            .filter(
+                AnswerCacheEntry.user_id == user_id,
+                AnswerCacheEntry.scope == scope,
+                AnswerCacheEntry.model == model,
+                AnswerCacheEntry.question_hash == self._question_hash(question),
+                AnswerCacheEntry.chunk_key == self.chunk_key(chunk_ids or []),
+                AnswerCacheEntry.expires_at > time.time(),
+            )
+            .order_by(AnswerCacheEntry.id.desc())
+            .first()
+        )
+        return self._record(db, entry, semantic=False)
+
+    def find_similar(self, db: Session, user_id: int, scope: str, model: str, question: str, question_vec: List[float]) -> Optional[AnswerCacheEntry]:
+        """Most similar cached question of this user, if its cosine similarity clears ANSWER_CACHE_SIMILARITY.
+
+        Misses are not counted here; callers fall through to get(), which counts them.
+        """
+        if not self.semantic or question_vec is None:
+            return None
+        candidates = (
+            db.query(AnswerCacheEntry)
+            .filter(
+                AnswerCacheEntry.user_id == user_id,
+                AnswerCacheEntry.scope == scope,
+                AnswerCacheEntry.model == model,
+                AnswerCacheEntry.question_embedding.isnot(None),
+                AnswerCacheEntry.expires_at > time.time(),
+            )
+            .order_by(AnswerCacheEntry.id.desc())
+            .limit(self.scan_limit)
+            .all()
+        )
+        if not candidates:
+            return None
+        query = np.asarray(question_vec, dtype=np.float32)
+        matrix = np.stack([np.frombuffer(c.question_embedding, dtype=np.float32) for c in candidates])
+        if matrix.shape[1] != query.shape[0]:
+            return None
+        norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query) or 1.0)
+        sims = (matrix @ query) / np.where(norms == 0, 1.0, norms)
+        best = int(np.argmax(sims))
+        if sims[best] < self.similarity:
+            return None
+        entry = candidates[best]
+        return self._record(db, entry, semantic=entry.question_hash != self._question_hash(question))
+
+    def _record(self, db: Session, entry: Optional[AnswerCacheEntry], semantic: bool) -> Optional[AnswerCacheEntry]:
+        if entry is None:
+            self.misses += 1
+            return None
+        if semantic:
+            self.semantic_hits += 1
+        else:
+            self.hits += 1
+        entry.hit_count = (entry.hit_count or 0) + 1
+        db.commit()
+        return entry
+
+    def put(
+        self,
+        db: Session,
+        user_id: int,
+        scope: str,
+        model: str,
+        question: str,
+        answer: str,
+        confidence: str,
+        sources: List[Dict[str, Any]],
+        chunk_ids: Optional[List[int]] = None,
+        question_vec: Optional[List[float]] = None,
+    ) -> Optional[AnswerCacheEntry]:
+        if not self.enabled:
+            return None
+        now = time.time()
+        try:
+            # Expired rows of this user are cleaned up as new ones arrive
+            db.query(AnswerCacheEntry).filter(
+                AnswerCacheEntry.user_id == user_id,
+                AnswerCacheEntry.expires_at <= now,
+            ).delete(synchronize_session=False)
+            entry = AnswerCacheEntry(
+                user_id=user_id,
+                scope=scope,
+                model=model,
+                question=self.normalize(question),
+                question_hash=self._question_hash(question),
+                chunk_key=self.chunk_key(chunk_ids or []),
+                question_embedding=(
+                    np.asarray(question_vec, dtype=np.float32).tobytes()
+                    if self.semantic and question_vec is not None else None
+                ),
+                answer=answer,
+                confidence=confidence,
+                sources=json.dumps(sources),
+                hit_count=0,
+                expires_at=now + self.ttl,
+            )
+            db.add(entry)
+            db.commit()
+            return entry
+        except Exception as e:
+            db.rollback()
+            print(f"Error storing cached answer: {e}")
+            return None
+
+    def invalidate_user(self, db: Session, user_id: int, scope: str = "rag"):
+        """Drop a user's cached answers; called in the ingestion transaction, so no commit here"""
+        if self.enabled:
+            db.query(AnswerCacheEntry).filter(
+                AnswerCacheEntry.user_id == user_id,
+                AnswerCacheEntry.scope == scope,
+            ).delete(synchronize_session=False)
+
+    def status_for(self, entry: Optional[AnswerCacheEntry], question: str) -> str:
+        """X-Cache value: HIT for the same question, HIT-SEMANTIC for a near-duplicate, else MISS"""
+        if entry is None:
+            return "MISS"
+        return "HIT" if entry.question_hash == self._question_hash(question) else "HIT-SEMANTIC"
+
+    def headers(self, entry: Optional[AnswerCacheEntry], status: str) -> Dict[str, str]:
+        """X-Cache plus private Cache-Control/Age derived from the entry's remaining TTL"""
+        if entry is None:
+            return {"X-Cache": status, "Cache-Control": "no-store"}
+        now = time.time()
+        headers = {"X-Cache": status, "Cache-Control": f"private, max-age={max(0, int(entry.expires_at - now))}"}
+        if status != "MISS":
+            headers["Age"] = str(max(0, int(now - (entry.expires_at - self.ttl))))
+        return headers
+
+    def set_headers(self, response: Response, entry: Optional[AnswerCacheEntry], status: str):
+        response.headers.update(self.headers(entry, status))
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.semantic_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "semantic": self.semantic,
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.semantic_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Global instance
+answer_cache = AnswerCache(
+    settings.ANSWER_CACHE_ENABLED,
+    settings.ANSWER_CACHE_TTL,
+    settings.ANSWER_CACHE_SEMANTIC,
+    settings.ANSWER_CACHE_SIMILARITY,
+    settings.ANSWER_CACHE_SEMANTIC_SCAN,
+)
@@ -0,0 +1,189 @@
+"""In-process inverted index with BM25 scoring.
+
+Each term has a postings list of (document number, term frequency) held in two
+compact arrays, appended to as documents arrive, so postings stay sorted by document
+number. A query only touches the postings of its own terms; their BM25 contributions
+are scored per term with numpy and summed per document, and the top k are selected
+without sorting the whole candidate set.
+
+Given a path, the postings are saved as flat arrays, so a restart loads them instead
+of tokenizing every stored entry again.
+"""
+import heapq
+import json
+import math
+import os
+import re
+import threading
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+_TOKEN_RE = re.compile(r"\w+")
+
+STOP_WORDS = frozenset({
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by',
+    'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did',
+    'will', 'would', 'could', 'should', 'may', 'might', 'can', 'this', 'that', 'these', 'those'
+})
+
+# Below this many candidate documents a heap over Python tuples beats numpy selection
+HEAP_SELECT_LIMIT = 2048
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOP_WORDS]
+
+
+class BM25Index:
+    """Append-only BM25 index over documents numbered 0..n-1 in insertion order"""
+
+    def __init__(self, path: Optional[str] = None, k1: float = 1.2, b: float = 0.75):
+        self.path = path  # prefix for <path>.terms.json, <path>.postings.npz and <path>.meta.json
+        self.k1 = k1
+        self.b = b
+        self._term_ids: Dict[str, int] = {}
+        self._doc_ids: List[array] = []  # per term: document numbers, ascending
+        self._freqs: List[array] = []  # per term: term frequency in that document
+        self._lengths = array("I")  # tokens per document
+        self._total_length = 0
+        self._norm: Optional[np.ndarray] = None  # per-document length normalization, rebuilt after adds
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def add(self, text: str) -> int:
+        """Index one document and return its number"""
+        counts = Counter(tokenize(text))
+        with self._lock:
+            doc = len(self._lengths)
+            for term, tf in counts.items():
+                term_id = self._term_ids.get(term)
+                if term_id is None:
+                    term_id = self._term_ids[term] = len(self._doc_ids)
+                    self._doc_ids.append(array("i"))
+                    self._freqs.append(array("I"))
+                self._doc_ids[term_id].append(doc)
+                self._freqs[term_id].append(tf)
+            length = sum(counts.values())
+            self._lengths.append(length)
+            self._total_length += length
+            self._norm = None
+            return doc
+
+    def add_many(self, texts: Iterable[str]) -> List[int]:
+        return [self.add(text) for text in texts]
+
+    def search(self, query: str, k: int = 10, min_score: float = 0.0) -> List[Tuple[int, float]]:
+        """Top k (document number, BM25 score) pairs, best first"""
+        terms = set(tokenize(query))
+        with self._lock:
+            n = len(self._lengths)
+            if not terms or n == 0 or k <= 0:
+                return []
+            if self._norm is None:
+                lengths = np.frombuffer(self._lengths, dtype=np.uint32).astype(np.float32)
+                avg_length = self._total_length / n or 1.0
+                self._norm = self.k1 * (1 - self.b + self.b * lengths / avg_length)
+            norm = self._norm
+
+            ids_parts, score_parts = [], []
+            for term in terms:
+                term_id = self._term_ids.get(term)
+                if term_id is None:
+                    continue
+                ids = np.frombuffer(self._doc_ids[term_id], dtype=np.int32).copy()
+                tf = np.frombuffer(self._freqs[term_id], dtype=np.uint32).astype(np.float32)
+                df = len(ids)
+                idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+                ids_parts.append(ids)
+                score_parts.append(idf * tf * (self.k1 + 1) / (tf + norm[ids]))
+        if not ids_parts:
+            return []
+
+        ids = np.concatenate(ids_parts)
+        contributions = np.concatenate(score_parts)
+        if len(ids_parts) == 1:
+            candidates, scores = ids, contributions
+        else:
+            candidates, inverse = np.unique(ids, return_inverse=True)
+            scores = np.bincount(inverse, weights=contributions)
+        if min_score > 0:
+            keep = scores > min_score
+            candidates, scores = candidates[keep], scores[keep]
+
+        if len(candidates) <= HEAP_SELECT_LIMIT:
+            top = heapq.nlargest(k, zip(scores.tolist(), candidates.tolist()))
+            return [(doc, score) for score, doc in top]
+        # Large candidate sets: partial selection in numpy, then order just the k winners
+        k = min(k, len(candidates))
+        part = np.argpartition(-scores, k - 1)[:k]
+        part = part[np.argsort(-scores[part], kind="stable")]
+        return [(int(candidates[i]), float(scores[i])) for i in part]
+
+    def search_batch(self, queries: List[str], k: int = 10, min_score: float = 0.0) -> List[List[Tuple[int, float]]]:
+        return [self.search(query, k, min_score) for query in queries]
+
+    def save(self, generation: int = 0):
+        """Persist the postings, stamped with the generation of the entry store they were
+        built from. The stamp is written last, so a save cut short is never loaded."""
+        if not self.path:
+            return
+        with self._lock:
+            terms = sorted(self._term_ids, key=self._term_ids.get)
+            starts = np.zeros(len(self._doc_ids) + 1, dtype=np.int64)
+            np.cumsum([len(p) for p in self._doc_ids], out=starts[1:])
+            doc_ids = np.concatenate([np.frombuffer(p, dtype=np.int32) for p in self._doc_ids]) if self._doc_ids else np.zeros(0, dtype=np.int32)
+            freqs = np.concatenate([np.frombuffer(p, dtype=np.uint32) for p in self._freqs]) if self._freqs else np.zeros(0, dtype=np.uint32)
+            lengths = np.frombuffer(self._lengths, dtype=np.uint32).copy()
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            if os.path.exists(f"{self.path}.meta.json"):
+                os.remove(f"{self.path}.meta.json")
+            with open(f"{self.path}.postings.npz", "wb") as f:
+                np.savez(f, starts=starts, doc_ids=doc_ids, freqs=freqs, lengths=lengths)
+            with open(f"{self.path}.terms.json", "w", encoding="utf-8") as f:
+                json.dump(terms, f)
+            with open(f"{self.path}.meta.json", "w", encoding="utf-8") as f:
+                json.dump({"documents": len(lengths), "generation": generation}, f)
+        except Exception as e:
+            print(f"Error saving BM25 index: {e}")
+
+    def load(self, max_rows: int, generation: int = 0) -> int:
+        """Load the saved postings; returns the documents they cover, 0 if there are none,
+        they were saved for another store generation or they cover more than max_rows"""
+        paths = [f"{self.path}.{ext}" for ext in ("meta.json", "terms.json", "postings.npz")] if self.path else []
+        if not paths or not all(os.path.exists(p) for p in paths):
+            return 0
+        try:
+            with open(f"{self.path}.meta.json", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(f"{self.path}.terms.json", encoding="utf-8") as f:
+                terms = json.load(f)
+            with np.load(f"{self.path}.postings.npz") as saved:
+                starts, doc_ids, freqs, lengths = (saved[k] for k in ("starts", "doc_ids", "freqs", "lengths"))
+        except Exception as e:
+            print(f"Error loading BM25 index: {e}")
+            return 0
+        n = len(lengths)
+        if meta.get("generation") != generation or meta.get("documents") != n or n > max_rows or len(starts) != len(terms) + 1:
+            return 0
+        with self._lock:
+            self._term_ids = {term: i for i, term in enumerate(terms)}
+            self._doc_ids = [array("i", doc_ids[s:e].tobytes()) for s, e in zip(starts[:-1], starts[1:])]
+            self._freqs = [array("I", freqs[s:e].tobytes()) for s, e in zip(starts[:-1], starts[1:])]
+            self._lengths = array("I", lengths.astype(np.uint32).tobytes())
+            self._total_length = int(lengths.sum())
+            self._norm = None
+        return n
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        n = len(self._lengths)
+        return {
+            "documents": n,
+            "terms": len(self._term_ids),
+            "postings": sum(len(p) for p in self._doc_ids),
+            "avg_length": round(self._total_length / n, 1) if n else None,
+        }
@@ -1,14 +1,17 @@
 import json
 import time
-from typing import List, Optional, Dict, Any
+from typing import Iterator, List, Optional, Dict, Any
 from sqlalchemy.orm import Session
-from sqlalchemy import text as sqltext
+from sqlalchemy import func, text as sqltext
+from .database import SessionLocal
 from .models import ChatSession, ChatMessage, User, Document, Chunk
 from .schemas import (
     ChatSessionResponse, ChatMessageResponse, ChatSessionDetailResponse,
     CreateChatSessionRequest, SendMessageRequest, SendMessageResponse
 )
-from .rag import embed_query, pgvector_search, answer_with_citations
+from .retrieval import hybrid_search
+from .reranker import reranker
+from .streaming import sse_event, stream_text
 from .legal_database import LegalDatabaseService
 from .indian_legal_database import IndianLegalDatabaseService
 from .document_analyzer import DocumentAnalyzer
@@ -176,8 +179,125 @@ class ChatService:
             db.rollback()
             return None
 
+    def stream_message(self, db: Session, user_id: int, request: SendMessageRequest) -> Optional[Iterator[str]]:
+        """Send a message and stream the AI response as Server-Sent Events.
+
+        Context is gathered before the stream starts, so the 'metadata' event comes first;
+        'token' events follow as Gemini generates, and the assembled reply is saved as a
+        ChatMessage when the stream ends (what was generated so far, if the client leaves).
+        """
+        session = db.query(ChatSession).filter(
+            ChatSession.id == request.session_id,
+            ChatSession.user_id == user_id,
+            ChatSession.is_active == True
+        ).first()
+        if not session:
+            return None
+
+        user_message = ChatMessage(
+            session_id=session.id,
+            role="user",
+            content=request.message,
+            message_type=request.message_type
+        )
+        db.add(user_message)
+        db.commit()
+        db.refresh(user_message)
+
+        session_id = session.id
+        user_message_id = user_message.id
+        ai_response = self._prepare_ai_response(db, user_id, request.message, session_id)
+        prompt = ai_response.pop("prompt", None)
+        message_type = ai_response["message_type"]
+        metadata = ai_response.get("metadata", {})
+
+        def events():
+            yield sse_event("metadata", {
+                "user_message_id": user_message_id,
+                "message_type": message_type,
+                "metadata": metadata,
+            })
+            if prompt is None:
+                content = ai_response["content"]
+                yield sse_event("token", {"text": content})
+                error = None
+            else:
+                parts = []
+                error = None
+                try:
+                    for piece in stream_text(self.model, prompt):
+                        parts.append(piece)
+                        yield sse_event("token", {"text": piece})
+                except GeneratorExit:
+                    # Client went away: keep the partial reply in the history
+                    if parts:
+                        self._save_assistant_message(session_id, "".join(parts), message_type, {**metadata, "truncated": True})
+                    raise
+                except Exception as e:
+                    print(f"Error streaming AI response: {e}")
+                    error = str(e)
+                    yield sse_event("error", {"detail": f"I encountered an error while processing your request: {error}"})
+                content = "".join(parts) or f"I encountered an error while processing your request: {error}"
+
+            saved = self._save_assistant_message(
+                session_id, content, message_type, {**metadata, "error": error} if error else metadata
+            )
+            if saved is None:
+                yield sse_event("error", {"detail": "Could not save the assistant message"})
+                return
+            yield sse_event("done", {"message": saved.model_dump()})
+
+        return events()
+
+    def _save_assistant_message(self, session_id: int, content: str, message_type: str, metadata: Dict[str, Any]) -> Optional[ChatMessageResponse]:
+        """Persist a streamed reply with its own session (the request's session is closed by now)"""
+        db = SessionLocal()
+        try:
+            ai_message = ChatMessage(
+                session_id=session_id,
+                role="assistant",
+                content=content,
+                message_type=message_type,
+                message_metadata=json.dumps(metadata)
+            )
+            db.add(ai_message)
+            db.query(ChatSession).filter(ChatSession.id == session_id).update(
+                {ChatSession.updated_at: func.now()}, synchronize_session=False
+            )
+            db.commit()
+            db.refresh(ai_message)
+            return ChatMessageResponse(
+                id=ai_message.id,
+                role=ai_message.role,
+                content=ai_message.content,
+                message_type=ai_message.message_type,
+                message_metadata=ai_message.message_metadata,
+                created_at=ai_message.created_at.isoformat()
+            )
+        except Exception as e:
+            print(f"Error saving streamed message: {e}")
+            db.rollback()
+            return None
+        finally:
+            db.close()
+
     def _generate_ai_response(self, db: Session, user_id: int, message: str, session_id: int) -> Dict[str, Any]:
         """Generate AI response based on message type and context"""
+        ai_response = self._prepare_ai_response(db, user_id, message, session_id)
+        prompt = ai_response.pop("prompt", None)
+        if prompt is None:
+            return ai_response
+        try:
+            response = self.model.generate_content(prompt)
+            ai_response["content"] = response.text if hasattr(response, 'text') else str(response)
+        except Exception as e:
+            print(f"Error generating AI response: {e}")
+            ai_response["content"] = f"I encountered an error while processing your request: {str(e)}"
+            ai_response["metadata"] = {**ai_response.get("metadata", {}), "error": str(e)}
+        return ai_response
+
+    def _prepare_ai_response(self, db: Session, user_id: int, message: str, session_id: int) -> Dict[str, Any]:
+        """Gather context for a reply: the result holds either a prompt still to be sent to Gemini or finished content"""
         try:
             # Determine if this is a legal research query
             legal_keywords = [
@@ -188,9 +308,9 @@ class ChatService:
             is_legal_research = any(keyword in message.lower() for keyword in legal_keywords)
             
             if is_legal_research:
-                return self._generate_legal_research_response(db, user_id, message)
+                return self._prepare_legal_research_response(db, user_id, message)
             else:
-                return self._generate_hybrid_response(db, user_id, message, session_id)
+                return self._prepare_hybrid_response(db, user_id, message, session_id)
         
         except Exception as e:
             print(f"Error generating AI response: {e}")
@@ -200,8 +320,8 @@ class ChatService:
                 "metadata": {"error": str(e)}
             }
 
-    def _generate_legal_research_response(self, db: Session, user_id: int, message: str) -> Dict[str, Any]:
-        """Generate response for legal research queries"""
+    def _prepare_legal_research_response(self, db: Session, user_id: int, message: str) -> Dict[str, Any]:
+        """Build the prompt for legal research queries"""
         try:
             # Check if this is a specific case search query
             case_search_patterns = [
@@ -282,11 +402,8 @@ class ChatService:
                 Format your response in a clear, professional manner suitable for legal research.
                 """
             
-            response = self.model.generate_content(prompt)
-            content = response.text if hasattr(response, 'text') else str(response)
-            
             return {
-                "content": content,
+                "prompt": prompt,
                 "message_type": "legal_research",
                 "metadata": {
                     "cases_found": len(all_cases),
@@ -305,14 +422,14 @@ class ChatService:
                 "metadata": {"error": str(e)}
             }
 
-    def _generate_hybrid_response(self, db: Session, user_id: int, message: str, session_id: int) -> Dict[str, Any]:
-        """Generate hybrid response using both documents and legal databases"""
+    def _prepare_hybrid_response(self, db: Session, user_id: int, message: str, session_id: int) -> Dict[str, Any]:
+        """Build the hybrid prompt from both documents and legal databases"""
         try:
             # Search user's documents
             doc_results = []
             try:
-                qvec = embed_query(message)
-                hits = pgvector_search(db, qvec, top_k=3)
+                hits = hybrid_search(message, user_id, top_k=reranker.candidate_count(3))
+                hits = reranker.rerank(message, hits, 3)
                 doc_results = [(chunk.text, score) for chunk, score in hits]
             except Exception as e:
                 print(f"Error searching documents: {e}")
@@ -362,11 +479,8 @@ class ChatService:
             Be thorough but concise, and always remind the user that this is not a substitute for professional legal advice.
             """
             
-            response = self.model.generate_content(prompt)
-            content = response.text if hasattr(response, 'text') else str(response)
-            
             return {
-                "content": content,
+                "prompt": prompt,
                 "message_type": "hybrid",
                 "metadata": {
                     "documents_searched": len(doc_results),
@@ -0,0 +1,196 @@
+import re
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+# Bump whenever chunk boundaries change so stored chunks get re-ingested
+CHUNKER_VERSION = "1"
+
+# Start of a numbered clause, section/article heading or ALL-CAPS heading line
+_STRUCTURE_START_RE = re.compile(
+    r"[ \t]*(?:"
+    r"(?i:section|article|clause|schedule|part|chapter|annexure)\s+[0-9ivxlc]+[a-z]?\b"
+    r"|\d{1,3}(?:\.\d{1,3})*(?:[.)][ \t]+\S|[ \t]+[A-Z])"
+    r"|\((?:[a-z]{1,3}|\d{1,3})\)[ \t]+\S"
+    r"|[A-Z][A-Z0-9 ,&'\-]{3,80}[ \t]*(?:\n|$)"
+    r")"
+)
+
+# Candidate boundaries: blank lines, line breaks, and whitespace after sentence-ending punctuation
+_SPLIT_RE = re.compile(r"\n[ \t]*\n\s*|\n[ \t]*|(?<=[.!?])[ \t]+(?=[\"'(\[]?[A-Z0-9])")
+
+# Abbreviations that end with a period without ending the sentence ("Sec. 138", "State v. Rao")
+_ABBREVIATION_RE = re.compile(
+    r"(?i)\b(?:no|nos|sec|secs|s|ss|art|arts|cl|v|vs|mr|mrs|ms|dr|ltd|co|inc|viz|etc|para|paras|rs|hon'ble|e\.g|i\.e)\.$"
+)
+
+# A bare list marker such as "1." or "iv." is numbering, not a sentence
+_LIST_MARKER_RE = re.compile(r"[ \t]*(?:\d{1,3}(?:\.\d{1,3})*|[ivxlc]{1,6}|[a-z])\.", re.IGNORECASE)
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_WORD_RE = re.compile(r"\S+\s*")
+
+
+@dataclass
+class TextChunk:
+    text: str
+    offset: int  # character offset of the chunk in the joined document text
+    page: Optional[int]  # page the chunk starts on
+    tokens: int
+
+
+@dataclass
+class _Segment:
+    text: str
+    offset: int
+    page: Optional[int]
+    tokens: int
+    structural: bool
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate: words plus punctuation marks"""
+    return len(_TOKEN_RE.findall(text))
+
+
+def _segments(text: str, base: int, page: Optional[int], max_tokens: int) -> Iterator[_Segment]:
+    """Split text into sentence/clause segments in a single left-to-right pass"""
+    start = 0
+    structural = bool(_STRUCTURE_START_RE.match(text, 0))
+    for m in _SPLIT_RE.finditer(text):
+        end = m.end()
+        if m.group().startswith("\n"):
+            # A single line break only splits when the next line starts a clause or heading
+            next_structural = bool(_STRUCTURE_START_RE.match(text, end))
+            if "\n" not in m.group()[1:] and not next_structural:
+                continue
+        else:
+            next_structural = False
+            if _ABBREVIATION_RE.search(text, max(start, m.start() - 12), m.start()):
+                continue
+            if _LIST_MARKER_RE.fullmatch(text, start, m.start()):
+                continue
+        if end > start:
+            yield from _sized(text[start:end], base + start, page, structural, max_tokens)
+        start = end
+        structural = next_structural
+    if start < len(text):
+        yield from _sized(text[start:], base + start, page, structural, max_tokens)
+
+
+def _sized(text: str, offset: int, page: Optional[int], structural: bool, max_tokens: int) -> Iterator[_Segment]:
+    """Yield the segment as-is, or cut at word boundaries when it alone exceeds the budget"""
+    tokens = estimate_tokens(text)
+    if tokens <= max_tokens:
+        yield _Segment(text, offset, page, tokens, structural)
+        return
+    piece_start = 0
+    piece_tokens = 0
+    for w in _WORD_RE.finditer(text):
+        word_tokens = estimate_tokens(w.group())
+        if piece_tokens and piece_tokens + word_tokens > max_tokens:
+            yield _Segment(text[piece_start:w.start()], offset + piece_start, page, piece_tokens, structural)
+            structural = False
+            piece_start = w.start()
+            piece_tokens = 0
+        piece_tokens += word_tokens
+    if piece_start < len(text):
+        yield _Segment(text[piece_start:], offset + piece_start, page, piece_tokens, structural)
+
+
+def _join(segments: List[_Segment]) -> str:
+    parts = []
+    prev_end = None
+    for seg in segments:
+        if prev_end is not None and seg.offset > prev_end:
+            parts.append("\n\n")  # page separator between segments of different pages
+        parts.append(seg.text)
+        prev_end = seg.offset + len(seg.text)
+    return "".join(parts)
+
+
+def _iter_document_segments(pages: Iterable[Tuple[Optional[int], str]], max_tokens: int) -> Iterator[_Segment]:
+    """Segments for a stream of (page_number, text) pieces joined like ingest.join_pages.
+
+    Plain-text pieces (page None) are continuous, so the tail after their last line break
+    is carried into the next piece instead of being cut mid-sentence.
+    """
+    offset = 0
+    carry = ""
+    carry_offset = 0
+    first = True
+    for page_number, page_text in pages:
+        if page_number is None:
+            if not carry:
+                carry_offset = offset
+            text = carry + page_text
+            offset += len(page_text)
+            cut = text.rfind("\n") + 1
+            if cut == 0 and len(text) > 65536:
+                cut = text.rfind(" ") + 1
+            if cut:
+                yield from _segments(text[:cut], carry_offset, None, max_tokens)
+                carry, carry_offset = text[cut:], carry_offset + cut
+            else:
+                carry = text
+            first = False
+            continue
+        if carry:
+            yield from _segments(carry, carry_offset, None, max_tokens)
+            carry = ""
+        if not first:
+            offset += 2  # "\n\n" between pages
+        yield from _segments(page_text, offset, page_number, max_tokens)
+        offset += len(page_text)
+        first = False
+    if carry:
+        yield from _segments(carry, carry_offset, None, max_tokens)
+
+
+def iter_chunks(
+    pages: Iterable[Tuple[Optional[int], str]],
+    max_tokens: int = 350,
+    overlap_tokens: int = 40,
+) -> Iterator[TextChunk]:
+    """Pack sentence/clause segments into chunks of at most max_tokens.
+
+    Numbered clauses and headings start a new chunk once the current one is half full, and
+    up to overlap_tokens of trailing sentences are repeated at the start of the next chunk.
+    Runs in one pass over the input and holds at most one chunk's worth of segments.
+    """
+    current: List[_Segment] = []
+    current_tokens = 0
+    fresh = 0  # segments in current that were not carried over from the previous chunk
+
+    def emit() -> Optional[TextChunk]:
+        text = _join(current)
+        stripped = text.strip()
+        if not stripped:
+            return None
+        lead = len(text) - len(text.lstrip())
+        return TextChunk(stripped, current[0].offset + lead, current[0].page, current_tokens)
+
+    for seg in _iter_document_segments(pages, max_tokens):
+        clause_break = seg.structural and current_tokens >= max_tokens // 2
+        if current and fresh and (clause_break or current_tokens + seg.tokens > max_tokens):
+            chunk = emit()
+            if chunk:
+                yield chunk
+            carried: List[_Segment] = []
+            if not clause_break:
+                carried_tokens = 0
+                for prev in reversed(current[1:]):
+                    if carried_tokens + prev.tokens > min(overlap_tokens, max_tokens - seg.tokens):
+                        break
+                    carried.insert(0, prev)
+                    carried_tokens += prev.tokens
+            current = carried
+            current_tokens = sum(s.tokens for s in carried)
+            fresh = 0
+        current.append(seg)
+        current_tokens += seg.tokens
+        fresh += 1
+
+    if current and fresh:
+        chunk = emit()
+        if chunk:
+            yield chunk
@@ -29,6 +29,112 @@ class Settings(BaseSettings):
     OPEN_LAW_API_KEY: str | None = None
 
     STORAGE_DIR: str = "uploads"
+
+    # Embedding pipeline
+    EMBED_BATCH_SIZE: int = 32  # texts per embed_content call (API max is 100)
+    EMBED_CONCURRENCY: int = 4  # batches in flight at once
+    EMBED_MAX_RETRIES: int = 3
+    EMBED_RETRY_BACKOFF: float = 1.0  # seconds, doubled on each retry
+    CHUNK_MAX_TOKENS: int = 350  # token budget per chunk
+    CHUNK_OVERLAP_TOKENS: int = 40  # trailing sentences repeated in the next chunk
+    EMBED_CACHE_ENABLED: bool = True
+    EMBED_CACHE_PATH: str = "data/embedding_cache.db"
+    EMBED_CACHE_MAX_ENTRIES: int = 200000
+
+    # Ingestion job queue
+    INGEST_WORKERS: int = 1  # worker processes started with the API; 0 runs jobs as background tasks
+    INGEST_SPAWN_WORKERS: bool = True  # False when workers run separately (python -m app.ingestion_worker)
+    INGEST_WORKER_LOCK: str = "data/ingestion_workers.lock"  # only the API process holding it starts workers
+    INGEST_POLL_INTERVAL: float = 2.0  # seconds between queue polls when idle
+    INGEST_LEASE_SECONDS: int = 300  # a running job whose worker stops renewing this long is re-queued
+    INGEST_MAX_ATTEMPTS: int = 3  # claims per job before a job whose workers keep dying is failed
+    AUTO_INGEST_ON_UPLOAD: bool = True
+
+    # Embedding storage
+    EMBED_DIM: int = 768  # text-embedding-004 native size; smaller values use reduced output dimensionality. Changing it needs `python -m app.vector_index migrate`
+    EMBED_STORAGE: str = "vector"  # chunks.embedding column type: 'vector' (float32) or 'halfvec' (float16)
+    VECTOR_INDEX_QUANTIZATION: str = "none"  # ANN index over 'none' (column as stored), 'halfvec' or 'binary'
+    EMBED_RERANK_FACTOR: int = 4  # candidates per result re-ranked at full precision after a quantized index scan
+
+    # Vector search
+    VECTOR_INDEX_TYPE: str = "hnsw"  # 'hnsw', 'ivfflat' or 'none'
+    HNSW_M: int = 16
+    HNSW_EF_CONSTRUCTION: int = 64
+    HNSW_EF_SEARCH: int = 40  # default per query; raised to top_k when smaller
+    IVFFLAT_LISTS: int | None = None  # None = rows/1000 (sqrt(rows) above 1M rows)
+    IVFFLAT_PROBES: int = 10
+
+    # Hybrid retrieval
+    RETRIEVAL_MODE: str = "hybrid"  # 'hybrid', 'vector' or 'lexical'
+    HYBRID_CANDIDATES: int = 20  # hits taken from each leg before fusion
+    HYBRID_RRF_K: int = 60
+    HYBRID_VECTOR_TIMEOUT: float = 3.0  # seconds, including embedding the question
+    HYBRID_LEXICAL_TIMEOUT: float = 1.0
+
+    # Cross-encoder re-ranking (sentence-transformers, CPU)
+    RERANK_ENABLED: bool = False
+    RERANK_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANK_CANDIDATES: int = 20  # hits retrieved for the re-ranker to choose top_k from
+    RERANK_BATCH_SIZE: int = 32
+    RERANK_MAX_LENGTH: int = 512
+    RERANK_CACHE_SIZE: int = 10000
+
+    # Answer cache
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_TTL: int = 86400  # seconds
+    ANSWER_CACHE_SEMANTIC: bool = False  # also answer near-duplicate questions from the cache
+    ANSWER_CACHE_SIMILARITY: float = 0.96  # minimum cosine similarity for a near-duplicate
+    ANSWER_CACHE_SEMANTIC_SCAN: int = 500  # most recent entries per user compared
+
+    # Legal database providers
+    LEGAL_PROVIDER_TIMEOUT: float = 5.0  # seconds per provider request
+    LEGAL_PROVIDER_BUDGET: float = 8.0  # seconds per provider call including HTTP retries; a retry is only made if it fits
+    LEGAL_SEARCH_DEADLINE: float = 6.0  # seconds for a whole fan-out; slower providers are left out
+    PROVIDER_CACHE_ENABLED: bool = True
+    PROVIDER_CACHE_PATH: str = "data/provider_cache.db"
+    PROVIDER_CACHE_TTL: int = 21600  # seconds a response is fresh, unless overridden per provider
+    PROVIDER_CACHE_TTLS: dict[str, int] = {"canlii": 86400, "bailii": 86400}  # provider -> seconds
+    PROVIDER_CACHE_STALE_TTL: int = 86400  # seconds past the TTL a response is served while it is refreshed
+    PROVIDER_CACHE_MAX_ENTRIES: int = 50000
+    PROVIDER_RATE_LIMITS: dict[str, float] = {"indian_kanoon": 2.0, "scc_online": 2.0, "kanoon_dev": 2.0, "canlii": 2.0}  # requests/second
+    PROVIDER_RATE_LIMIT_DEFAULT: float = 5.0  # requests/second for providers not listed above
+    PROVIDER_RATE_BURST: int = 5  # requests allowed back to back before the rate applies
+    PROVIDER_BREAKER_THRESHOLD: int = 5  # consecutive failures that open a provider's circuit
+    PROVIDER_BREAKER_COOLDOWN: float = 30.0  # seconds a circuit stays open before a trial request
+
+    # Outbound HTTP (legal database APIs)
+    HTTP_POOL_HOSTS: int = 10  # hosts with a kept-alive connection pool
+    HTTP_POOL_PER_HOST: int = 10  # keep-alive connections per host
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0  # seconds an idle async connection is kept
+    HTTP_RETRIES: int = 2  # retries on connect errors, 429 and 5xx
+    HTTP_RETRY_BACKOFF: float = 0.3  # seconds, doubled per retry plus up to this much jitter
+    HTTP_RETRY_BACKOFF_MAX: float = 3.0  # cap on a single wait; a longer Retry-After is not retried
+
+    # Case/statute similarity search
+    SIMILARITY_BACKEND: str = "bm25"  # 'bm25' (inverted index) or 'tfidf' (sparse cosine similarity)
+    INDEX_STORE_MERGE_FACTOR: int = 4  # segments of a similar size merged into one
+    INDEX_STORE_MAX_SEGMENTS: int = 16  # past this many segments the smallest neighbours are merged too
+    INDEX_SAVE_EVERY: int = 500  # entries added between saves of an index and its key map
+    INDEX_COMPACT_DELETED_RATIO: float = 0.2  # compact in the background once this share of entries is deleted or replaced
+    INDEX_COMPACT_MIN_DELETED: int = 100  # ...and at least this many
+    SIMILARITY_SERVICE: str = "simple"  # 'simple' (BM25/TF-IDF text similarity) or 'faiss' (sentence embeddings)
+    FAISS_INDEX_TYPE: str = "hnsw"  # 'flat' (exact), 'hnsw' or 'ivfpq'
+    FAISS_HNSW_M: int = 32  # graph neighbours per vector
+    FAISS_HNSW_EF_CONSTRUCTION: int = 200
+    FAISS_HNSW_EF_SEARCH: int = 64  # default candidate list size per query; higher = better recall, slower
+    FAISS_IVF_NLIST: int = 1024  # upper bound on inverted lists; capped at training vectors / 39
+    FAISS_NPROBE: int = 16  # default lists scanned per query
+    FAISS_PQ_M: int = 48  # PQ sub-quantizers; must divide the embedding dimension (384)
+    FAISS_PQ_BITS: int = 8
+    FAISS_TRAIN_MIN: int = 10000  # vectors needed before an IVF-PQ index is trained; exact flat search until then
+    FAISS_TRAIN_SAMPLE: int = 50000  # vectors sampled to train IVF-PQ
+    FAISS_IVF_RETRAIN_GROWTH: float = 4.0  # retrain IVF-PQ in the background once it holds this many times the vectors its nlist was sized for
+
+    # OCR
+    OCR_WORKERS: int | None = None  # OCR processes per extraction; None = min(4, CPU count), 1 = no pool
+    OCR_PAGE_WINDOW: int | None = None  # pages rasterized at once; None = one per OCR worker
+    EXTRACTION_CACHE_DIR: str | None = None  # defaults to extraction_cache/ next to STORAGE_DIR
+
     APP_ENV: str = "dev"
 
     class Config:
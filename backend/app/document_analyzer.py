@@ -5,7 +5,7 @@ import google.generativeai as genai
 from .config import settings
 from .models import Document
 from .schemas import ClauseAnalysis, DocumentAnalysisResponse
-from .ingest import extract_text_from_pdf, extract_text_from_image
+from .ingest import extract_document_text
 
 
 class DocumentAnalyzer:
@@ -155,17 +155,12 @@ class DocumentAnalyzer:
             )
 
     def _extract_document_text(self, document: Document) -> str:
-        """Extract text from document based on file type"""
-        if document.path.lower().endswith('.pdf'):
-            return extract_text_from_pdf(document.path)
-        elif document.path.lower().endswith(('.png', '.jpg', '.jpeg')):
-            return extract_text_from_image(document.path)
-        else:
-            try:
-                with open(document.path, 'r', encoding='utf-8', errors='ignore') as f:
-                    return f.read()
-            except Exception:
-                return ""
+        """Extract text from document based on file type (shared extraction cache)"""
+        try:
+            return extract_document_text(document.path, document.content_type)
+        except Exception as e:
+            print(f"Error extracting text from document {document.id}: {e}")
+            return ""
 
     def _identify_clauses(self, text: str, focus_areas: Optional[List[str]] = None) -> List[Dict]:
         """Identify legal clauses in the document text"""
@@ -0,0 +1,138 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from typing import List, Optional, Dict, Any
+from .config import settings
+
+
+class EmbeddingCache:
+    """Persistent embedding cache keyed by (model name, normalized-text hash) with LRU eviction"""
+
+    def __init__(self, path: str, max_entries: int, enabled: bool = True):
+        self.path = path
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._size = 0
+
+        if not self.enabled:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " key TEXT PRIMARY KEY,"
+                " model TEXT NOT NULL,"
+                " vector BLOB NOT NULL,"
+                " last_used REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+            self._conn.commit()
+            self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        except Exception as e:
+            print(f"⚠️  Embedding cache disabled: {e}")
+            self._conn = None
+            self.enabled = False
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Normalize text so trivially different copies share a cache entry"""
+        return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+    def _key(self, model: str, text: str) -> str:
+        digest = hashlib.sha256(self.normalize(text).encode("utf-8")).hexdigest()
+        return f"{model}:{digest}"
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """Return cached vectors aligned with texts, None where the text is not cached"""
+        if not self.enabled or not texts:
+            self.misses += len(texts)
+            return [None] * len(texts)
+
+        keys = [self._key(model, t) for t in texts]
+        found: Dict[str, List[float]] = {}
+        unique_keys = list(dict.fromkeys(keys))
+        with self._lock:
+            for i in range(0, len(unique_keys), 500):
+                batch = unique_keys[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    vec = array("f")
+                    vec.frombytes(blob)
+                    found[key] = vec.tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+
+        results = [found.get(key) for key in keys]
+        hit_count = sum(1 for r in results if r is not None)
+        self.hits += hit_count
+        self.misses += len(results) - hit_count
+        return results
+
+    def put_many(self, model: str, texts: List[str], vectors: List[List[float]]):
+        """Store vectors for texts, evicting least recently used entries past max_entries"""
+        if not self.enabled or not texts:
+            return
+        now = time.time()
+        rows = [
+            (self._key(model, t), model, array("f", v).tobytes(), now)
+            for t, v in zip(texts, vectors)
+        ]
+        with self._lock:
+            try:
+                before = self._conn.total_changes
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO embeddings (key, model, vector, last_used) VALUES (?, ?, ?, ?)",
+                    rows
+                )
+                self._size += self._conn.total_changes - before
+                overflow = self._size - self.max_entries
+                if overflow > 0:
+                    self._conn.execute(
+                        "DELETE FROM embeddings WHERE key IN "
+                        "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                        (overflow,)
+                    )
+                    self._size -= overflow
+                self._conn.commit()
+            except Exception as e:
+                print(f"Error writing embedding cache: {e}")
+                self._conn.rollback()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for this process"""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": self._size,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Global instance
+embedding_cache = EmbeddingCache(
+    settings.EMBED_CACHE_PATH,
+    settings.EMBED_CACHE_MAX_ENTRIES,
+    enabled=settings.EMBED_CACHE_ENABLED,
+)
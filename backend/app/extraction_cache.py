@@ -0,0 +1,67 @@
+import gzip
+import json
+import os
+import tempfile
+from typing import List, Optional, Tuple, Dict, Any
+from .config import settings
+
+Pages = List[Tuple[Optional[int], str]]
+
+
+class ExtractionCache:
+    """On-disk cache of extracted document text keyed by file content hash and extractor version"""
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, content_hash: str, extractor_version: str) -> str:
+        return os.path.join(self.cache_dir, content_hash[:2], f"{content_hash}-v{extractor_version}.json.gz")
+
+    def get(self, content_hash: str, extractor_version: str) -> Optional[Pages]:
+        """Return the cached (page_number, text) list, or None on a miss"""
+        path = self._path(content_hash, extractor_version)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                pages = [(page, text) for page, text in json.load(f)["pages"]]
+            self.hits += 1
+            return pages
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Ignoring unreadable extraction cache entry {path}: {e}")
+        self.misses += 1
+        return None
+
+    def put(self, content_hash: str, extractor_version: str, pages: Pages):
+        """Store extracted pages; written to a temp file first so readers never see partial entries"""
+        path = self._path(content_hash, extractor_version)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as raw, gzip.open(raw, "wt", encoding="utf-8") as f:
+                json.dump({"extractor_version": extractor_version, "pages": pages}, f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Error writing extraction cache entry {path}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "cache_dir": self.cache_dir,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def _default_cache_dir() -> str:
+    # Kept next to STORAGE_DIR so it lives on the same volume as the uploads it describes
+    storage_parent = os.path.dirname(os.path.abspath(settings.STORAGE_DIR))
+    return os.path.join(storage_parent, "extraction_cache")
+
+
+# Global instance
+extraction_cache = ExtractionCache(settings.EXTRACTION_CACHE_DIR or _default_cache_dir())
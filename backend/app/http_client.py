@@ -0,0 +1,166 @@
+"""Shared, pooled HTTP clients for calls to external APIs.
+
+One requests.Session (for threads) and one httpx.AsyncClient (for the event loop) are
+reused by every provider call, so connections and TLS sessions are kept alive between
+searches instead of being set up per request. Both retry 429 and 5xx responses with
+jittered exponential backoff, honouring Retry-After up to HTTP_RETRY_BACKOFF_MAX; a
+response asking for a longer pause is handed back instead of holding the caller's
+thread or task that long. A call may also carry a budget covering all of its attempts;
+a retry is only made when it can still finish within it. Responses are requested with
+gzip/deflate and decoded transparently by both libraries.
+"""
+import asyncio
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import InvalidHeader, MaxRetryError, ResponseError
+from urllib3.util.retry import Retry
+from .config import settings
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+DEFAULT_HEADERS = {"Accept-Encoding": "gzip, deflate", "User-Agent": "LawGPT/0.1"}
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+_async_client: Optional[httpx.AsyncClient] = None
+_budget = threading.local()  # deadline and per-attempt timeout of the sync call in progress
+
+
+def _retry_after(response) -> Optional[float]:
+    """Seconds a response's Retry-After header (delay or HTTP date) asks for, None without one"""
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        return Retry().parse_retry_after(value)
+    except InvalidHeader:
+        return None
+
+
+def _retry_fits(deadline: Optional[float], wait: float, timeout: float) -> bool:
+    """Whether waiting and then one more attempt of up to timeout ends before the deadline"""
+    return deadline is None or time.monotonic() + wait + timeout <= deadline
+
+
+class _CappedRetry(Retry):
+    """Retry that gives up, rather than sleeping, when Retry-After exceeds HTTP_RETRY_BACKOFF_MAX
+    or when another attempt would overrun the budget of the call in progress"""
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        retry_after = _retry_after(response)
+        if retry_after is not None and retry_after > settings.HTTP_RETRY_BACKOFF_MAX:
+            # With raise_on_status=False the pool returns this response to the caller
+            raise MaxRetryError(_pool, url, ResponseError(f"Retry-After {retry_after:.0f}s exceeds the retry budget"))
+        retry = super().increment(method, url, response, error, _pool, _stacktrace)
+        wait = retry_after if retry_after is not None else retry.get_backoff_time()
+        if not _retry_fits(getattr(_budget, "deadline", None), wait, getattr(_budget, "timeout", 0.0)):
+            raise MaxRetryError(_pool, url, error or ResponseError("no time left for another attempt"))
+        return retry
+
+
+def _retry() -> Retry:
+    return _CappedRetry(
+        total=settings.HTTP_RETRIES,
+        connect=settings.HTTP_RETRIES,
+        read=0,  # a read timeout already used up the caller's budget
+        status=settings.HTTP_RETRIES,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        backoff_factor=settings.HTTP_RETRY_BACKOFF,
+        backoff_jitter=settings.HTTP_RETRY_BACKOFF,
+        backoff_max=settings.HTTP_RETRY_BACKOFF_MAX,
+        respect_retry_after_header=True,  # waits of at most backoff_max, see _CappedRetry
+        raise_on_status=False,  # hand the last response back; callers check status_code
+    )
+
+
+def get_session() -> requests.Session:
+    """Process-wide Session with HTTP_POOL_PER_HOST keep-alive connections per host"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=settings.HTTP_POOL_HOSTS,
+                    pool_maxsize=settings.HTTP_POOL_PER_HOST,
+                    pool_block=True,  # wait for a free connection rather than opening extra ones
+                    max_retries=_retry(),
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update(DEFAULT_HEADERS)
+                _session = session
+    return _session
+
+
+def get(url: str, params: Optional[Dict[str, Any]] = None, timeout: float = 10.0, budget: Optional[float] = None) -> requests.Response:
+    """GET on the shared Session; timeout applies per attempt, budget to the whole call"""
+    _budget.deadline = None if budget is None else time.monotonic() + budget
+    _budget.timeout = timeout
+    try:
+        return get_session().get(url, params=params, timeout=timeout)
+    finally:
+        _budget.deadline = None
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Shared AsyncClient so concurrent provider calls reuse pooled connections"""
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(
+            headers=DEFAULT_HEADERS,
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_POOL_HOSTS * settings.HTTP_POOL_PER_HOST,
+                max_keepalive_connections=settings.HTTP_POOL_HOSTS * settings.HTTP_POOL_PER_HOST,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+            ),
+            # httpx retries only failed connects itself; status retries are done in get_async
+            transport=httpx.AsyncHTTPTransport(retries=settings.HTTP_RETRIES),
+        )
+    return _async_client
+
+
+def _backoff(attempt: int, response: Optional[httpx.Response] = None) -> float:
+    retry_after = _retry_after(response)
+    if retry_after is not None:
+        return retry_after
+    delay = settings.HTTP_RETRY_BACKOFF * (2 ** attempt)
+    return min(delay + random.uniform(0, settings.HTTP_RETRY_BACKOFF), settings.HTTP_RETRY_BACKOFF_MAX)
+
+
+async def get_async(url: str, params: Optional[Dict[str, Any]] = None, timeout: float = 10.0, budget: Optional[float] = None) -> httpx.Response:
+    """GET on the shared AsyncClient, retrying 429/5xx like the sync Session does"""
+    client = get_async_client()
+    deadline = None if budget is None else time.monotonic() + budget
+    attempt = 0
+    while True:
+        response = await client.get(url, params=params, timeout=timeout)
+        if response.status_code not in RETRY_STATUSES or attempt >= settings.HTTP_RETRIES:
+            return response
+        retry_after = _retry_after(response)
+        if retry_after is not None and retry_after > settings.HTTP_RETRY_BACKOFF_MAX:
+            return response
+        wait = _backoff(attempt, response)
+        if not _retry_fits(deadline, wait, timeout):
+            return response
+        await asyncio.sleep(wait)
+        attempt += 1
+
+
+def close_session():
+    global _session
+    if _session is not None:
+        _session.close()
+        _session = None
+
+
+async def close_async_client():
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
@@ -0,0 +1,291 @@
+"""Append-only, memory-mapped storage for similarity index entries.
+
+A store is a directory of immutable segments plus a manifest naming them in order.
+Each segment holds one appended batch:
+
+    <segment>.log   entries as JSON lines
+    <segment>.off   little-endian uint64 start offset of every entry in the .log
+    <segment>.vec   optional float32 rows of a fixed dimension, one per entry
+
+Deleting an entry appends its number to a tombstone file instead of rewriting a
+segment; deleted entries keep their number (and stay readable) until rewrite() copies
+the chosen entries into a fresh, renumbered segment. Each rewrite bumps the store's
+generation, which indexes saved over the store record so they can tell a renumbered
+store from the one they were built on.
+
+Appending writes a new segment, so its cost depends on the batch and not on the
+store size. Opening a store only maps the offset and vector files; an entry is decoded
+from its line when it is read. Segments are merged size-tiered: whenever the newest
+merge_factor segments are of a similar size (the same power of merge_factor) they
+are merged into one, so an entry is copied O(log n) times over the store's life
+rather than on every merge. Past max_segments, the smallest pair of neighbours is
+merged as well. Only neighbouring segments are merged, so entry numbers never change.
+The manifest is replaced atomically, so a crash mid-append or mid-merge leaves the
+previous state readable.
+"""
+import bisect
+import json
+import mmap
+import os
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+import numpy as np
+
+MANIFEST = "manifest.json"
+
+
+class _Segment:
+    def __init__(self, directory: str, name: str, dim: Optional[int]):
+        self.name = name
+        self.prefix = os.path.join(directory, name)
+        self.offsets = np.memmap(f"{self.prefix}.off", dtype="<u8", mode="r")
+        with open(f"{self.prefix}.log", "rb") as f:
+            self.log = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.vectors = None
+        if dim and os.path.exists(f"{self.prefix}.vec"):
+            self.vectors = np.memmap(f"{self.prefix}.vec", dtype="<f4", mode="r").reshape(-1, dim)
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def entry(self, i: int) -> Dict[str, Any]:
+        start = int(self.offsets[i])
+        end = int(self.offsets[i + 1]) if i + 1 < len(self.offsets) else len(self.log)
+        return json.loads(self.log[start:end])
+
+    def files(self) -> List[str]:
+        return [f"{self.prefix}.{ext}" for ext in ("log", "off", "vec") if os.path.exists(f"{self.prefix}.{ext}")]
+
+
+class IndexStore:
+    """Sequence-like store of entry dicts (and optional vectors), numbered in append order"""
+
+    def __init__(self, directory: str, dim: Optional[int] = None, max_segments: int = 16, merge_factor: int = 4):
+        self.directory = directory
+        self.dim = dim
+        self.max_segments = max_segments
+        self.merge_factor = max(2, merge_factor)
+        self._lock = threading.RLock()
+        self._segments: List[_Segment] = []
+        self._starts: List[int] = []  # first entry number of each segment
+        self._size = 0
+        self._next_id = 0
+        self._tombstones = None  # file name of the current tombstone log
+        self.generation = 0  # bumped by every rewrite(), which renumbers entries
+        self._deleted = set()
+        os.makedirs(directory, exist_ok=True)
+        self._open()
+
+    def _open(self):
+        path = os.path.join(self.directory, MANIFEST)
+        if not os.path.exists(path):
+            return
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        self._next_id = manifest.get("next_segment", 0)
+        self.generation = manifest.get("generation", 0)
+        self._segments = [_Segment(self.directory, name, self.dim) for name in manifest["segments"]]
+        self._reindex()
+        self._tombstones = manifest.get("tombstones")
+        if self._tombstones:
+            path = os.path.join(self.directory, self._tombstones)
+            with open(path, "rb") as f:
+                raw = f.read()
+            # A torn final write leaves a partial number, which is ignored
+            self._deleted = set(np.frombuffer(raw[:len(raw) - len(raw) % 8], dtype="<u8").tolist())
+
+    def _reindex(self):
+        self._starts = []
+        total = 0
+        for segment in self._segments:
+            self._starts.append(total)
+            total += len(segment)
+        self._size = total
+
+    def _write_manifest(self):
+        path = os.path.join(self.directory, MANIFEST)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "segments": [s.name for s in self._segments],
+                "next_segment": self._next_id,
+                "tombstones": self._tombstones,
+                "generation": self.generation,
+            }, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def _write_tombstones(self, numbers: Sequence[int]) -> str:
+        name = f"tombstones-{self._next_id:06d}.del"
+        self._next_id += 1
+        with open(os.path.join(self.directory, name), "wb") as f:
+            f.write(np.asarray(sorted(numbers), dtype="<u8").tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        return name
+
+    def _write_segment(self, entries: Sequence[Dict[str, Any]], vectors: Optional[np.ndarray]) -> _Segment:
+        name = f"segment-{self._next_id:06d}"
+        self._next_id += 1
+        prefix = os.path.join(self.directory, name)
+        offsets = np.zeros(len(entries), dtype="<u8")
+        with open(f"{prefix}.log", "wb") as f:
+            position = 0
+            for i, entry in enumerate(entries):
+                line = json.dumps(entry, default=str).encode("utf-8") + b"\n"
+                offsets[i] = position
+                f.write(line)
+                position += len(line)
+            f.flush()
+            os.fsync(f.fileno())
+        offsets.tofile(f"{prefix}.off")
+        if self.dim and vectors is not None:
+            np.ascontiguousarray(vectors, dtype="<f4").reshape(len(entries), self.dim).tofile(f"{prefix}.vec")
+        return _Segment(self.directory, name, self.dim)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def _locate(self, i: int):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        s = bisect.bisect_right(self._starts, i) - 1
+        return self._segments[s], i - self._starts[s]
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        with self._lock:
+            segment, j = self._locate(i)
+            return segment.entry(j)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return self.entries()
+
+    def entries(self, start: int = 0) -> Iterator[Dict[str, Any]]:
+        """Entries from number `start` on; a compaction meanwhile does not disturb the iteration"""
+        with self._lock:
+            segments = list(zip(self._starts, self._segments))
+        for first, segment in segments:
+            for j in range(max(0, start - first), len(segment)):
+                yield segment.entry(j)
+
+    @property
+    def deleted(self) -> int:
+        return len(self._deleted)
+
+    def is_deleted(self, i: int) -> bool:
+        return i in self._deleted
+
+    def delete(self, numbers: Sequence[int]):
+        """Tombstone entries by number"""
+        with self._lock:
+            numbers = [i for i in numbers if 0 <= i < len(self) and i not in self._deleted]
+            if not numbers:
+                return
+            if not self._tombstones:
+                self._tombstones = self._write_tombstones([])
+                self._write_manifest()
+            with open(os.path.join(self.directory, self._tombstones), "ab") as f:
+                f.write(np.asarray(numbers, dtype="<u8").tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            self._deleted.update(numbers)
+
+    def vector(self, i: int) -> Optional[np.ndarray]:
+        with self._lock:
+            segment, j = self._locate(i)
+            return None if segment.vectors is None else np.array(segment.vectors[j])
+
+    def vectors(self) -> Optional[np.ndarray]:
+        """All vectors in entry order (copied out of the mapped segments)"""
+        with self._lock:
+            return self._vectors_of(self._segments)
+
+    def _vectors_of(self, segments: List[_Segment]) -> Optional[np.ndarray]:
+        if not self.dim or not segments or any(s.vectors is None for s in segments):
+            return None
+        return np.concatenate([np.asarray(s.vectors) for s in segments])
+
+    def append(self, entries: Sequence[Dict[str, Any]], vectors: Optional[np.ndarray] = None) -> List[int]:
+        """Append a batch as one new segment; returns the new entry numbers"""
+        if not entries:
+            return []
+        with self._lock:
+            first = len(self)
+            self._segments.append(self._write_segment(entries, vectors))
+            self._write_manifest()
+            self._reindex()
+            self._merge_tiers()
+            return list(range(first, first + len(entries)))
+
+    def _tier(self, segment: _Segment) -> int:
+        tier, size = 0, len(segment)
+        while size >= self.merge_factor:
+            size //= self.merge_factor
+            tier += 1
+        return tier
+
+    def _merge_tiers(self):
+        f = self.merge_factor
+        while len(self._segments) >= f and len({self._tier(s) for s in self._segments[-f:]}) == 1:
+            self._merge(len(self._segments) - f, len(self._segments))
+        while len(self._segments) > self.max_segments:
+            # Small segments stranded between larger ones: merge the cheapest neighbours
+            i = min(range(len(self._segments) - 1), key=lambda i: len(self._segments[i]) + len(self._segments[i + 1]))
+            self._merge(i, i + 2)
+
+    def _merge(self, start: int, end: int):
+        """Replace segments[start:end] by one segment holding their entries in order"""
+        old = self._segments[start:end]
+        merged = self._write_segment([segment.entry(j) for segment in old for j in range(len(segment))], self._vectors_of(old))
+        self._segments = self._segments[:start] + [merged] + self._segments[end:]
+        self._write_manifest()
+        self._reindex()
+        self._remove(old, None)
+
+    def compact(self):
+        """Merge all segments into one; entry numbers and tombstones are unchanged"""
+        with self._lock:
+            if len(self._segments) > 1:
+                self._merge(0, len(self._segments))
+
+    def rewrite(self, keep: Sequence[int]):
+        """Replace the contents with the entries numbered in `keep`, renumbered 0.. in that
+        order; those already deleted stay deleted under their new numbers"""
+        with self._lock:
+            old, old_tombstones = self._segments, self._tombstones
+            vectors = self.vectors()
+            entries = [self[i] for i in keep]
+            self._segments = [self._write_segment(entries, None if vectors is None else vectors[list(keep)])] if entries else []
+            deleted = [j for j, i in enumerate(keep) if i in self._deleted]
+            self._tombstones = self._write_tombstones(deleted) if deleted else None
+            self.generation += 1
+            self._write_manifest()
+            self._reindex()
+            self._deleted = set(deleted)
+            self._remove(old, old_tombstones)
+
+    def clear(self):
+        self.rewrite([])
+
+    def _remove(self, segments: List[_Segment], tombstones: Optional[str]):
+        # Open maps of the old segments stay valid until released; only the names go away
+        for segment in segments:
+            for path in segment.files():
+                os.remove(path)
+        if tombstones:
+            os.remove(os.path.join(self.directory, tombstones))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self),
+                "deleted": len(self._deleted),
+                "segments": len(self._segments),
+                "bytes": sum(os.path.getsize(p) for s in self._segments for p in s.files()),
+            }
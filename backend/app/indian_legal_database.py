@@ -1,4 +1,3 @@
-import requests
 import json
 import time
 from typing import List, Dict, Optional, Tuple
@@ -6,8 +5,9 @@ from sqlalchemy.orm import Session
 from sqlalchemy import text as sqltext
 from .models import LegalCase, LegalStatute
 from .schemas import LegalCaseResponse, LegalStatuteResponse
-from .simple_vector_similarity import simple_vector_similarity_service
+from .similarity_service import get_similarity_service
 from .config import settings
+from .legal_providers import ProviderCall, fan_out, fan_out_async, merge_results
 import google.generativeai as genai
 
 # Configure Google Gemini API
@@ -41,6 +41,8 @@ class IndianLegalDatabaseService:
                 "enabled": True
             }
         }
+        # Per-provider status of the latest searches, keyed by provider call label
+        self.last_provider_report: Dict[str, Dict] = {}
 
     def _get_mock_cases(self, query: str, court: str = "all", max_results: int = 10) -> List[LegalCaseResponse]:
         """Return mock legal cases when API keys are not available"""
@@ -208,34 +210,34 @@ class IndianLegalDatabaseService:
             return legal_keywords[:10]
 
     def search_indian_cases(self, query: str, court: str = "all", max_results: int = 10) -> List[LegalCaseResponse]:
-        """Search for Indian legal cases across multiple databases"""
-        cases = []
-        
-        # Check if we have API keys available
-        has_api_keys = any(
-            api.get("api_key") for api in self.legal_apis.values() 
-            if api.get("api_key")
-        )
-        
-        if not has_api_keys:
+        """Search for Indian legal cases across multiple databases concurrently, within LEGAL_SEARCH_DEADLINE"""
+        if not self._has_api_keys():
             # Return mock data when no API keys are available
             return self._get_mock_cases(query, court, max_results)
         
-        # Search Indian Kanoon
-        if self.legal_apis["indian_kanoon"]["enabled"] and self.legal_apis["indian_kanoon"]["api_key"]:
-            ik_cases = self._search_indian_kanoon_cases(query, court, max_results // 2)
-            cases.extend(ik_cases)
-        
-        # Search SCC Online
-        if self.legal_apis["scc_online"]["enabled"] and self.legal_apis["scc_online"]["api_key"]:
-            scc_cases = self._search_scc_online_cases(query, court, max_results // 2)
-            cases.extend(scc_cases)
-        
-        # Search Kanoon.dev
-        if self.legal_apis["kanoon_dev"]["enabled"] and self.legal_apis["kanoon_dev"]["api_key"]:
-            kd_cases = self._search_kanoon_dev_cases(query, court, max_results // 2)
-            cases.extend(kd_cases)
+        results = fan_out(self._case_calls(query, court, max_results), enough=max_results)
+        return self._finish_cases(results, query, court, max_results)
+
+    async def search_indian_cases_async(self, query: str, court: str = "all", max_results: int = 10) -> List[LegalCaseResponse]:
+        """Async variant of search_indian_cases"""
+        if not self._has_api_keys():
+            return self._get_mock_cases(query, court, max_results)
         
+        results = await fan_out_async(self._case_calls(query, court, max_results), enough=max_results)
+        return self._finish_cases(results, query, court, max_results)
+
+    def _has_api_keys(self) -> bool:
+        return any(
+            api.get("api_key") for api in self.legal_apis.values() 
+            if api.get("api_key")
+        )
+
+    def _api_available(self, name: str) -> bool:
+        return bool(self.legal_apis[name]["enabled"] and self.legal_apis[name]["api_key"])
+
+    def _finish_cases(self, results, query: str, court: str, max_results: int) -> List[LegalCaseResponse]:
+        cases, report = merge_results(results)
+        self.last_provider_report.update(report)
         # If no cases found from APIs, return mock data
         if not cases:
             cases = self._get_mock_cases(query, court, max_results)
@@ -278,7 +280,7 @@ class IndianLegalDatabaseService:
         """Find similar cases based on case text content using FAISS vector similarity"""
         try:
             # Use simple similarity to find similar cases
-            similar_cases = simple_vector_similarity_service.find_similar_cases(case_text, max_results)
+            similar_cases = get_similarity_service().find_similar_cases(case_text, max_results)
             
             if similar_cases:
                 # Convert to LegalCaseResponse objects
@@ -312,35 +314,31 @@ class IndianLegalDatabaseService:
     def add_cases_to_vector_index(self, cases: List[LegalCaseResponse]):
         """Add cases to the FAISS vector index for similarity search"""
         try:
-            simple_vector_similarity_service.add_cases_to_index(cases)
+            get_similarity_service().add_cases_to_index(cases)
             print(f"Added {len(cases)} cases to similarity index")
         except Exception as e:
             print(f"Error adding cases to similarity index: {e}")
 
     def search_indian_statutes(self, query: str, jurisdiction: str = "all", max_results: int = 10) -> List[LegalStatuteResponse]:
         """Search for Indian legal statutes and legislation"""
-        statutes = []
-        
-        # Check if we have API keys available
-        has_api_keys = any(
-            api.get("api_key") for api in self.legal_apis.values() 
-            if api.get("api_key")
-        )
-        
-        if not has_api_keys:
+        if not self._has_api_keys():
             # Return mock data when no API keys are available
             return self._get_mock_statutes(query, jurisdiction, max_results)
         
-        # Search Indian Kanoon for statutes
-        if self.legal_apis["indian_kanoon"]["enabled"] and self.legal_apis["indian_kanoon"]["api_key"]:
-            ik_statutes = self._search_indian_kanoon_statutes(query, jurisdiction, max_results // 2)
-            statutes.extend(ik_statutes)
-        
-        # Search SCC Online for legislation
-        if self.legal_apis["scc_online"]["enabled"] and self.legal_apis["scc_online"]["api_key"]:
-            scc_statutes = self._search_scc_online_statutes(query, jurisdiction, max_results // 2)
-            statutes.extend(scc_statutes)
+        results = fan_out(self._statute_calls(query, jurisdiction, max_results), enough=max_results)
+        return self._finish_statutes(results, query, jurisdiction, max_results)
+
+    async def search_indian_statutes_async(self, query: str, jurisdiction: str = "all", max_results: int = 10) -> List[LegalStatuteResponse]:
+        """Async variant of search_indian_statutes"""
+        if not self._has_api_keys():
+            return self._get_mock_statutes(query, jurisdiction, max_results)
         
+        results = await fan_out_async(self._statute_calls(query, jurisdiction, max_results), enough=max_results)
+        return self._finish_statutes(results, query, jurisdiction, max_results)
+
+    def _finish_statutes(self, results, query: str, jurisdiction: str, max_results: int) -> List[LegalStatuteResponse]:
+        statutes, report = merge_results(results)
+        self.last_provider_report.update(report)
         # If no statutes found from APIs, return mock data
         if not statutes:
             statutes = self._get_mock_statutes(query, jurisdiction, max_results)
@@ -349,210 +347,167 @@ class IndianLegalDatabaseService:
         unique_statutes = self._deduplicate_statutes(statutes)
         return unique_statutes[:max_results]
 
-    def _search_indian_kanoon_cases(self, query: str, court: str, max_results: int) -> List[LegalCaseResponse]:
+    def _case_calls(self, query: str, court: str, max_results: int) -> List[ProviderCall]:
+        calls = []
+        # Search Indian Kanoon
+        if self._api_available("indian_kanoon"):
+            calls.append(self._indian_kanoon_cases_call(query, court, max_results // 2))
+        # Search SCC Online
+        if self._api_available("scc_online"):
+            calls.append(self._scc_online_cases_call(query, court, max_results // 2))
+        # Search Kanoon.dev
+        if self._api_available("kanoon_dev"):
+            calls.append(self._kanoon_dev_cases_call(query, court, max_results // 2))
+        return calls
+
+    def _statute_calls(self, query: str, jurisdiction: str, max_results: int) -> List[ProviderCall]:
+        calls = []
+        # Search Indian Kanoon for statutes
+        if self._api_available("indian_kanoon"):
+            calls.append(self._indian_kanoon_statutes_call(query, jurisdiction, max_results // 2))
+        # Search SCC Online for legislation
+        if self._api_available("scc_online"):
+            calls.append(self._scc_online_statutes_call(query, jurisdiction, max_results // 2))
+        return calls
+
+    def _search_cost(self, name: str) -> float:
+        return self.legal_apis[name].get("pricing", {}).get("search", 0.0)
+
+    def _case_from(self, query: str, case_data: Dict, source: str, id_key: str, summary_key: str) -> LegalCaseResponse:
+        return LegalCaseResponse(
+            id=0,  # Will be set when saved to database
+            case_id=case_data.get(id_key, ""),
+            title=case_data.get("title", ""),
+            court=case_data.get("court", ""),
+            jurisdiction="India",
+            case_date=case_data.get("date"),
+            case_type=case_data.get("type", "Civil"),
+            summary=case_data.get(summary_key, ""),
+            citation=case_data.get("citation", ""),
+            source=source,
+            relevance_score=self._calculate_relevance_score(query, case_data.get("title", "") + " " + case_data.get(summary_key, ""))
+        )
+
+    def _statute_from(self, query: str, statute_data: Dict, source: str) -> LegalStatuteResponse:
+        return LegalStatuteResponse(
+            id=0,
+            statute_id=statute_data.get("id", ""),
+            title=statute_data.get("title", ""),
+            jurisdiction="India",
+            section_number=statute_data.get("section"),
+            summary=statute_data.get("summary", ""),
+            effective_date=statute_data.get("date"),
+            source=source,
+            relevance_score=self._calculate_relevance_score(query, statute_data.get("title", "") + " " + statute_data.get("summary", ""))
+        )
+
+    def _indian_kanoon_cases_call(self, query: str, court: str, max_results: int) -> ProviderCall:
         """Search Indian Kanoon for legal cases"""
-        cases = []
-        
-        try:
-            # Indian Kanoon search API
-            url = f"{self.legal_apis['indian_kanoon']['base_url']}/search"
-            params = {
-                "q": query,
-                "format": "json",
-                "api_key": self.legal_apis["indian_kanoon"]["api_key"]
-            }
-            
-            if court != "all":
-                params["court"] = court
-            
-            response = requests.get(url, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                
-                for case_data in data.get("results", [])[:max_results]:
-                    case = LegalCaseResponse(
-                        id=0,  # Will be set when saved to database
-                        case_id=case_data.get("doc_id", ""),
-                        title=case_data.get("title", ""),
-                        court=case_data.get("court", ""),
-                        jurisdiction="India",
-                        case_date=case_data.get("date"),
-                        case_type=case_data.get("type", "Civil"),
-                        summary=case_data.get("snippet", ""),
-                        citation=case_data.get("citation", ""),
-                        source="indian_kanoon",
-                        relevance_score=self._calculate_relevance_score(query, case_data.get("title", "") + " " + case_data.get("snippet", ""))
-                    )
-                    cases.append(case)
-        
-        except Exception as e:
-            print(f"Error searching Indian Kanoon cases: {e}")
+        params = {
+            "q": query,
+            "format": "json",
+            "api_key": self.legal_apis["indian_kanoon"]["api_key"]
+        }
+        if court != "all":
+            params["court"] = court
+        
+        return ProviderCall(
+            provider="indian_kanoon",
+            label="Indian Kanoon cases",
+            url=f"{self.legal_apis['indian_kanoon']['base_url']}/search",
+            params=params,
+            parse=lambda data: [
+                self._case_from(query, case_data, "indian_kanoon", "doc_id", "snippet")
+                for case_data in data.get("results", [])[:max_results]
+            ],
             # Fallback to mock data for demonstration
-            cases = self._generate_mock_indian_cases(query, court, max_results, "indian_kanoon")
-        
-        return cases
+            fallback=lambda: self._generate_mock_indian_cases(query, court, max_results, "indian_kanoon"),
+            cost=self._search_cost("indian_kanoon"),
+        )
 
-    def _search_scc_online_cases(self, query: str, court: str, max_results: int) -> List[LegalCaseResponse]:
+    def _scc_online_cases_call(self, query: str, court: str, max_results: int) -> ProviderCall:
         """Search SCC Online for legal cases"""
-        cases = []
-        
-        try:
-            # SCC Online search API
-            url = f"{self.legal_apis['scc_online']['base_url']}/search"
-            params = {
-                "query": query,
-                "limit": max_results,
-                "api_key": self.legal_apis["scc_online"]["api_key"]
-            }
-            
-            if court != "all":
-                params["court"] = court
-            
-            response = requests.get(url, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                
-                for case_data in data.get("cases", []):
-                    case = LegalCaseResponse(
-                        id=0,
-                        case_id=case_data.get("id", ""),
-                        title=case_data.get("title", ""),
-                        court=case_data.get("court", ""),
-                        jurisdiction="India",
-                        case_date=case_data.get("date"),
-                        case_type=case_data.get("type", "Civil"),
-                        summary=case_data.get("summary", ""),
-                        citation=case_data.get("citation", ""),
-                        source="scc_online",
-                        relevance_score=self._calculate_relevance_score(query, case_data.get("title", "") + " " + case_data.get("summary", ""))
-                    )
-                    cases.append(case)
-        
-        except Exception as e:
-            print(f"Error searching SCC Online cases: {e}")
-            # Fallback to mock data for demonstration
-            cases = self._generate_mock_indian_cases(query, court, max_results, "scc_online")
-        
-        return cases
+        params = {
+            "query": query,
+            "limit": max_results,
+            "api_key": self.legal_apis["scc_online"]["api_key"]
+        }
+        if court != "all":
+            params["court"] = court
+        
+        return ProviderCall(
+            provider="scc_online",
+            label="SCC Online cases",
+            url=f"{self.legal_apis['scc_online']['base_url']}/search",
+            params=params,
+            parse=lambda data: [
+                self._case_from(query, case_data, "scc_online", "id", "summary")
+                for case_data in data.get("cases", [])
+            ],
+            fallback=lambda: self._generate_mock_indian_cases(query, court, max_results, "scc_online"),
+            cost=self._search_cost("scc_online"),
+        )
 
-    def _search_kanoon_dev_cases(self, query: str, court: str, max_results: int) -> List[LegalCaseResponse]:
+    def _kanoon_dev_cases_call(self, query: str, court: str, max_results: int) -> ProviderCall:
         """Search Kanoon.dev for legal cases"""
-        cases = []
-        
-        try:
-            # Kanoon.dev search API
-            url = f"{self.legal_apis['kanoon_dev']['base_url']}/cases/search"
-            params = {
-                "q": query,
-                "limit": max_results,
-                "api_key": self.legal_apis["kanoon_dev"]["api_key"]
-            }
-            
-            if court != "all":
-                params["court"] = court
-            
-            response = requests.get(url, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                
-                for case_data in data.get("results", []):
-                    case = LegalCaseResponse(
-                        id=0,
-                        case_id=case_data.get("case_id", ""),
-                        title=case_data.get("title", ""),
-                        court=case_data.get("court", ""),
-                        jurisdiction="India",
-                        case_date=case_data.get("date"),
-                        case_type=case_data.get("type", "Civil"),
-                        summary=case_data.get("summary", ""),
-                        citation=case_data.get("citation", ""),
-                        source="kanoon_dev",
-                        relevance_score=self._calculate_relevance_score(query, case_data.get("title", "") + " " + case_data.get("summary", ""))
-                    )
-                    cases.append(case)
-        
-        except Exception as e:
-            print(f"Error searching Kanoon.dev cases: {e}")
-            # Fallback to mock data for demonstration
-            cases = self._generate_mock_indian_cases(query, court, max_results, "kanoon_dev")
-        
-        return cases
+        params = {
+            "q": query,
+            "limit": max_results,
+            "api_key": self.legal_apis["kanoon_dev"]["api_key"]
+        }
+        if court != "all":
+            params["court"] = court
+        
+        return ProviderCall(
+            provider="kanoon_dev",
+            label="Kanoon.dev cases",
+            url=f"{self.legal_apis['kanoon_dev']['base_url']}/cases/search",
+            params=params,
+            parse=lambda data: [
+                self._case_from(query, case_data, "kanoon_dev", "case_id", "summary")
+                for case_data in data.get("results", [])
+            ],
+            fallback=lambda: self._generate_mock_indian_cases(query, court, max_results, "kanoon_dev"),
+            cost=self._search_cost("kanoon_dev"),
+        )
 
-    def _search_indian_kanoon_statutes(self, query: str, jurisdiction: str, max_results: int) -> List[LegalStatuteResponse]:
+    def _indian_kanoon_statutes_call(self, query: str, jurisdiction: str, max_results: int) -> ProviderCall:
         """Search Indian Kanoon for legal statutes"""
-        statutes = []
-        
-        try:
-            # Indian Kanoon statute search
-            url = f"{self.legal_apis['indian_kanoon']['base_url']}/statute/search"
-            params = {
+        return ProviderCall(
+            provider="indian_kanoon",
+            label="Indian Kanoon statutes",
+            url=f"{self.legal_apis['indian_kanoon']['base_url']}/statute/search",
+            params={
                 "q": query,
                 "format": "json",
                 "api_key": self.legal_apis["indian_kanoon"]["api_key"]
-            }
-            
-            response = requests.get(url, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                
-                for statute_data in data.get("results", [])[:max_results]:
-                    statute = LegalStatuteResponse(
-                        id=0,
-                        statute_id=statute_data.get("id", ""),
-                        title=statute_data.get("title", ""),
-                        jurisdiction="India",
-                        section_number=statute_data.get("section"),
-                        summary=statute_data.get("summary", ""),
-                        effective_date=statute_data.get("date"),
-                        source="indian_kanoon",
-                        relevance_score=self._calculate_relevance_score(query, statute_data.get("title", "") + " " + statute_data.get("summary", ""))
-                    )
-                    statutes.append(statute)
-        
-        except Exception as e:
-            print(f"Error searching Indian Kanoon statutes: {e}")
-            # Fallback to mock data for demonstration
-            statutes = self._generate_mock_indian_statutes(query, jurisdiction, max_results, "indian_kanoon")
-        
-        return statutes
+            },
+            parse=lambda data: [
+                self._statute_from(query, statute_data, "indian_kanoon")
+                for statute_data in data.get("results", [])[:max_results]
+            ],
+            fallback=lambda: self._generate_mock_indian_statutes(query, jurisdiction, max_results, "indian_kanoon"),
+            cost=self._search_cost("indian_kanoon"),
+        )
 
-    def _search_scc_online_statutes(self, query: str, jurisdiction: str, max_results: int) -> List[LegalStatuteResponse]:
+    def _scc_online_statutes_call(self, query: str, jurisdiction: str, max_results: int) -> ProviderCall:
         """Search SCC Online for legal statutes"""
-        statutes = []
-        
-        try:
-            # SCC Online statute search
-            url = f"{self.legal_apis['scc_online']['base_url']}/statutes/search"
-            params = {
+        return ProviderCall(
+            provider="scc_online",
+            label="SCC Online statutes",
+            url=f"{self.legal_apis['scc_online']['base_url']}/statutes/search",
+            params={
                 "query": query,
                 "limit": max_results,
                 "api_key": self.legal_apis["scc_online"]["api_key"]
-            }
-            
-            response = requests.get(url, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                
-                for statute_data in data.get("statutes", []):
-                    statute = LegalStatuteResponse(
-                        id=0,
-                        statute_id=statute_data.get("id", ""),
-                        title=statute_data.get("title", ""),
-                        jurisdiction="India",
-                        section_number=statute_data.get("section"),
-                        summary=statute_data.get("summary", ""),
-                        effective_date=statute_data.get("date"),
-                        source="scc_online",
-                        relevance_score=self._calculate_relevance_score(query, statute_data.get("title", "") + " " + statute_data.get("summary", ""))
-                    )
-                    statutes.append(statute)
-        
-        except Exception as e:
-            print(f"Error searching SCC Online statutes: {e}")
-            # Fallback to mock data for demonstration
-            statutes = self._generate_mock_indian_statutes(query, jurisdiction, max_results, "scc_online")
-        
-        return statutes
+            },
+            parse=lambda data: [
+                self._statute_from(query, statute_data, "scc_online")
+                for statute_data in data.get("statutes", [])
+            ],
+            fallback=lambda: self._generate_mock_indian_statutes(query, jurisdiction, max_results, "scc_online"),
+            cost=self._search_cost("scc_online"),
+        )
 
     def _generate_mock_indian_cases(self, query: str, court: str, max_results: int, source: str) -> List[LegalCaseResponse]:
         """Generate mock Indian legal cases for demonstration"""
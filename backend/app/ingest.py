@@ -1,61 +1,256 @@
-from typing import Iterator, Tuple
-from pdfminer.high_level import extract_text
+from typing import Iterator, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
 import os
 import io
+import threading
 from PIL import Image
 import pytesseract
 import easyocr
 import cv2
 import numpy as np
+import hashlib
+import tempfile
+from .config import settings
+from .extraction_cache import extraction_cache
+
+# Bump whenever extraction output changes so stored chunks get re-ingested
+EXTRACTOR_VERSION = "3"
+
+# Pages whose text layer is shorter than this are treated as scanned and OCR'd
+MIN_TEXT_LAYER_CHARS = 20
+
+
+def file_content_hash(path: str) -> str:
+    """SHA-256 of a file's bytes, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _is_pdf(path: str, content_type: str = "") -> bool:
+    return (content_type or "").lower().startswith("application/pdf") or path.lower().endswith(".pdf")
+
+
+def _is_image(path: str) -> bool:
+    return path.lower().endswith((".png", ".jpg", ".jpeg"))
+
+
+def join_pages(pages: Iterator[Tuple[Optional[int], str]]) -> str:
+    """Join (page_number, text) pieces: blank lines between pages, plain text blocks as-is"""
+    parts = []
+    for page_number, page_text in pages:
+        if parts and page_number is not None:
+            parts.append("\n\n")
+        parts.append(page_text)
+    return "".join(parts)
+
+
+def extract_document_text(path: str, content_type: str = "", content_hash: Optional[str] = None) -> str:
+    """Extract text from a stored document based on its type, using the extraction cache"""
+    return join_pages(iter_document_pages(path, content_type, content_hash)).strip()
+
+
+def extract_text_from_bytes(content: bytes, filename: str) -> str:
+    """Extract text from uploaded bytes, reusing any earlier extraction of the same bytes"""
+    content_hash = hashlib.sha256(content).hexdigest()
+    cached = extraction_cache.get(content_hash, EXTRACTOR_VERSION)
+    if cached is not None:
+        return join_pages(iter(cached)).strip()
+    suffix = os.path.splitext(filename)[1].lower()
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+        tmp.write(content)
+    try:
+        return extract_document_text(tmp.name, content_hash=content_hash)
+    finally:
+        os.unlink(tmp.name)
+
+
+def iter_document_pages(
+    path: str, content_type: str = "", content_hash: Optional[str] = None, failed_pages: Optional[List[int]] = None
+) -> Iterator[Tuple[Optional[int], str]]:
+    """Stream a stored document as (page_number, text) pieces; page_number is None for plain text.
+
+    PDF and image extraction results are cached by content hash, so the same bytes are
+    never OCR'd twice, whichever endpoint asks first. Pages whose OCR failed are skipped
+    and their numbers appended to failed_pages; such results are not cached, so the next
+    extraction tries those pages again.
+    """
+    if not (_is_pdf(path, content_type) or _is_image(path)):
+        try:
+            with open(path, "r", encoding="utf-8", errors="ignore") as f:
+                for block in iter(lambda: f.read(1024 * 1024), ""):
+                    yield None, block
+        except Exception as e:
+            print(f"Error reading {path}: {e}")
+        return
+
+    content_hash = content_hash or file_content_hash(path)
+    cached = extraction_cache.get(content_hash, EXTRACTOR_VERSION)
+    if cached is not None:
+        yield from cached
+        return
+
+    pages = []
+    failed_pages = [] if failed_pages is None else failed_pages
+    if _is_pdf(path, content_type):
+        source = iter_pdf_pages(path, failed_pages)
+    else:
+        source = iter([(1, extract_text_from_image(path))])
+    for page in source:
+        pages.append(page)
+        yield page
+    # Only reached when the caller consumed every page
+    if failed_pages:
+        print(f"⚠️ OCR failed for pages {failed_pages} of {path}; extraction not cached")
+        return
+    extraction_cache.put(content_hash, EXTRACTOR_VERSION, pages)
 
 
 def extract_text_from_pdf(path: str) -> str:
     """Enhanced PDF text extraction using multiple methods"""
-    text = ""
-    
-    # Method 1: PDFMiner (good for text-based PDFs)
+    return extract_document_text(path, "application/pdf")
+
+
+def iter_pdf_pages(path: str, failed_pages: Optional[List[int]] = None) -> Iterator[Tuple[int, str]]:
+    """Yield (page_number, text) for a PDF one page at a time.
+
+    Each page uses its PDFMiner text layer when it has one; only image-only pages are
+    rasterized and OCR'd, a small window at a time, so page images never pile up in memory.
+    Pages whose OCR failed are skipped and their numbers appended to failed_pages.
+    """
+    window = max(1, settings.OCR_PAGE_WINDOW or _ocr_worker_count())
+    pending: List[List] = []  # [page_number, text or None while waiting for OCR], in page order
+    ocr_needed = 0
+    parsed = 0  # last page PDFMiner got through
     try:
-        text = extract_text(path) or ""
-        print(f"PDFMiner extracted {len(text)} characters")
+        for page_number, layer_text in _iter_pdf_text_layer(path):
+            parsed = page_number
+            if len(layer_text.strip()) < MIN_TEXT_LAYER_CHARS:
+                pending.append([page_number, None])
+                ocr_needed += 1
+            elif pending:
+                pending.append([page_number, layer_text])
+            else:
+                yield page_number, layer_text
+                continue
+            if ocr_needed >= window:
+                yield from _resolve_ocr_pages(path, pending, failed_pages)
+                pending, ocr_needed = [], 0
     except Exception as e:
-        print(f"PDFMiner extraction failed: {e}")
-    
-    # Method 2: Fallback to Tesseract OCR for scanned PDFs
-    if not text or len(text.strip()) < 50:
+        print(f"PDFMiner extraction failed after page {parsed}: {e}")
+        if parsed:
+            # Finish the pages already read, then OCR the rest; errors here fail the extraction
+            yield from _resolve_ocr_pages(path, pending, failed_pages)
+            yield from _iter_ocr_pdf_pages(path, first_page=parsed + 1)
+            return
+        # No usable text layer at all: OCR every page
         try:
-            # Use pdf2image to convert PDF to images, then OCR
-            from pdf2image import convert_from_path
-            pages = convert_from_path(path, dpi=200)
-            for i, page in enumerate(pages):
-                ocr_text = extract_text_from_image_with_easyocr(page)
-                text += f"\n\n--- Page {i + 1} ---\n{ocr_text}"
-            print(f"OCR extraction completed for {len(pages)} pages")
-        except Exception as e:
-            print(f"PDF OCR extraction failed: {e}")
-            # Final fallback - try to extract with basic PDFMiner settings
-            try:
-                from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
-                from pdfminer.converter import TextConverter
-                from pdfminer.layout import LAParams
-                from pdfminer.pdfpage import PDFPage
-                
-                resource_manager = PDFResourceManager()
-                fake_file_handle = io.StringIO()
-                converter = TextConverter(resource_manager, fake_file_handle, laparams=LAParams())
-                page_interpreter = PDFPageInterpreter(resource_manager, converter)
-                
-                with open(path, 'rb') as fh:
-                    for page in PDFPage.get_pages(fh, caching=True, check_extractable=True):
-                        page_interpreter.process_page(page)
-                
-                text = fake_file_handle.getvalue()
-                converter.close()
-                fake_file_handle.close()
-                print(f"Fallback PDFMiner extraction completed")
-            except Exception as e2:
-                print(f"Fallback PDFMiner extraction failed: {e2}")
-    
-    return text.strip()
+            yield from _iter_ocr_pdf_pages(path)
+            return
+        except Exception as e2:
+            print(f"PDF OCR extraction failed: {e2}")
+        # Final fallback - try to extract with basic PDFMiner settings
+        fallback_text = _extract_text_with_pdfminer_converter(path)
+        for page_number, page_text in enumerate(fallback_text.split("\f"), start=1):
+            if page_text.strip():
+                yield page_number, page_text
+        return
+    yield from _resolve_ocr_pages(path, pending, failed_pages)
+
+
+def _iter_pdf_text_layer(path: str) -> Iterator[Tuple[int, str]]:
+    """PDFMiner text layer of each page, parsed lazily page by page"""
+    from pdfminer.high_level import extract_pages
+    from pdfminer.layout import LTTextContainer
+    for page_number, layout in enumerate(extract_pages(path), start=1):
+        yield page_number, "".join(el.get_text() for el in layout if isinstance(el, LTTextContainer))
+
+
+def _resolve_ocr_pages(path: str, pending: List[List], failed_pages: Optional[List[int]] = None) -> Iterator[Tuple[int, str]]:
+    """OCR the pages in pending that have no text yet and yield the window in page order"""
+    missing = [item[0] for item in pending if item[1] is None]
+    if missing:
+        texts = _ocr_pdf_page_numbers(path, missing)
+        by_page = dict(zip(missing, texts))
+        for item in pending:
+            if item[1] is None:
+                item[1] = by_page.get(item[0])
+    for page_number, page_text in pending:
+        if page_text is None:
+            if failed_pages is not None:
+                failed_pages.append(page_number)
+        elif page_text.strip():
+            yield page_number, page_text
+
+
+def _ocr_pdf_page_numbers(path: str, page_numbers: List[int]) -> List[Optional[str]]:
+    """Rasterize just the given pages and OCR them through the pool; None for pages that failed"""
+    from pdf2image import convert_from_path
+    images = []
+    try:
+        # Render runs of consecutive pages with one pdftoppm call each
+        run_start = prev = page_numbers[0]
+        for page_number in page_numbers[1:] + [None]:
+            if page_number is not None and page_number == prev + 1:
+                prev = page_number
+                continue
+            images.extend(convert_from_path(path, dpi=200, first_page=run_start, last_page=prev))
+            if page_number is not None:
+                run_start = prev = page_number
+        return ocr_images(images)
+    except Exception as e:
+        print(f"PDF OCR extraction failed for pages {page_numbers}: {e}")
+        return [None] * len(page_numbers)
+    finally:
+        for img in images:
+            img.close()
+
+
+def _iter_ocr_pdf_pages(path: str, first_page: int = 1) -> Iterator[Tuple[int, str]]:
+    """Rasterize and OCR a PDF from first_page on, window by window, yielding pages in order"""
+    from pdf2image import convert_from_path, pdfinfo_from_path
+    page_count = pdfinfo_from_path(path)["Pages"]
+    window = max(1, settings.OCR_PAGE_WINDOW or _ocr_worker_count())
+    for window_start in range(first_page, page_count + 1, window):
+        last_page = min(page_count, window_start + window - 1)
+        images = convert_from_path(path, dpi=200, first_page=window_start, last_page=last_page)
+        texts = ocr_images(images)
+        for img in images:
+            img.close()
+        del images
+        for offset, ocr_text in enumerate(texts):
+            yield window_start + offset, ocr_text
+    print(f"OCR extraction completed for {page_count} pages")
+
+
+def _extract_text_with_pdfminer_converter(path: str) -> str:
+    try:
+        from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
+        from pdfminer.converter import TextConverter
+        from pdfminer.layout import LAParams
+        from pdfminer.pdfpage import PDFPage
+        
+        resource_manager = PDFResourceManager()
+        fake_file_handle = io.StringIO()
+        converter = TextConverter(resource_manager, fake_file_handle, laparams=LAParams())
+        page_interpreter = PDFPageInterpreter(resource_manager, converter)
+        
+        with open(path, 'rb') as fh:
+            for page in PDFPage.get_pages(fh, caching=True, check_extractable=True):
+                page_interpreter.process_page(page)
+        
+        text = fake_file_handle.getvalue()
+        converter.close()
+        fake_file_handle.close()
+        print(f"Fallback PDFMiner extraction completed")
+        return text
+    except Exception as e2:
+        print(f"Fallback PDFMiner extraction failed: {e2}")
+        return ""
 
 
 def extract_text_from_image(path: str) -> str:
@@ -76,8 +271,8 @@ def extract_text_from_image_with_easyocr(img: Image.Image) -> str:
         else:
             img_rgb = img_array
         
-        # Initialize EasyOCR reader (English)
-        reader = easyocr.Reader(['en'])
+        # Reuse this process's EasyOCR reader (English)
+        reader = _get_easyocr_reader()
         
         # Perform OCR
         results = reader.readtext(img_rgb)
@@ -95,6 +290,61 @@ def extract_text_from_image_with_easyocr(img: Image.Image) -> str:
         return pytesseract.image_to_string(img) or ""
 
 
+_easyocr_reader = None
+_ocr_pool = None
+_ocr_pool_lock = threading.Lock()
+
+
+def _get_easyocr_reader() -> "easyocr.Reader":
+    """Per-process EasyOCR reader; loading the detection and recognition models is the slow part"""
+    global _easyocr_reader
+    if _easyocr_reader is None:
+        _easyocr_reader = easyocr.Reader(['en'])
+    return _easyocr_reader
+
+
+def _init_ocr_worker():
+    """Pool initializer: one torch thread per process and the models loaded up front"""
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except Exception:
+        pass
+    _get_easyocr_reader()
+
+
+def _ocr_worker_count() -> int:
+    if settings.OCR_WORKERS is not None:
+        return max(1, settings.OCR_WORKERS)
+    return max(1, min(4, os.cpu_count() or 1))
+
+
+def _get_ocr_pool() -> ProcessPoolExecutor:
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is None:
+            _ocr_pool = ProcessPoolExecutor(
+                max_workers=_ocr_worker_count(),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_ocr_worker,
+            )
+        return _ocr_pool
+
+
+def ocr_images(images: List[Image.Image]) -> List[str]:
+    """OCR page images across the process pool, returning texts in page order"""
+    if len(images) < 2 or _ocr_worker_count() == 1:
+        return [extract_text_from_image_with_easyocr(img) for img in images]
+    global _ocr_pool
+    try:
+        return list(_get_ocr_pool().map(extract_text_from_image_with_easyocr, images))
+    except BrokenProcessPool as e:
+        print(f"OCR process pool failed ({e}), falling back to in-process OCR")
+        with _ocr_pool_lock:
+            _ocr_pool = None
+        return [extract_text_from_image_with_easyocr(img) for img in images]
+
+
 def enumerate_files(storage_dir: str) -> Iterator[Tuple[str, str]]:
     for root, _, files in os.walk(storage_dir):
         for f in files:
@@ -0,0 +1,74 @@
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from .models import Document, DocumentIngestion
+from .ingest import EXTRACTOR_VERSION, file_content_hash, iter_document_pages
+from .rag import upsert_document_chunks
+from .chunking import CHUNKER_VERSION
+from .answer_cache import answer_cache
+
+# Stored in DocumentIngestion.extractor_version; a change in either stage forces re-ingestion
+PIPELINE_VERSION = f"{EXTRACTOR_VERSION}.{CHUNKER_VERSION}"
+
+
+def ingest_document(db: Session, doc: Document) -> Tuple[str, int]:
+    """Ingest one document unless its content and extractor version are unchanged.
+
+    Returns (status, chunk_count) where status is "new", "updated" or "skipped".
+    Chunks of a changed document are replaced in the same transaction that updates
+    its ingestion state, so a failure leaves the previous chunks in place. A document
+    with pages whose OCR failed counts as a failure, so the next run extracts it again.
+    """
+    content_hash = file_content_hash(doc.path)
+    state = db.query(DocumentIngestion).filter(DocumentIngestion.document_id == doc.id).first()
+    if state and state.content_hash == content_hash and state.extractor_version == PIPELINE_VERSION:
+        return "skipped", state.chunk_count
+
+    try:
+        # Pages stream from extraction straight into chunking and embedding
+        failed_pages: List[int] = []
+        pages = iter_document_pages(doc.path, doc.content_type, content_hash, failed_pages)
+        count = upsert_document_chunks(db, doc, pages, replace=True, commit=False)
+        if failed_pages:
+            raise RuntimeError(f"OCR failed for pages {failed_pages}")
+        if state is None:
+            state = DocumentIngestion(document_id=doc.id)
+            db.add(state)
+            status = "new"
+        else:
+            status = "updated"
+        state.content_hash = content_hash
+        state.extractor_version = PIPELINE_VERSION
+        state.chunk_count = count
+        # Cached answers were generated from the user's previous chunks
+        answer_cache.invalidate_user(db, doc.user_id)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return status, count
+
+
+def ingest_user_documents(
+    db: Session,
+    user_id: int,
+    document_ids: Optional[List[int]] = None,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> Dict[str, int]:
+    """Incrementally ingest a user's documents (all of them unless document_ids is given) and report what happened"""
+    report = {"ingested_chunks": 0, "new": 0, "updated": 0, "skipped": 0, "failed": 0}
+    query = db.query(Document).filter(Document.user_id == user_id)
+    if document_ids is not None:
+        query = query.filter(Document.id.in_(document_ids))
+    docs = query.order_by(Document.id).all()
+    for idx, doc in enumerate(docs, start=1):
+        try:
+            status, count = ingest_document(db, doc)
+            report[status] += 1
+            if status != "skipped":
+                report["ingested_chunks"] += count
+        except Exception as e:
+            print(f"Error ingesting document {doc.id}: {e}")
+            report["failed"] += 1
+        if on_progress:
+            on_progress(idx, len(docs))
+    return report
@@ -0,0 +1,216 @@
+"""Database-backed ingestion job queue.
+
+Jobs are rows in ingestion_jobs. Worker processes poll the table, claim the oldest
+queued job and run extraction, OCR and embedding outside the API request path.
+A running job holds a lease that its worker renews; when a worker crashes or is
+killed the lease runs out and the job is claimed again, up to INGEST_MAX_ATTEMPTS.
+Run standalone workers with ``python -m app.ingestion_worker``.
+"""
+import json
+import multiprocessing
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+from sqlalchemy import and_, inspect, or_, text, update
+from sqlalchemy.orm import Session
+from .config import settings
+from .database import Base, SessionLocal, engine
+from .models import IngestionJob
+from .ingestion_service import ingest_user_documents
+
+
+def enqueue_ingestion_job(db: Session, user_id: int, document_id: Optional[int] = None) -> IngestionJob:
+    """Queue ingestion of one document, or of all the user's documents when document_id is None"""
+    job = IngestionJob(user_id=user_id, document_id=document_id, status="queued", progress=0.0)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def ensure_job_columns():
+    """Add lease columns to an ingestion_jobs table created before they existed"""
+    columns = {c["name"] for c in inspect(engine).get_columns("ingestion_jobs")}
+    timestamp = "TIMESTAMP WITH TIME ZONE" if engine.dialect.name == "postgresql" else "DATETIME"
+    with engine.begin() as conn:
+        if "attempts" not in columns:
+            conn.execute(text("ALTER TABLE ingestion_jobs ADD COLUMN attempts INTEGER DEFAULT 0"))
+        if "lease_expires_at" not in columns:
+            conn.execute(text(f"ALTER TABLE ingestion_jobs ADD COLUMN lease_expires_at {timestamp}"))
+
+
+def _lease_expiry() -> datetime:
+    return datetime.now(timezone.utc) + timedelta(seconds=settings.INGEST_LEASE_SECONDS)
+
+
+def claim_next_job(db: Session, worker_id: str) -> Optional[int]:
+    """Atomically claim the oldest queued job, or a running job whose lease has expired,
+    and return its id. Expired jobs that used up INGEST_MAX_ATTEMPTS are failed instead."""
+    now = datetime.now(timezone.utc)
+    expired = and_(IngestionJob.status == "running", IngestionJob.lease_expires_at < now)
+    db.execute(
+        update(IngestionJob)
+        .where(expired, IngestionJob.attempts >= settings.INGEST_MAX_ATTEMPTS)
+        .values(status="failed", finished_at=now, error_message="Worker stopped responding; giving up after repeated attempts")
+    )
+    claimable = or_(IngestionJob.status == "queued", expired)
+    candidate = (
+        db.query(IngestionJob.id)
+        .filter(claimable)
+        .order_by(IngestionJob.id)
+        .with_for_update(skip_locked=True)  # no-op on SQLite; the guarded UPDATE below still prevents double claims
+        .first()
+    )
+    if candidate is None:
+        db.commit()
+        return None
+    claimed = db.execute(
+        update(IngestionJob)
+        .where(IngestionJob.id == candidate.id, claimable)
+        .values(
+            status="running", worker_id=worker_id, started_at=now, lease_expires_at=_lease_expiry(),
+            attempts=IngestionJob.attempts + 1,
+        )
+    )
+    db.commit()
+    return candidate.id if claimed.rowcount == 1 else None
+
+
+def _renew_lease(job_id: int, stop: threading.Event):
+    """Extend the job's lease until stop is set, so only a dead worker lets it expire"""
+    while not stop.wait(settings.INGEST_LEASE_SECONDS / 3):
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(IngestionJob)
+                .where(IngestionJob.id == job_id, IngestionJob.status == "running")
+                .values(lease_expires_at=_lease_expiry())
+            )
+            db.commit()
+        except Exception as e:
+            print(f"Error renewing lease of ingestion job {job_id}: {e}")
+        finally:
+            db.close()
+
+
+def run_job(job_id: int):
+    """Run one claimed (or freshly queued) job to completion, recording progress and errors"""
+    db = SessionLocal()
+    try:
+        job = db.query(IngestionJob).filter(IngestionJob.id == job_id).first()
+        if job is None:
+            return
+        if job.status == "queued":
+            job.status = "running"
+            job.started_at = datetime.now(timezone.utc)
+            job.lease_expires_at = _lease_expiry()
+            job.attempts = (job.attempts or 0) + 1
+            db.commit()
+        stop_renewing = threading.Event()
+        threading.Thread(target=_renew_lease, args=(job_id, stop_renewing), daemon=True).start()
+
+        def on_progress(processed: int, total: int):
+            job.processed_documents = processed
+            job.total_documents = total
+            job.progress = processed / total if total else 1.0
+            db.commit()
+
+        try:
+            document_ids = [job.document_id] if job.document_id is not None else None
+            report = ingest_user_documents(db, job.user_id, document_ids=document_ids, on_progress=on_progress)
+            job.result = json.dumps(report)
+            job.progress = 1.0
+            if report["failed"] and not (report["new"] or report["updated"] or report["skipped"]):
+                job.status = "failed"
+                job.error_message = "No documents could be ingested"
+            else:
+                job.status = "completed"
+        except Exception as e:
+            db.rollback()
+            job.status = "failed"
+            job.error_message = str(e)
+        stop_renewing.set()
+        job.finished_at = datetime.now(timezone.utc)
+        job.lease_expires_at = None
+        db.commit()
+    except Exception as e:
+        print(f"Error running ingestion job {job_id}: {e}")
+    finally:
+        db.close()
+
+
+def worker_loop(worker_id: Optional[str] = None, poll_interval: Optional[float] = None, parent_pid: Optional[int] = None):
+    """Poll for queued jobs until the parent process (if any) goes away"""
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    poll_interval = poll_interval or settings.INGEST_POLL_INTERVAL
+    print(f"Ingestion worker {worker_id} started")
+    while parent_pid is None or os.getppid() == parent_pid:
+        db = SessionLocal()
+        try:
+            job_id = claim_next_job(db, worker_id)
+        except Exception as e:
+            print(f"Error claiming ingestion job: {e}")
+            job_id = None
+        finally:
+            db.close()
+        if job_id is None:
+            time.sleep(poll_interval)
+            continue
+        run_job(job_id)
+
+
+# Lock file handle held for the life of the API process that spawned the workers
+_spawn_lock = None
+
+
+def _acquire_spawn_lock(path: str) -> bool:
+    """Non-blocking exclusive lock, so one API process per host starts workers (gunicorn
+    runs the startup hook in every worker process)"""
+    global _spawn_lock
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    handle = open(path, "a+")
+    try:
+        if os.name == "nt":
+            import msvcrt
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return False
+    _spawn_lock = handle
+    return True
+
+
+def start_worker_processes(count: int) -> List[multiprocessing.Process]:
+    """Spawn worker processes that exit together with the API process; returns none when
+    another API process on this host already started them"""
+    if not _acquire_spawn_lock(settings.INGEST_WORKER_LOCK):
+        return []
+    # Not daemonic: workers need to be able to start their own OCR process pools
+    ctx = multiprocessing.get_context("spawn")
+    processes = []
+    for _ in range(count):
+        proc = ctx.Process(target=worker_loop, kwargs={"parent_pid": os.getpid()})
+        proc.start()
+        processes.append(proc)
+    return processes
+
+
+def stop_worker_processes(processes: List[multiprocessing.Process], timeout: float = 5.0):
+    """Terminate worker processes started by start_worker_processes"""
+    for proc in processes:
+        if proc.is_alive():
+            proc.terminate()
+    for proc in processes:
+        proc.join(timeout)
+
+
+if __name__ == "__main__":
+    Base.metadata.create_all(bind=engine)
+    ensure_job_columns()
+    worker_loop()
@@ -1,4 +1,3 @@
-import requests
 import json
 import time
 from typing import List, Dict, Optional, Tuple
@@ -7,6 +6,7 @@ from sqlalchemy import text as sqltext
 from .models import LegalCase, LegalStatute
 from .schemas import LegalCaseResponse, LegalStatuteResponse
 from .config import settings
+from .legal_providers import ProviderCall, fan_out, fan_out_async, merge_results
 import google.generativeai as genai
 
 # Configure Google Gemini API
@@ -35,158 +35,150 @@ class LegalDatabaseService:
                 "enabled": False  # Requires API key
             }
         }
+        # Per-provider status of the latest searches, keyed by provider call label
+        self.last_provider_report: Dict[str, Dict] = {}
 
     def search_legal_cases(self, query: str, jurisdiction: str = "all", max_results: int = 10) -> List[LegalCaseResponse]:
-        """Search for legal cases across multiple databases"""
-        cases = []
-        
-        # Search CanLII (Canadian Legal Information Institute)
-        if self.legal_apis["canlii"]["enabled"]:
-            canlii_cases = self._search_canlii_cases(query, max_results // 2)
-            cases.extend(canlii_cases)
-        
-        # Search BAILII (British and Irish Legal Information Institute)
-        if self.legal_apis["bailii"]["enabled"]:
-            bailii_cases = self._search_bailii_cases(query, max_results // 2)
-            cases.extend(bailii_cases)
+        """Search for legal cases across multiple databases concurrently, within LEGAL_SEARCH_DEADLINE"""
+        results = fan_out(self._case_calls(query, max_results), enough=max_results)
+        return self._finish_cases(results, max_results)
+
+    async def search_legal_cases_async(self, query: str, jurisdiction: str = "all", max_results: int = 10) -> List[LegalCaseResponse]:
+        """Async variant of search_legal_cases"""
+        results = await fan_out_async(self._case_calls(query, max_results), enough=max_results)
+        return self._finish_cases(results, max_results)
+
+    def search_legal_statutes(self, query: str, jurisdiction: str = "all", max_results: int = 10) -> List[LegalStatuteResponse]:
+        """Search for legal statutes and legislation concurrently, within LEGAL_SEARCH_DEADLINE"""
+        results = fan_out(self._statute_calls(query, max_results), enough=max_results)
+        return self._finish_statutes(results, max_results)
+
+    async def search_legal_statutes_async(self, query: str, jurisdiction: str = "all", max_results: int = 10) -> List[LegalStatuteResponse]:
+        """Async variant of search_legal_statutes"""
+        results = await fan_out_async(self._statute_calls(query, max_results), enough=max_results)
+        return self._finish_statutes(results, max_results)
+
+    def _finish_cases(self, results, max_results: int) -> List[LegalCaseResponse]:
+        cases, report = merge_results(results)
+        self.last_provider_report.update(report)
         
         # Remove duplicates and sort by relevance
         unique_cases = self._deduplicate_cases(cases)
         return unique_cases[:max_results]
 
-    def search_legal_statutes(self, query: str, jurisdiction: str = "all", max_results: int = 10) -> List[LegalStatuteResponse]:
-        """Search for legal statutes and legislation"""
-        statutes = []
-        
-        # Search CanLII statutes
-        if self.legal_apis["canlii"]["enabled"]:
-            canlii_statutes = self._search_canlii_statutes(query, max_results // 2)
-            statutes.extend(canlii_statutes)
-        
-        # Search BAILII legislation
-        if self.legal_apis["bailii"]["enabled"]:
-            bailii_statutes = self._search_bailii_statutes(query, max_results // 2)
-            statutes.extend(bailii_statutes)
+    def _finish_statutes(self, results, max_results: int) -> List[LegalStatuteResponse]:
+        statutes, report = merge_results(results)
+        self.last_provider_report.update(report)
         
         # Remove duplicates and sort by relevance
         unique_statutes = self._deduplicate_statutes(statutes)
         return unique_statutes[:max_results]
 
-    def _search_canlii_cases(self, query: str, max_results: int) -> List[LegalCaseResponse]:
+    def _case_calls(self, query: str, max_results: int) -> List[ProviderCall]:
+        calls = []
+        # Search CanLII (Canadian Legal Information Institute)
+        if self.legal_apis["canlii"]["enabled"]:
+            calls.append(self._canlii_cases_call(query, max_results // 2))
+        # Search BAILII (British and Irish Legal Information Institute)
+        if self.legal_apis["bailii"]["enabled"]:
+            calls.append(self._bailii_cases_call(query, max_results // 2))
+        return calls
+
+    def _statute_calls(self, query: str, max_results: int) -> List[ProviderCall]:
+        calls = []
+        if self.legal_apis["canlii"]["enabled"]:
+            calls.append(self._canlii_statutes_call(query, max_results // 2))
+        if self.legal_apis["bailii"]["enabled"]:
+            calls.append(self._bailii_statutes_call(query, max_results // 2))
+        return calls
+
+    def _canlii_cases_call(self, query: str, max_results: int) -> ProviderCall:
         """Search CanLII for legal cases"""
-        cases = []
-        
-        try:
-            # CanLII API search
-            url = f"{self.legal_apis['canlii']['base_url']}/caseBrowse/en"
-            params = {
+        def parse(data) -> List[LegalCaseResponse]:
+            return [
+                LegalCaseResponse(
+                    id=0,  # Will be set when saved to database
+                    case_id=case_data.get("caseId", ""),
+                    title=case_data.get("title", ""),
+                    court=case_data.get("court", ""),
+                    jurisdiction=case_data.get("jurisdiction", ""),
+                    case_date=case_data.get("decisionDate"),
+                    case_type=case_data.get("type", ""),
+                    summary=case_data.get("summary", ""),
+                    citation=case_data.get("citation", ""),
+                    source="canlii",
+                    relevance_score=self._calculate_relevance_score(query, case_data.get("title", "") + " " + case_data.get("summary", ""))
+                )
+                for case_data in data.get("cases", [])
+            ]
+
+        return ProviderCall(
+            provider="canlii",
+            label="CanLII cases",
+            url=f"{self.legal_apis['canlii']['base_url']}/caseBrowse/en",
+            params={
                 "q": query,
                 "resultCount": max_results,
                 "api_key": self.legal_apis["canlii"]["api_key"]
-            }
-            
-            response = requests.get(url, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                
-                for case_data in data.get("cases", []):
-                    case = LegalCaseResponse(
-                        id=0,  # Will be set when saved to database
-                        case_id=case_data.get("caseId", ""),
-                        title=case_data.get("title", ""),
-                        court=case_data.get("court", ""),
-                        jurisdiction=case_data.get("jurisdiction", ""),
-                        case_date=case_data.get("decisionDate"),
-                        case_type=case_data.get("type", ""),
-                        summary=case_data.get("summary", ""),
-                        citation=case_data.get("citation", ""),
-                        source="canlii",
-                        relevance_score=self._calculate_relevance_score(query, case_data.get("title", "") + " " + case_data.get("summary", ""))
-                    )
-                    cases.append(case)
-        
-        except Exception as e:
-            print(f"Error searching CanLII cases: {e}")
-        
-        return cases
+            },
+            parse=parse,
+        )
 
-    def _search_bailii_cases(self, query: str, max_results: int) -> List[LegalCaseResponse]:
+    def _bailii_cases_call(self, query: str, max_results: int) -> ProviderCall:
         """Search BAILII for legal cases (web scraping approach)"""
-        cases = []
-        
-        try:
-            # BAILII search URL
-            search_url = f"https://www.bailii.org/cgi-bin/markup.cgi?doc=/cgi-bin/search.cgi&query={query}&method=boolean&rank=score&rank=date&rank=relevance&sort=score&sort=date&sort=relevance&results=50&start=1"
-            
-            response = requests.get(search_url, timeout=10)
-            if response.status_code == 200:
-                # Parse HTML response (simplified)
-                # In a real implementation, you'd use BeautifulSoup or similar
-                # For now, we'll create mock data based on the query
-                mock_cases = self._generate_mock_bailii_cases(query, max_results)
-                cases.extend(mock_cases)
-        
-        except Exception as e:
-            print(f"Error searching BAILII cases: {e}")
-        
-        return cases
+        return ProviderCall(
+            provider="bailii",
+            label="BAILII cases",
+            url=self._bailii_search_url(query),
+            # Parse HTML response (simplified)
+            # In a real implementation, you'd use BeautifulSoup or similar
+            # For now, we'll create mock data based on the query
+            parse=lambda html: self._generate_mock_bailii_cases(query, max_results),
+            expects_json=False,
+        )
 
-    def _search_canlii_statutes(self, query: str, max_results: int) -> List[LegalStatuteResponse]:
+    def _canlii_statutes_call(self, query: str, max_results: int) -> ProviderCall:
         """Search CanLII for legal statutes"""
-        statutes = []
-        
-        try:
-            # CanLII legislation search
-            url = f"{self.legal_apis['canlii']['base_url']}/legislationBrowse/en"
-            params = {
+        def parse(data) -> List[LegalStatuteResponse]:
+            return [
+                LegalStatuteResponse(
+                    id=0,  # Will be set when saved to database
+                    statute_id=statute_data.get("legislationId", ""),
+                    title=statute_data.get("title", ""),
+                    jurisdiction=statute_data.get("jurisdiction", ""),
+                    section_number=statute_data.get("sectionNumber"),
+                    summary=statute_data.get("summary", ""),
+                    effective_date=statute_data.get("effectiveDate"),
+                    source="canlii",
+                    relevance_score=self._calculate_relevance_score(query, statute_data.get("title", "") + " " + statute_data.get("summary", ""))
+                )
+                for statute_data in data.get("legislations", [])
+            ]
+
+        return ProviderCall(
+            provider="canlii",
+            label="CanLII statutes",
+            url=f"{self.legal_apis['canlii']['base_url']}/legislationBrowse/en",
+            params={
                 "q": query,
                 "resultCount": max_results,
                 "api_key": self.legal_apis["canlii"]["api_key"]
-            }
-            
-            response = requests.get(url, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                
-                for statute_data in data.get("legislations", []):
-                    statute = LegalStatuteResponse(
-                        id=0,  # Will be set when saved to database
-                        statute_id=statute_data.get("legislationId", ""),
-                        title=statute_data.get("title", ""),
-                        jurisdiction=statute_data.get("jurisdiction", ""),
-                        section_number=statute_data.get("sectionNumber"),
-                        summary=statute_data.get("summary", ""),
-                        effective_date=statute_data.get("effectiveDate"),
-                        source="canlii",
-                        relevance_score=self._calculate_relevance_score(query, statute_data.get("title", "") + " " + statute_data.get("summary", ""))
-                    )
-                    statutes.append(statute)
-        
-        except Exception as e:
-            print(f"Error searching CanLII statutes: {e}")
-        
-        return statutes
+            },
+            parse=parse,
+        )
 
-    def _search_bailii_statutes(self, query: str, max_results: int) -> List[LegalStatuteResponse]:
+    def _bailii_statutes_call(self, query: str, max_results: int) -> ProviderCall:
         """Search BAILII for legal statutes"""
-        statutes = []
-        
-        try:
-            # BAILII legislation search
-            search_url = f"https://www.bailii.org/cgi-bin/markup.cgi?doc=/cgi-bin/search.cgi&query={query}&method=boolean&rank=score&rank=date&rank=relevance&sort=score&sort=date&sort=relevance&results=50&start=1"
-            
-            response = requests.get(search_url, timeout=10)
-            if response.status_code == 200:
-                # Parse HTML response (simplified)
-                # In a real implementation, you'd use BeautifulSoup or similar
-                # For now, we'll create mock data based on the query
-                mock_statutes = self._generate_mock_bailii_statutes(query, max_results)
-                statutes.extend(mock_statutes)
-        
-        except Exception as e:
-            print(f"Error searching BAILII statutes: {e}")
-        
-        return statutes
+        return ProviderCall(
+            provider="bailii",
+            label="BAILII statutes",
+            url=self._bailii_search_url(query),
+            parse=lambda html: self._generate_mock_bailii_statutes(query, max_results),
+            expects_json=False,
+        )
+
+    def _bailii_search_url(self, query: str) -> str:
+        return f"https://www.bailii.org/cgi-bin/markup.cgi?doc=/cgi-bin/search.cgi&query={query}&method=boolean&rank=score&rank=date&rank=relevance&sort=score&sort=date&sort=relevance&results=50&start=1"
 
     def _generate_mock_bailii_cases(self, query: str, max_results: int) -> List[LegalCaseResponse]:
         """Generate mock BAILII cases for demonstration"""
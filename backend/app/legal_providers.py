@@ -0,0 +1,245 @@
+import asyncio
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from .config import settings
+from .http_client import get, get_async
+from .provider_cache import provider_cache
+from .provider_guard import provider_guard
+
+
+@dataclass
+class ProviderCall:
+    """One request to an external legal database and how to turn its response into results"""
+    provider: str  # key in the service's legal_apis table
+    label: str  # used in log messages, e.g. "CanLII cases"
+    url: str
+    params: Optional[Dict[str, Any]] = None
+    parse: Callable[[Any], List] = field(default=lambda data: [])  # gets decoded JSON, or text when expects_json is False
+    fallback: Callable[[], List] = list  # results when the request or parsing fails
+    expects_json: bool = True
+    timeout: float = field(default_factory=lambda: settings.LEGAL_PROVIDER_TIMEOUT)  # per HTTP attempt
+    budget: float = field(default_factory=lambda: settings.LEGAL_PROVIDER_BUDGET)  # all attempts together
+    cost: float = 0.0  # what the provider charges per search, for the spend ledger
+
+
+@dataclass
+class ProviderResult:
+    """Outcome of one provider call inside a fan-out"""
+    provider: str
+    label: str
+    items: List
+    # 'ok', 'cached', 'stale', 'empty', 'fallback' (request failed, fallback data used),
+    # 'rate_limited' / 'circuit_open' (not sent, fallback data used), 'timeout' or 'skipped'
+    status: str
+    ms: float
+
+    def report(self) -> Dict[str, Any]:
+        return {"provider": self.provider, "status": self.status, "results": len(self.items), "ms": self.ms}
+
+
+def _accept(call: ProviderCall, key: str, status_code: int, body: Callable[[], Any]) -> List:
+    """Parse a live response; successful ones are cached and charged in the ledger. A 200
+    whose body fails to decode or parse raises before anything is recorded, so the caller
+    counts it as the request's one failure."""
+    if status_code != 200:
+        provider_guard.record(call.provider, ok=status_code < 500 and status_code != 429)
+        return []
+    data = body()
+    items = call.parse(data)
+    provider_guard.record(call.provider, ok=True)
+    provider_cache.put(call.provider, key, data, call.expects_json)
+    provider_cache.record(call.provider, "call", call.cost)
+    return items
+
+
+def _cached(call: ProviderCall, key: str, refresh: Callable[[], None]) -> Optional[Tuple[List, str]]:
+    """Results from the provider cache, starting a background refresh when the entry is stale.
+    An entry that no longer parses is evicted so the caller makes a live request; no request
+    was sent, so it must not count against the provider's circuit breaker."""
+    cached = provider_cache.get(call.provider, key)
+    if cached is None:
+        return None
+    data, stale = cached
+    try:
+        items = call.parse(data)
+    except Exception as e:
+        print(f"⚠️ Dropping unparseable cached {call.label} response: {e}")
+        provider_cache.delete(key)
+        return None
+    if stale and provider_cache.begin_refresh(key):
+        refresh()
+    provider_cache.record(call.provider, "stale" if stale else "hit", call.cost)
+    return items, "stale" if stale else "cached"
+
+
+async def _send_async(call: ProviderCall):
+    """get_async for a request the guard has let through. CancelledError is not an
+    Exception, so without this a cancelled half-open trial would never report back and
+    the circuit would stay half-open."""
+    try:
+        return await get_async(call.url, params=call.params, timeout=call.timeout, budget=call.budget)
+    except asyncio.CancelledError:
+        provider_guard.release(call.provider)
+        raise
+
+
+def _refresh(call: ProviderCall, key: str):
+    try:
+        if provider_guard.acquire(call.provider):
+            return
+        response = get(call.url, params=call.params, timeout=call.timeout, budget=call.budget)
+        _accept(call, key, response.status_code, response.json if call.expects_json else lambda: response.text)
+    except Exception as e:
+        provider_guard.record(call.provider, ok=False)
+        print(f"Error refreshing {call.label}: {e}")
+    finally:
+        provider_cache.end_refresh(key)
+
+
+async def _refresh_async(call: ProviderCall, key: str):
+    try:
+        if provider_guard.acquire(call.provider):
+            return
+        response = await _send_async(call)
+        _accept(call, key, response.status_code, response.json if call.expects_json else lambda: response.text)
+    except Exception as e:
+        provider_guard.record(call.provider, ok=False)
+        print(f"Error refreshing {call.label}: {e}")
+    finally:
+        provider_cache.end_refresh(key)
+
+
+# Keeps background refresh tasks referenced until they finish
+_refresh_tasks = set()
+
+
+def _spawn_refresh_async(call: ProviderCall, key: str):
+    task = asyncio.ensure_future(_refresh_async(call, key))
+    _refresh_tasks.add(task)
+    task.add_done_callback(_refresh_tasks.discard)
+
+
+def _attempt(call: ProviderCall) -> Tuple[List, str]:
+    key = provider_cache.key(call.provider, call.url, call.params)
+    try:
+        cached = _cached(call, key, lambda: _refresh_pool.submit(_refresh, call, key))
+        if cached is not None:
+            return cached
+        blocked = provider_guard.acquire(call.provider)
+        if blocked:
+            return call.fallback(), blocked
+        response = get(call.url, params=call.params, timeout=call.timeout, budget=call.budget)
+        items = _accept(call, key, response.status_code, response.json if call.expects_json else lambda: response.text)
+        return items, "ok" if items else "empty"
+    except Exception as e:
+        provider_guard.record(call.provider, ok=False)
+        print(f"Error searching {call.label}: {e}")
+        return call.fallback(), "fallback"
+
+
+async def _attempt_async(call: ProviderCall) -> Tuple[List, str]:
+    key = provider_cache.key(call.provider, call.url, call.params)
+    try:
+        cached = _cached(call, key, lambda: _spawn_refresh_async(call, key))
+        if cached is not None:
+            return cached
+        blocked = provider_guard.acquire(call.provider)
+        if blocked:
+            return call.fallback(), blocked
+        response = await _send_async(call)
+        items = _accept(call, key, response.status_code, response.json if call.expects_json else lambda: response.text)
+        return items, "ok" if items else "empty"
+    except Exception as e:
+        provider_guard.record(call.provider, ok=False)
+        print(f"Error searching {call.label}: {e}")
+        return call.fallback(), "fallback"
+
+
+def run_provider_call(call: ProviderCall) -> List:
+    """Run a provider call with a blocking HTTP request on the pooled session"""
+    return _attempt(call)[0]
+
+
+async def run_provider_call_async(call: ProviderCall) -> List:
+    """Run a provider call on the event loop without tying up a thread"""
+    return (await _attempt_async(call))[0]
+
+
+ANSWERED = ("ok", "cached", "stale")
+
+# Calls left running after a fan-out deadline hold a thread for at most their budget;
+# stale-cache refreshes get their own threads so such stragglers cannot starve them
+_fan_out_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="legal-provider")
+_refresh_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="legal-refresh")
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+def _unfinished(call: ProviderCall, deadline: float, sufficient: bool, started: float) -> ProviderResult:
+    if sufficient:
+        return ProviderResult(call.provider, call.label, [], "skipped", _elapsed_ms(started))
+    print(f"{call.label} missed the {deadline:.1f}s search deadline; returning without it")
+    return ProviderResult(call.provider, call.label, [], "timeout", round(deadline * 1000, 1))
+
+
+def _sufficient(results: List[ProviderResult], enough: Optional[int]) -> bool:
+    # Only real answers count; fallback data should not cut the wait for a live provider short
+    return enough is not None and sum(len(r.items) for r in results if r.status in ANSWERED) >= enough
+
+
+def fan_out(calls: List[ProviderCall], deadline: Optional[float] = None, enough: Optional[int] = None) -> List[ProviderResult]:
+    """Run provider calls concurrently and return whatever finished within the deadline.
+
+    Each call keeps its own timeout; deadline (LEGAL_SEARCH_DEADLINE by default) bounds the
+    whole fan-out. With enough set, the fan-out also returns as soon as the providers that
+    answered have produced that many results. Calls still running are reported as 'timeout'
+    (or 'skipped' after an early return) and finish in the background.
+    """
+    deadline = settings.LEGAL_SEARCH_DEADLINE if deadline is None else deadline
+    started = time.perf_counter()
+    pending = {_fan_out_pool.submit(_attempt, call): call for call in calls}
+    results: List[ProviderResult] = []
+    while pending and not _sufficient(results, enough):
+        remaining = deadline - (time.perf_counter() - started)
+        if remaining <= 0:
+            break
+        done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            call = pending.pop(future)
+            items, status = future.result()
+            results.append(ProviderResult(call.provider, call.label, items, status, _elapsed_ms(started)))
+    sufficient = _sufficient(results, enough)
+    results.extend(_unfinished(call, deadline, sufficient, started) for call in pending.values())
+    return results
+
+
+async def fan_out_async(calls: List[ProviderCall], deadline: Optional[float] = None, enough: Optional[int] = None) -> List[ProviderResult]:
+    """fan_out on the event loop; calls that miss the deadline are cancelled"""
+    deadline = settings.LEGAL_SEARCH_DEADLINE if deadline is None else deadline
+    started = time.perf_counter()
+    pending = {asyncio.ensure_future(_attempt_async(call)): call for call in calls}
+    results: List[ProviderResult] = []
+    while pending and not _sufficient(results, enough):
+        remaining = deadline - (time.perf_counter() - started)
+        if remaining <= 0:
+            break
+        done, _ = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            call = pending.pop(task)
+            items, status = task.result()
+            results.append(ProviderResult(call.provider, call.label, items, status, _elapsed_ms(started)))
+    sufficient = _sufficient(results, enough)
+    for task, call in pending.items():
+        task.cancel()
+        results.append(_unfinished(call, deadline, sufficient, started))
+    return results
+
+
+def merge_results(results: List[ProviderResult]) -> Tuple[List, Dict[str, Dict[str, Any]]]:
+    """Flatten fan-out results and build the per-call report, keyed by label"""
+    items = [item for result in results for item in result.items]
+    return items, {result.label: result.report() for result in results}
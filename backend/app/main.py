@@ -1,25 +1,42 @@
-from fastapi import FastAPI, UploadFile, File, Depends, HTTPException, Form
+from fastapi import FastAPI, UploadFile, File, Depends, HTTPException, Form, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import BackgroundTasks
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from typing import List
 from datetime import datetime
+import asyncio
+import json
 import os
+import threading
+import time
 import google.generativeai as genai
 from .config import settings
-from .database import Base, engine, get_db
-from .models import User, Document, QueryLog, DocumentAnalysis
+from .database import AsyncSessionLocal, Base, engine, get_async_db, get_db
+from .models import User, Document, QueryLog, DocumentAnalysis, IngestionJob
 from .schemas import *
-from .auth import hash_password, verify_password, create_access_token, get_current_user
-from .ingest import extract_text_from_pdf, extract_text_from_image
-from .rag import upsert_document_chunks, embed_query, pgvector_search, answer_with_citations
+from .auth import hash_password, verify_password, create_access_token, get_current_user, get_current_user_async, require_role
+from .ingest import extract_text_from_bytes
+from .extraction_cache import extraction_cache
+from .ingestion_service import ingest_user_documents
+from .ingestion_worker import enqueue_ingestion_job, ensure_job_columns, run_job, start_worker_processes, stop_worker_processes
+from .rag import ANSWER_MODEL, answer_confidence, answer_with_citations_async, embed_query_async, stream_answer_with_citations_async
+from .streaming import sse_event, sse_response, stream_text_async
+from .answer_cache import answer_cache
+from .retrieval import ensure_text_index, hybrid_search_async, last_leg_report
+from .reranker import reranker
 from .document_analyzer import DocumentAnalyzer
 from .chat_service import ChatService
 from .legal_database import LegalDatabaseService
 from .indian_legal_database import IndianLegalDatabaseService
+from .http_client import close_async_client, close_session
+from .provider_cache import provider_cache
+from .provider_guard import provider_guard
 from .document_risk_analyzer import document_risk_analyzer
-from .simple_vector_similarity import simple_vector_similarity_service
+from .similarity_service import get_similarity_service
+from .embedding_cache import embedding_cache
+from .vector_index import check_embedding_column, ensure_vector_index, validate_embedding_settings, vector_index_status
 
 # Configure Google Gemini API
 genai.configure(api_key=settings.GOOGLE_API_KEY)
@@ -43,9 +60,79 @@ app.add_middleware(
 
 # Create tables and storage dir
 Base.metadata.create_all(bind=engine)
+ensure_job_columns()
 os.makedirs(settings.STORAGE_DIR, exist_ok=True)
 
 
+ingestion_worker_processes = []
+
+
+def _build_search_indexes():
+    ensure_vector_index()
+    ensure_text_index()
+    reranker.warm_up()
+
+
+@app.on_event("startup")
+def check_embedding_schema():
+    """Refuse to start on an embedding column or EMBED_DIM the search path cannot use;
+    the column is changed only by `python -m app.vector_index migrate`"""
+    validate_embedding_settings()
+    check_embedding_column()
+
+
+@app.on_event("startup")
+def start_search_index_build():
+    """Build search indexes in the background; CREATE INDEX CONCURRENTLY can take a while on large tables"""
+    threading.Thread(target=_build_search_indexes, daemon=True).start()
+
+
+@app.on_event("startup")
+def start_ingestion_workers():
+    """Start ingestion worker processes so extraction and embedding stay off the request path"""
+    if settings.INGEST_WORKERS > 0 and settings.INGEST_SPAWN_WORKERS:
+        started = start_worker_processes(settings.INGEST_WORKERS)
+        ingestion_worker_processes.extend(started)
+        if started:
+            print(f"✅ Started {len(started)} ingestion worker process(es)")
+
+
+@app.on_event("shutdown")
+def stop_ingestion_workers():
+    stop_worker_processes(ingestion_worker_processes)
+    ingestion_worker_processes.clear()
+
+
+@app.on_event("shutdown")
+async def close_http_clients():
+    close_session()
+    await close_async_client()
+
+
+def _schedule_ingestion(background: BackgroundTasks, db: Session, user_id: int, document_id: int | None = None) -> IngestionJob:
+    """Queue an ingestion job; without worker processes it runs as a background task after the response"""
+    job = enqueue_ingestion_job(db, user_id, document_id)
+    if settings.INGEST_WORKERS <= 0:
+        background.add_task(run_job, job.id)
+    return job
+
+
+def _job_response(job: IngestionJob) -> IngestJobResponse:
+    return IngestJobResponse(
+        id=job.id,
+        status=job.status,
+        progress=job.progress or 0.0,
+        document_id=job.document_id,
+        total_documents=job.total_documents or 0,
+        processed_documents=job.processed_documents or 0,
+        result=json.loads(job.result) if job.result else None,
+        error_message=job.error_message,
+        created_at=job.created_at.isoformat() if job.created_at else None,
+        started_at=job.started_at.isoformat() if job.started_at else None,
+        finished_at=job.finished_at.isoformat() if job.finished_at else None
+    )
+
+
 @app.get("/health")
 def health():
     """Basic health check endpoint"""
@@ -73,6 +160,14 @@ def health_detailed(db: Session = Depends(get_db)):
         "timestamp": datetime.now().isoformat(),
         "database": db_status,
         "api_keys": api_keys_status,
+        "embedding_cache": embedding_cache.stats(),
+        "extraction_cache": extraction_cache.stats(),
+        "vector_index": vector_index_status(),
+        "retrieval_legs": last_leg_report,
+        "reranker": reranker.stats(),
+        "answer_cache": answer_cache.stats(),
+        "provider_cache": provider_cache.stats(),
+        "legal_providers": provider_guard.status(),
         "storage_dir": settings.STORAGE_DIR,
         "app_env": settings.APP_ENV
     }
@@ -105,6 +200,7 @@ def upload_document(
     background: BackgroundTasks,
     title: str = Form(...),
     file: UploadFile = File(...),
+    auto_ingest: bool = Form(settings.AUTO_INGEST_ON_UPLOAD),
     user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
@@ -116,75 +212,206 @@ def upload_document(
     doc = Document(user_id=user.id, title=title, path=dest_path, content_type=file.content_type or "application/octet-stream")
     db.add(doc)
     db.commit()
-    return {"document_id": doc.id, "title": doc.title}
+    result = {"document_id": doc.id, "title": doc.title}
+    if auto_ingest:
+        job = _schedule_ingestion(background, db, user.id, doc.id)
+        result["ingestion_job_id"] = job.id
+    return result
 
 
 @app.post("/ingest", response_model=IngestResponse)
 def ingest(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    docs = db.query(Document).filter(Document.user_id == user.id).all()
-    total = 0
-    for doc in docs:
-        text = ""
-        if (doc.content_type or "").lower().startswith("application/pdf") or doc.path.lower().endswith(".pdf"):
-            text = extract_text_from_pdf(doc.path)
-        elif doc.path.lower().endswith((".png", ".jpg", ".jpeg")):
-            text = extract_text_from_image(doc.path)
-        else:
-            try:
-                with open(doc.path, "r", encoding="utf-8", errors="ignore") as f:
-                    text = f.read()
-            except Exception:
-                text = ""
-        total += upsert_document_chunks(db, doc, text)
-    return IngestResponse(ingested_chunks=total)
+    """Ingest new or changed documents; unchanged ones are skipped"""
+    report = ingest_user_documents(db, user.id)
+    return IngestResponse(
+        ingested_chunks=report["ingested_chunks"],
+        new_documents=report["new"],
+        updated_documents=report["updated"],
+        skipped_documents=report["skipped"],
+        failed_documents=report["failed"]
+    )
 
 
-@app.post("/query", response_model=QueryResponse)
-def query(req: QueryRequest, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    qvec = embed_query(req.question)
-    hits = pgvector_search(db, qvec, top_k=req.top_k)
-    answer, confidence = answer_with_citations(req.question, hits)
+@app.post("/ingest/jobs", response_model=IngestJobResponse)
+def create_ingest_job(
+    background: BackgroundTasks,
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Queue ingestion of all the user's documents and return immediately"""
+    job = _schedule_ingestion(background, db, user.id)
+    return _job_response(job)
+
+
+@app.get("/ingest/jobs/{job_id}", response_model=IngestJobResponse)
+def get_ingest_job(job_id: int, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Get status, progress and errors of an ingestion job"""
+    job = db.query(IngestionJob).filter(
+        IngestionJob.id == job_id,
+        IngestionJob.user_id == user.id
+    ).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    return _job_response(job)
+
+
+async def _lookup_or_retrieve(req: QueryRequest, user: User, db: AsyncSession):
+    """Answer-cache lookup around retrieval: returns (cache entry or None, hits, chunk ids, question embedding)"""
+    # The question embedding is needed up front only for the near-duplicate lookup; retrieval reuses it
+    question_vec = await embed_query_async(req.question) if answer_cache.semantic else None
+    entry = await db.run_sync(answer_cache.find_similar, user.id, "rag", ANSWER_MODEL, req.question, question_vec)
+    if entry is not None:
+        return entry, [], [], question_vec
+    hits = await hybrid_search_async(
+        req.question, user.id, top_k=reranker.candidate_count(req.top_k),
+        ef_search=req.ef_search, probes=req.probes, query_vec=question_vec,
+    )
+    if reranker.active:
+        # Cross-encoder scoring is CPU-bound; keep it off the event loop
+        hits = await asyncio.to_thread(reranker.rerank, req.question, hits, req.top_k)
+    else:
+        hits = reranker.rerank(req.question, hits, req.top_k)
+    chunk_ids = [chunk.id for chunk, _ in hits]
+    entry = await db.run_sync(answer_cache.get, user.id, "rag", ANSWER_MODEL, req.question, chunk_ids)
+    return entry, hits, chunk_ids, question_vec
+
+
+def _hit_sources(hits) -> List[SourceItem]:
     sources = []
-    doc_ids = []
     for chunk, score in hits:
         doc = chunk.document
-        doc_ids.append(str(doc.id))
         snippet = (chunk.text[:240] + "...") if len(chunk.text) > 240 else chunk.text
         sources.append(SourceItem(document_id=doc.id, title=doc.title, snippet=snippet, page=chunk.page, offset=chunk.offset))
-    log = QueryLog(user_id=user.id, question=req.question, doc_ids=",".join(doc_ids))
+    return sources
+
+
+def _log_query(db: Session, user_id: int, question: str, sources: List[SourceItem]):
+    log = QueryLog(user_id=user_id, question=question, doc_ids=",".join(str(s.document_id) for s in sources))
     db.add(log)
     db.commit()
+
+
+async def _log_query_async(user_id: int, question: str, sources: List[SourceItem]):
+    """_log_query with a fresh session, for stream generators that outlive the request's"""
+    async with AsyncSessionLocal() as db:
+        await db.run_sync(_log_query, user_id, question, sources)
+
+
+@app.post("/query", response_model=QueryResponse)
+async def query(req: QueryRequest, response: Response, user: User = Depends(get_current_user_async), db: AsyncSession = Depends(get_async_db)):
+    entry, hits, chunk_ids, question_vec = await _lookup_or_retrieve(req, user, db)
+    cache_status = answer_cache.status_for(entry, req.question)
+
+    if entry is not None:
+        answer, confidence = entry.answer, entry.confidence
+        sources = [SourceItem(**s) for s in json.loads(entry.sources)]
+    else:
+        answer, confidence = await answer_with_citations_async(req.question, hits)
+        sources = _hit_sources(hits)
+        entry = await db.run_sync(
+            answer_cache.put, user.id, "rag", ANSWER_MODEL, req.question, answer, confidence,
+            [s.model_dump() for s in sources], chunk_ids, question_vec,
+        )
+    answer_cache.set_headers(response, entry, cache_status)
+
+    await db.run_sync(_log_query, user.id, req.question, sources)
     return QueryResponse(answer=answer, sources=sources, confidence=confidence)
 
 
+@app.post("/query/stream")
+async def query_stream(req: QueryRequest, user: User = Depends(get_current_user_async), db: AsyncSession = Depends(get_async_db)):
+    """/query as Server-Sent Events: a 'sources' event first, then 'token' events, then 'done'"""
+    entry, hits, chunk_ids, question_vec = await _lookup_or_retrieve(req, user, db)
+    cache_status = answer_cache.status_for(entry, req.question)
+    headers = answer_cache.headers(entry, cache_status)
+    user_id = user.id
+
+    if entry is not None:
+        cached_sources = json.loads(entry.sources)
+        cached_answer, cached_confidence = entry.answer, entry.confidence
+        await db.run_sync(_log_query, user_id, req.question, [SourceItem(**s) for s in cached_sources])
+
+        async def cached_events():
+            yield sse_event("sources", {"sources": cached_sources, "confidence": cached_confidence})
+            yield sse_event("token", {"text": cached_answer})
+            yield sse_event("done", {"answer": cached_answer, "confidence": cached_confidence, "cached": True})
+
+        return sse_response(cached_events(), headers)
+
+    sources = _hit_sources(hits)
+    confidence = answer_confidence(hits)
+
+    async def events():
+        try:
+            yield sse_event("sources", {"sources": [s.model_dump() for s in sources], "confidence": confidence})
+            parts = []
+            try:
+                async for text_piece in stream_answer_with_citations_async(req.question, hits):
+                    parts.append(text_piece)
+                    yield sse_event("token", {"text": text_piece})
+            except Exception as e:
+                yield sse_event("error", {"detail": f"Error generating answer: {e}"})
+                return
+            answer = "".join(parts) or "No answer."
+            # The request's session is closed once the response starts, so persist with a fresh one
+            async with AsyncSessionLocal() as stream_db:
+                await stream_db.run_sync(
+                    answer_cache.put, user_id, "rag", ANSWER_MODEL, req.question, answer, confidence,
+                    [s.model_dump() for s in sources], chunk_ids, question_vec,
+                )
+            yield sse_event("done", {"answer": answer, "confidence": confidence, "cached": False})
+        finally:
+            # Logged whether the answer completed, failed or the client went away
+            await _log_query_async(user_id, req.question, sources)
+
+    return sse_response(events(), headers)
+
+
 @app.post("/fine-tune")
 def fine_tune_endpoint():
     return {"status": "scheduled", "note": "Use scripts in app/fine_tune to prepare/train/serve LoRA models."}
 
 
+def _gemini_prompt(question: str) -> str:
+    return (
+        "You are LawGPT, a specialized legal assistant. Answer the following legal question "
+        "with accurate information. If you're unsure, indicate the limitations of your knowledge. "
+        f"Question: {question}"
+    )
+
+
+async def _gemini_cache_lookup(req: QueryRequest, user: User, db: AsyncSession):
+    question_vec = await embed_query_async(req.question) if answer_cache.semantic else None
+    entry = (
+        await db.run_sync(answer_cache.find_similar, user.id, "gemini", ANSWER_MODEL, req.question, question_vec)
+        or await db.run_sync(answer_cache.get, user.id, "gemini", ANSWER_MODEL, req.question)
+    )
+    return entry, question_vec
+
+
 @app.post("/gemini-query", response_model=QueryResponse)
-def gemini_query(req: QueryRequest, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def gemini_query(req: QueryRequest, response: Response, user: User = Depends(get_current_user_async), db: AsyncSession = Depends(get_async_db)):
     """Direct query to Google Gemini API for legal questions without RAG"""
     try:
         # Log the query
-        log = QueryLog(user_id=user.id, question=req.question, doc_ids="")
-        db.add(log)
-        db.commit()
-        
-        # Create the prompt for legal questions
-        prompt = (
-            "You are LawGPT, a specialized legal assistant. Answer the following legal question "
-            "with accurate information. If you're unsure, indicate the limitations of your knowledge. "
-            f"Question: {req.question}"
-        )
+        await db.run_sync(_log_query, user.id, req.question, [])
+
+        entry, question_vec = await _gemini_cache_lookup(req, user, db)
+        cache_status = answer_cache.status_for(entry, req.question)
+        if entry is not None:
+            answer_cache.set_headers(response, entry, cache_status)
+            return QueryResponse(answer=entry.answer, sources=[], confidence=entry.confidence)
         
         # Call Gemini API
-        model = genai.GenerativeModel("gemini-2.0-flash")
-        response = model.generate_content(prompt)
-        answer = getattr(response, "text", None) or "Sorry, I couldn't generate a response."
+        model = genai.GenerativeModel(ANSWER_MODEL)
+        gemini_response = await model.generate_content_async(_gemini_prompt(req.question))
+        answer = getattr(gemini_response, "text", None)
+        if answer:
+            entry = await db.run_sync(answer_cache.put, user.id, "gemini", ANSWER_MODEL, req.question, answer, "medium", [], None, question_vec)
+        answer_cache.set_headers(response, entry, cache_status)
         
         return QueryResponse(
-            answer=answer,
+            answer=answer or "Sorry, I couldn't generate a response.",
             sources=[],  # No sources for direct Gemini queries
             confidence="medium"  # Default confidence level
         )
@@ -192,6 +419,43 @@ def gemini_query(req: QueryRequest, user: User = Depends(get_current_user), db:
         raise HTTPException(status_code=500, detail=f"Error querying Gemini API: {str(e)}")
 
 
+@app.post("/gemini-query/stream")
+async def gemini_query_stream(req: QueryRequest, user: User = Depends(get_current_user_async), db: AsyncSession = Depends(get_async_db)):
+    """/gemini-query as Server-Sent Events: 'token' events as Gemini generates, then 'done'"""
+    await db.run_sync(_log_query, user.id, req.question, [])
+    entry, question_vec = await _gemini_cache_lookup(req, user, db)
+    cache_status = answer_cache.status_for(entry, req.question)
+    headers = answer_cache.headers(entry, cache_status)
+    user_id = user.id
+    cached_answer = entry.answer if entry is not None else None
+
+    async def events():
+        yield sse_event("sources", {"sources": [], "confidence": "medium"})
+        if cached_answer is not None:
+            yield sse_event("token", {"text": cached_answer})
+            yield sse_event("done", {"answer": cached_answer, "confidence": "medium", "cached": True})
+            return
+        parts = []
+        try:
+            async for text_piece in stream_text_async(genai.GenerativeModel(ANSWER_MODEL), _gemini_prompt(req.question)):
+                parts.append(text_piece)
+                yield sse_event("token", {"text": text_piece})
+        except Exception as e:
+            yield sse_event("error", {"detail": f"Error querying Gemini API: {e}"})
+            return
+        answer = "".join(parts)
+        if answer:
+            async with AsyncSessionLocal() as stream_db:
+                await stream_db.run_sync(answer_cache.put, user_id, "gemini", ANSWER_MODEL, req.question, answer, "medium", [], None, question_vec)
+        yield sse_event("done", {
+            "answer": answer or "Sorry, I couldn't generate a response.",
+            "confidence": "medium",
+            "cached": False,
+        })
+
+    return sse_response(events(), headers)
+
+
 @app.post("/analyze-document", response_model=DocumentAnalysisResponse)
 def analyze_document(
     req: DocumentAnalysisRequest, 
@@ -410,6 +674,22 @@ def send_message(
     return response
 
 
+@app.post("/chat/sessions/{session_id}/messages/stream")
+def send_message_stream(
+    session_id: int,
+    req: SendMessageRequest,
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Send a message in a chat session and stream the reply as Server-Sent Events"""
+    chat_service = ChatService()
+    req.session_id = session_id  # Ensure session_id matches the URL parameter
+    events = chat_service.stream_message(db, user.id, req)
+    if events is None:
+        raise HTTPException(status_code=404, detail="Chat session not found")
+    return sse_response(events)
+
+
 @app.delete("/chat/sessions/{session_id}")
 def delete_chat_session(
     session_id: int,
@@ -441,28 +721,32 @@ def rename_chat_session(
 
 # Legal Database Endpoints
 @app.post("/legal-research", response_model=LegalResearchResponse)
-def legal_research(
+async def legal_research(
     req: QueryRequest,
-    user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Search legal databases for cases and statutes"""
     try:
         legal_service = LegalDatabaseService()
+        started = time.perf_counter()
         
-        # Search for cases and statutes
-        cases = legal_service.search_legal_cases(req.question, max_results=5)
-        statutes = legal_service.search_legal_statutes(req.question, max_results=5)
+        # Search for cases and statutes concurrently
+        cases, statutes = await asyncio.gather(
+            legal_service.search_legal_cases_async(req.question, max_results=5),
+            legal_service.search_legal_statutes_async(req.question, max_results=5),
+        )
         
         # Save to database for future reference
-        legal_service.save_legal_data_to_db(db, cases, statutes)
+        await db.run_sync(legal_service.save_legal_data_to_db, cases, statutes)
         
         return LegalResearchResponse(
             query=req.question,
             cases=cases,
             statutes=statutes,
             total_results=len(cases) + len(statutes),
-            search_time=0.0  # Would be calculated in real implementation
+            search_time=round(time.perf_counter() - started, 3),
+            providers=legal_service.last_provider_report
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error in legal research: {str(e)}")
@@ -503,33 +787,43 @@ def hybrid_query(
 
 # Indian Legal Database Endpoints
 @app.post("/indian-legal-research", response_model=LegalResearchResponse)
-def indian_legal_research(
+async def indian_legal_research(
     req: QueryRequest,
-    user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Search Indian legal databases for cases and statutes"""
     try:
         indian_legal_service = IndianLegalDatabaseService()
+        started = time.perf_counter()
         
-        # Search for Indian cases and statutes
-        cases = indian_legal_service.search_indian_cases(req.question, max_results=5)
-        statutes = indian_legal_service.search_indian_statutes(req.question, max_results=5)
+        # Search for Indian cases and statutes concurrently
+        cases, statutes = await asyncio.gather(
+            indian_legal_service.search_indian_cases_async(req.question, max_results=5),
+            indian_legal_service.search_indian_statutes_async(req.question, max_results=5),
+        )
         
         # Save to database for future reference
-        indian_legal_service.save_indian_legal_data_to_db(db, cases, statutes)
+        await db.run_sync(indian_legal_service.save_indian_legal_data_to_db, cases, statutes)
         
         return LegalResearchResponse(
             query=req.question,
             cases=cases,
             statutes=statutes,
             total_results=len(cases) + len(statutes),
-            search_time=0.0  # Would be calculated in real implementation
+            search_time=round(time.perf_counter() - started, 3),
+            providers=indian_legal_service.last_provider_report
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error in Indian legal research: {str(e)}")
 
 
+@app.get("/legal-providers/ledger")
+def legal_provider_ledger(days: int | None = None, user: User = Depends(require_role("admin"))):
+    """Spend on paid legal database searches, incurred versus avoided by the provider cache"""
+    return {**provider_cache.ledger(days), "cache": provider_cache.stats()}
+
+
 @app.get("/indian-legal/courts")
 def get_indian_courts():
     """Get list of available Indian courts"""
@@ -545,52 +839,54 @@ def get_indian_jurisdictions():
 
 
 @app.post("/indian-legal/cases/search")
-def search_indian_cases(
+async def search_indian_cases(
     query: str = Form(...),
     court: str = Form("all"),
     max_results: int = Form(10),
-    user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Search specifically for Indian legal cases"""
     try:
         indian_legal_service = IndianLegalDatabaseService()
-        cases = indian_legal_service.search_indian_cases(query, court, max_results)
+        cases = await indian_legal_service.search_indian_cases_async(query, court, max_results)
         
         # Save to database
-        indian_legal_service.save_indian_legal_data_to_db(db, cases, [])
+        await db.run_sync(indian_legal_service.save_indian_legal_data_to_db, cases, [])
         
         return {
             "query": query,
             "court": court,
             "cases": cases,
-            "total_results": len(cases)
+            "total_results": len(cases),
+            "providers": indian_legal_service.last_provider_report
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error searching Indian cases: {str(e)}")
 
 
 @app.post("/indian-legal/statutes/search")
-def search_indian_statutes(
+async def search_indian_statutes(
     query: str = Form(...),
     jurisdiction: str = Form("all"),
     max_results: int = Form(10),
-    user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Search specifically for Indian legal statutes"""
     try:
         indian_legal_service = IndianLegalDatabaseService()
-        statutes = indian_legal_service.search_indian_statutes(query, jurisdiction, max_results)
+        statutes = await indian_legal_service.search_indian_statutes_async(query, jurisdiction, max_results)
         
         # Save to database
-        indian_legal_service.save_indian_legal_data_to_db(db, [], statutes)
+        await db.run_sync(indian_legal_service.save_indian_legal_data_to_db, [], statutes)
         
         return {
             "query": query,
             "jurisdiction": jurisdiction,
             "statutes": statutes,
-            "total_results": len(statutes)
+            "total_results": len(statutes),
+            "providers": indian_legal_service.last_provider_report
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error searching Indian statutes: {str(e)}")
@@ -657,8 +953,7 @@ def analyze_case_document(
         
         # Extract text based on file type
         if file.filename.lower().endswith('.pdf'):
-            from .ingest import extract_text_from_pdf
-            case_text = extract_text_from_pdf(content)
+            case_text = extract_text_from_bytes(content, file.filename)
         elif file.filename.lower().endswith(('.txt', '.doc', '.docx')):
             case_text = content.decode('utf-8')
         else:
@@ -705,8 +1000,7 @@ def analyze_document_risks(
         
         # Extract text based on file type
         if file.filename.lower().endswith('.pdf'):
-            from .ingest import extract_text_from_pdf
-            document_text = extract_text_from_pdf(content)
+            document_text = extract_text_from_bytes(content, file.filename)
         elif file.filename.lower().endswith(('.txt', '.doc', '.docx')):
             document_text = content.decode('utf-8')
         else:
@@ -743,7 +1037,7 @@ def find_similar_cases_vector(
     """Find similar cases using FAISS vector similarity"""
     try:
         # Use simple similarity to find similar cases
-        similar_cases = simple_vector_similarity_service.find_similar_cases(case_text, max_results)
+        similar_cases = get_similarity_service().find_similar_cases(case_text, max_results)
         
         return {
             "similar_cases": similar_cases,
@@ -777,21 +1071,21 @@ def add_cases_to_vector_index(
                 title=case.title,
                 court=case.court,
                 jurisdiction=case.jurisdiction,
-                case_date=case.case_date,
+                case_date=case.case_date.isoformat() if case.case_date else None,
                 case_type=case.case_type,
                 summary=case.summary,
                 citation=case.citation,
-                source=case.source,
-                relevance_score=case.relevance_score
+                source=case.source
             )
             case_responses.append(case_response)
         
-        # Add to similarity index
-        simple_vector_similarity_service.add_cases_to_index(case_responses)
+        # Upsert by case_id, so calling this again does not index cases twice
+        counts = get_similarity_service().add_cases_to_index(case_responses)
         
         return {
-            "message": f"Successfully added {len(case_responses)} cases to vector index",
-            "added_count": len(case_responses)
+            "message": f"Indexed {len(case_responses)} cases ({counts['added']} new, {counts['updated']} updated)",
+            "added_count": counts["added"],
+            "updated_count": counts["updated"]
         }
         
     except Exception as e:
@@ -1,12 +1,20 @@
 from datetime import datetime
 from typing import Optional
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, LargeBinary
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from sqlalchemy.sql import func
-from pgvector.sqlalchemy import Vector
+from pgvector.sqlalchemy import HALFVEC, Vector
+from .config import settings
 from .database import Base
 
 
+def embedding_column_type():
+    """Column type for chunk embeddings as configured by EMBED_STORAGE and EMBED_DIM"""
+    if settings.EMBED_STORAGE.lower() == "halfvec":
+        return HALFVEC(settings.EMBED_DIM)
+    return Vector(settings.EMBED_DIM)
+
+
 class User(Base):
     __tablename__ = "users"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -19,7 +27,7 @@ class User(Base):
 class Document(Base):
     __tablename__ = "documents"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"))
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), index=True)
     title: Mapped[str] = mapped_column(String(255))
     path: Mapped[str] = mapped_column(String(1024))
     content_type: Mapped[str] = mapped_column(String(100))
@@ -32,12 +40,43 @@ class Chunk(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     document_id: Mapped[int] = mapped_column(Integer, ForeignKey("documents.id"), index=True)
     text: Mapped[str] = mapped_column(Text)
-    embedding: Mapped[Vector] = mapped_column(Vector(3072))
+    embedding: Mapped[Vector] = mapped_column(embedding_column_type())
     page: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
     offset: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
     document = relationship("Document")
 
 
+class DocumentIngestion(Base):
+    __tablename__ = "document_ingestions"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    document_id: Mapped[int] = mapped_column(Integer, ForeignKey("documents.id"), unique=True, index=True)
+    content_hash: Mapped[str] = mapped_column(String(64))  # sha256 of the file bytes
+    extractor_version: Mapped[str] = mapped_column(String(20))
+    chunk_count: Mapped[int] = mapped_column(Integer, default=0)
+    ingested_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    document = relationship("Document")
+
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), index=True)
+    document_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("documents.id"), nullable=True)  # None = all of the user's documents
+    status: Mapped[str] = mapped_column(String(20), default="queued", index=True)  # 'queued', 'running', 'completed', 'failed'
+    progress: Mapped[float] = mapped_column(default=0.0)  # 0.0 - 1.0
+    total_documents: Mapped[int] = mapped_column(Integer, default=0)
+    processed_documents: Mapped[int] = mapped_column(Integer, default=0)
+    result: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # JSON ingestion report
+    error_message: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    worker_id: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
+    attempts: Mapped[int] = mapped_column(Integer, default=0)  # times claimed by a worker
+    lease_expires_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)  # renewed while running
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    user = relationship("User")
+
+
 class QueryLog(Base):
     __tablename__ = "query_logs"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -47,10 +86,28 @@ class QueryLog(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
 
+class AnswerCacheEntry(Base):
+    __tablename__ = "answer_cache"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), index=True)
+    scope: Mapped[str] = mapped_column(String(20))  # 'rag' (/query) or 'gemini' (/gemini-query)
+    model: Mapped[str] = mapped_column(String(100))
+    question: Mapped[str] = mapped_column(Text)  # normalized question
+    question_hash: Mapped[str] = mapped_column(String(64), index=True)
+    chunk_key: Mapped[str] = mapped_column(String(64), default="")  # hash of the retrieved chunk ids, in prompt order
+    question_embedding: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)  # float32, for near-duplicate lookup
+    answer: Mapped[str] = mapped_column(Text)
+    confidence: Mapped[str] = mapped_column(String(20))
+    sources: Mapped[str] = mapped_column(Text, default="[]")  # JSON list of SourceItem
+    hit_count: Mapped[int] = mapped_column(Integer, default=0)
+    expires_at: Mapped[float] = mapped_column(index=True)  # unix time
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+
 class ChatSession(Base):
     __tablename__ = "chat_sessions"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"))
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), index=True)
     title: Mapped[str] = mapped_column(String(255))
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,238 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+from .config import settings
+from .embedding_cache import EmbeddingCache
+
+# Query parameters that identify the caller rather than the search
+SECRET_PARAMS = ("api_key", "apikey", "key", "token")
+
+
+class ProviderCache:
+    """Persistent cache of legal database responses with a spend ledger.
+
+    Entries are keyed by (provider, endpoint URL, normalized params without credentials)
+    and are fresh for the provider's TTL (PROVIDER_CACHE_TTLS, else PROVIDER_CACHE_TTL).
+    For PROVIDER_CACHE_STALE_TTL seconds after that they are still served, while the
+    caller refreshes them in the background. The ledger counts, per provider and day,
+    calls made and answered from cache, and the spend incurred and avoided.
+    """
+
+    def __init__(self, path: str, default_ttl: int, ttls: Dict[str, int], stale_ttl: int, max_entries: int, enabled: bool = True):
+        self.path = path
+        self.default_ttl = default_ttl
+        self.ttls = ttls
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._conn = None
+        self._size = 0
+
+        if not self.enabled:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " provider TEXT NOT NULL,"
+                " body TEXT NOT NULL,"
+                " is_json INTEGER NOT NULL,"
+                " fetched_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_fetched_at ON responses (fetched_at)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS ledger ("
+                " provider TEXT NOT NULL,"
+                " day TEXT NOT NULL,"
+                " calls INTEGER NOT NULL DEFAULT 0,"
+                " cache_hits INTEGER NOT NULL DEFAULT 0,"
+                " stale_hits INTEGER NOT NULL DEFAULT 0,"
+                " spent REAL NOT NULL DEFAULT 0,"
+                " avoided REAL NOT NULL DEFAULT 0,"
+                " PRIMARY KEY (provider, day))"
+            )
+            self._conn.commit()
+            self._size = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        except Exception as e:
+            print(f"⚠️  Provider cache disabled: {e}")
+            self._conn = None
+            self.enabled = False
+
+    @staticmethod
+    def key(provider: str, url: str, params: Optional[Dict[str, Any]]) -> str:
+        normalized = {
+            k: EmbeddingCache.normalize(v).casefold() if isinstance(v, str) else v
+            for k, v in (params or {}).items()
+            if k.lower() not in SECRET_PARAMS
+        }
+        raw = f"{provider}|{url}|{json.dumps(normalized, sort_keys=True, default=str)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def ttl_for(self, provider: str) -> int:
+        return self.ttls.get(provider, self.default_ttl)
+
+    def get(self, provider: str, key: str) -> Optional[Tuple[Any, bool]]:
+        """(body, is_stale) for a usable entry, None when missing or past the stale window"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            row = self._conn.execute("SELECT body, is_json, fetched_at FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        body, is_json, fetched_at = row
+        age = time.time() - fetched_at
+        ttl = self.ttl_for(provider)
+        if age > ttl + self.stale_ttl:
+            self.misses += 1
+            return None
+        stale = age > ttl
+        if stale:
+            self.stale_hits += 1
+        else:
+            self.hits += 1
+        return (json.loads(body) if is_json else body), stale
+
+    def put(self, provider: str, key: str, body: Any, is_json: bool):
+        if not self.enabled:
+            return
+        with self._lock:
+            try:
+                before = self._conn.total_changes
+                exists = self._conn.execute("SELECT 1 FROM responses WHERE key = ?", (key,)).fetchone() is not None
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, provider, body, is_json, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, provider, json.dumps(body) if is_json else body, int(is_json), time.time())
+                )
+                if not exists:
+                    self._size += self._conn.total_changes - before
+                overflow = self._size - self.max_entries
+                if overflow > 0:
+                    self._conn.execute(
+                        "DELETE FROM responses WHERE key IN "
+                        "(SELECT key FROM responses ORDER BY fetched_at LIMIT ?)",
+                        (overflow,)
+                    )
+                    self._size -= overflow
+                self._conn.commit()
+            except Exception as e:
+                print(f"Error writing provider cache: {e}")
+                self._conn.rollback()
+
+    def delete(self, key: str):
+        """Drop an entry, e.g. one whose body no longer parses"""
+        if not self.enabled:
+            return
+        with self._lock:
+            try:
+                before = self._conn.total_changes
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._size -= self._conn.total_changes - before
+                self._conn.commit()
+            except Exception as e:
+                print(f"Error writing provider cache: {e}")
+                self._conn.rollback()
+
+    def begin_refresh(self, key: str) -> bool:
+        """Claim a background refresh of a stale entry; False if one is already running"""
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def end_refresh(self, key: str):
+        with self._lock:
+            self._refreshing.discard(key)
+
+    def record(self, provider: str, outcome: str, cost: float):
+        """Ledger entry for one search: outcome is 'call', 'hit' or 'stale'"""
+        if not self.enabled:
+            return
+        calls, hits, stale = int(outcome == "call"), int(outcome == "hit"), int(outcome == "stale")
+        spent = cost if outcome == "call" else 0.0
+        avoided = 0.0 if outcome == "call" else cost
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT INTO ledger (provider, day, calls, cache_hits, stale_hits, spent, avoided) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (provider, day) DO UPDATE SET "
+                    "calls = calls + excluded.calls, cache_hits = cache_hits + excluded.cache_hits, "
+                    "stale_hits = stale_hits + excluded.stale_hits, spent = spent + excluded.spent, "
+                    "avoided = avoided + excluded.avoided",
+                    (provider, date.today().isoformat(), calls, hits, stale, spent, avoided)
+                )
+                self._conn.commit()
+            except Exception as e:
+                print(f"Error writing provider ledger: {e}")
+                self._conn.rollback()
+
+    def ledger(self, days: Optional[int] = None) -> Dict[str, Any]:
+        """Per-provider totals, optionally limited to the last `days` days, plus a grand total"""
+        if not self.enabled:
+            return {"providers": [], "totals": {}}
+        query = (
+            "SELECT provider, SUM(calls), SUM(cache_hits), SUM(stale_hits), SUM(spent), SUM(avoided) "
+            "FROM ledger {where} GROUP BY provider ORDER BY provider"
+        )
+        args: Tuple = ()
+        if days:
+            query = query.format(where="WHERE day >= date('now', ?)")
+            args = (f"-{int(days) - 1} days",)
+        else:
+            query = query.format(where="")
+        with self._lock:
+            rows = self._conn.execute(query, args).fetchall()
+        providers: List[Dict[str, Any]] = [
+            {
+                "provider": provider,
+                "calls": calls,
+                "cache_hits": hits,
+                "stale_hits": stale,
+                "spent": round(spent, 2),
+                "avoided": round(avoided, 2),
+            }
+            for provider, calls, hits, stale, spent, avoided in rows
+        ]
+        totals = {
+            field: round(sum(p[field] for p in providers), 2) if field in ("spent", "avoided") else sum(p[field] for p in providers)
+            for field in ("calls", "cache_hits", "stale_hits", "spent", "avoided")
+        }
+        return {"providers": providers, "totals": totals}
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": self._size,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Global instance
+provider_cache = ProviderCache(
+    settings.PROVIDER_CACHE_PATH,
+    settings.PROVIDER_CACHE_TTL,
+    settings.PROVIDER_CACHE_TTLS,
+    settings.PROVIDER_CACHE_STALE_TTL,
+    settings.PROVIDER_CACHE_MAX_ENTRIES,
+    enabled=settings.PROVIDER_CACHE_ENABLED,
+)
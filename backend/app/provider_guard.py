@@ -0,0 +1,153 @@
+import threading
+import time
+from typing import Any, Dict, Optional
+from .config import settings
+
+
+class TokenBucket:
+    """Allows `rate` requests per second on average with bursts of up to `burst`"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class CircuitBreaker:
+    """closed -> open after `threshold` consecutive failures; after `cooldown` seconds one
+    trial request is let through (half_open), which closes or re-opens the circuit. A trial
+    that reports nothing within another cooldown is given up and the next caller gets one."""
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_at = 0.0
+        self.trips = 0
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        now = time.monotonic()
+        if (self.state == "open" and now - self.opened_at >= self.cooldown) or (
+            self.state == "half_open" and now - self.trial_at >= self.cooldown
+        ):
+            self.state = "half_open"
+            self.trial_at = now
+            return True
+        # Open, or half-open with the trial request still in flight
+        return False
+
+    def release(self):
+        """The trial request was abandoned without an outcome; let the next caller try"""
+        if self.state == "half_open":
+            self.state = "open"
+
+    def success(self):
+        self.state = "closed"
+        self.failures = 0
+
+    def failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.threshold:
+            if self.state != "open":
+                self.trips += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+
+class ProviderGuard:
+    """Per-provider rate limiting and circuit breaking for external legal databases.
+
+    acquire() is checked before every live request and never waits: a provider without a
+    free token or with an open circuit is skipped for this search, so a slow or failing
+    upstream cannot hold request workers for its full timeout.
+    """
+
+    def __init__(self, rates: Dict[str, float], default_rate: float, burst: int, threshold: int, cooldown: float):
+        self.rates = rates
+        self.default_rate = default_rate
+        self.burst = burst
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._rejected: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def _state(self, provider: str):
+        if provider not in self._buckets:
+            self._buckets[provider] = TokenBucket(self.rates.get(provider, self.default_rate), self.burst)
+            self._breakers[provider] = CircuitBreaker(self.threshold, self.cooldown)
+            self._rejected[provider] = {"rate_limited": 0, "circuit_open": 0}
+        return self._buckets[provider], self._breakers[provider]
+
+    def acquire(self, provider: str) -> Optional[str]:
+        """None if a request may go out now, else why not: 'circuit_open' or 'rate_limited'"""
+        with self._lock:
+            bucket, breaker = self._state(provider)
+            if not breaker.allow():
+                reason = "circuit_open"
+            elif not bucket.take():
+                if breaker.state == "half_open":
+                    # Give the trial slot back; the next caller with a token gets it
+                    breaker.state = "open"
+                reason = "rate_limited"
+            else:
+                return None
+            self._rejected[provider][reason] += 1
+            return reason
+
+    def release(self, provider: str):
+        """Call instead of record() when an acquired request is cancelled before it completes"""
+        with self._lock:
+            _, breaker = self._state(provider)
+            breaker.release()
+
+    def record(self, provider: str, ok: bool):
+        with self._lock:
+            _, breaker = self._state(provider)
+            previous = breaker.state
+            if ok:
+                breaker.success()
+            else:
+                breaker.failure()
+            if breaker.state != previous and breaker.state in ("open", "closed"):
+                print(f"{'⚠️  Circuit opened' if breaker.state == 'open' else '✅ Circuit closed'} for legal provider '{provider}'")
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                provider: {
+                    "circuit": breaker.state,
+                    "consecutive_failures": breaker.failures,
+                    "trips": breaker.trips,
+                    "retry_in": round(max(0.0, breaker.cooldown - (time.monotonic() - breaker.opened_at)), 1) if breaker.state == "open" else 0.0,
+                    "rate_per_sec": self._buckets[provider].rate,
+                    "tokens": round(self._buckets[provider].tokens, 2),
+                    **self._rejected[provider],
+                }
+                for provider, breaker in self._breakers.items()
+            }
+
+
+# Global instance
+provider_guard = ProviderGuard(
+    settings.PROVIDER_RATE_LIMITS,
+    settings.PROVIDER_RATE_LIMIT_DEFAULT,
+    settings.PROVIDER_RATE_BURST,
+    settings.PROVIDER_BREAKER_THRESHOLD,
+    settings.PROVIDER_BREAKER_COOLDOWN,
+)
@@ -1,78 +1,232 @@
-from typing import List, Tuple
-from sqlalchemy.orm import Session
-from sqlalchemy import text as sqltext
+from typing import AsyncIterator, Iterable, Iterator, List, Optional, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
+import random
+import time
+from sqlalchemy.orm import Session, contains_eager
+from sqlalchemy import delete, insert, select
 from .models import Document, Chunk
 from .config import settings
+from .embedding_cache import embedding_cache
+from .chunking import iter_chunks
+from .vector_index import apply_search_params, candidate_distance
+from .streaming import stream_text, stream_text_async
 import google.generativeai as genai
+import numpy as np
 
-EMBED_DIM = 3072  # Gemini text-embedding-004
+EMBED_MODEL = "text-embedding-004"
+ANSWER_MODEL = "gemini-2.0-flash"
+NATIVE_EMBED_DIM = 768  # Gemini text-embedding-004
+EMBED_DIM = settings.EMBED_DIM
+# Reduced-dimension vectors are different vectors, so they get their own cache namespace
+EMBED_CACHE_MODEL = EMBED_MODEL if EMBED_DIM == NATIVE_EMBED_DIM else f"{EMBED_MODEL}@{EMBED_DIM}"
 
 genai.configure(api_key=settings.GOOGLE_API_KEY)
 
 
-def chunk_text(text: str, chunk_size: int = 800, overlap: int = 100) -> List[str]:
-    chunks: List[str] = []
-    start = 0
-    while start < len(text):
-        end = min(len(text), start + chunk_size)
-        chunks.append(text[start:end])
-        if end == len(text):
-            break
-        start = max(0, end - overlap)
-    return chunks
+def chunk_text(text: str, max_tokens: Optional[int] = None, overlap_tokens: Optional[int] = None) -> List[str]:
+    return [c.text for c in iter_chunks(
+        [(None, text)],
+        max_tokens or settings.CHUNK_MAX_TOKENS,
+        settings.CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens,
+    )]
+
+
+def _embed_kwargs() -> dict:
+    if EMBED_DIM < NATIVE_EMBED_DIM:
+        return {"output_dimensionality": EMBED_DIM}
+    return {}
 
 
 def _embed(content: str) -> List[float]:
-    resp = genai.embed_content(model="text-embedding-004", content=content)
+    resp = genai.embed_content(model=EMBED_MODEL, content=content, **_embed_kwargs())
     return resp["embedding"]
 
 
-def upsert_document_chunks(db: Session, doc: Document, text: str):
-    chunks = chunk_text(text)
-    if not chunks:
-        return 0
-    vectors = [_embed(ch) for ch in chunks]
-    for idx, (ch, vec) in enumerate(zip(chunks, vectors)):
-        c = Chunk(document_id=doc.id, text=ch, page=None, offset=idx * 800)
-        db.add(c)
-        db.flush()
-        db.execute(sqltext("UPDATE chunks SET embedding = :vec WHERE id = :id"), {"vec": vec, "id": c.id})
-    db.commit()
-    return len(chunks)
-
-
-def pgvector_search(db: Session, query_vec: List[float], top_k: int = 3) -> List[Tuple[Chunk, float]]:
-    sql = """
-    SELECT id, 1 - (embedding <=> :q) AS score
-    FROM chunks
-    ORDER BY embedding <=> :q
-    LIMIT :k
-    """
-    rows = db.execute(sqltext(sql), {"q": query_vec, "k": top_k}).fetchall()
-    if not rows:
+async def _embed_async(content: str) -> List[float]:
+    resp = await genai.embed_content_async(model=EMBED_MODEL, content=content, **_embed_kwargs())
+    return resp["embedding"]
+
+
+def _embed_batch(contents: List[str]) -> List[List[float]]:
+    """Embed one batch of texts in a single API call, retrying with jittered backoff"""
+    attempt = 0
+    while True:
+        try:
+            resp = genai.embed_content(model=EMBED_MODEL, content=contents, **_embed_kwargs())
+            return resp["embedding"]
+        except Exception as e:
+            if attempt >= settings.EMBED_MAX_RETRIES:
+                raise
+            delay = settings.EMBED_RETRY_BACKOFF * (2 ** attempt)
+            delay += random.uniform(0, delay / 2)
+            print(f"Embedding batch of {len(contents)} failed ({e}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+            attempt += 1
+
+
+def embed_texts(texts: List[str]) -> List[List[float]]:
+    """Embed texts through the embedding cache, sending only cache misses to the API"""
+    if not texts:
         return []
-    results: List[Tuple[Chunk, float]] = []
-    for row in rows:
-        chunk = db.query(Chunk).filter(Chunk.id == row[0]).first()
-        if chunk is not None:
-            results.append((chunk, float(row[1])))
-    return results
+    vectors = embedding_cache.get_many(EMBED_CACHE_MODEL, texts)
+    missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+    if missing:
+        fresh = dict(zip(missing, _embed_uncached(missing)))
+        embedding_cache.put_many(EMBED_CACHE_MODEL, missing, [fresh[t] for t in missing])
+        vectors = [v if v is not None else fresh[t] for t, v in zip(texts, vectors)]
+    return vectors
+
+
+def _embed_uncached(texts: List[str]) -> List[List[float]]:
+    """Embed texts in batches of EMBED_BATCH_SIZE with at most EMBED_CONCURRENCY calls in flight"""
+    size = max(1, min(settings.EMBED_BATCH_SIZE, 100))
+    batches = [texts[i:i + size] for i in range(0, len(texts), size)]
+    workers = max(1, min(settings.EMBED_CONCURRENCY, len(batches)))
+    if workers == 1:
+        results = [_embed_batch(batch) for batch in batches]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_embed_batch, batches))  # map keeps batch order
+    return [vec for batch in results for vec in batch]
+
+
+def upsert_document_chunks(
+    db: Session,
+    doc: Document,
+    content: Union[str, Iterable[Tuple[Optional[int], str]]],
+    replace: bool = False,
+    commit: bool = True,
+):
+    """Chunk, embed and store a document's text.
+
+    content is either the full text or a stream of (page_number, text) pieces such as
+    ingest.iter_document_pages; streamed pages are chunked and embedded as they arrive.
+    With replace=True the document's existing chunks are deleted in the same transaction,
+    and commit=False leaves the transaction open so callers can add their own writes to it.
+    """
+    pages = [(None, content)] if isinstance(content, str) else content
+    flush_size = max(1, settings.EMBED_BATCH_SIZE) * max(1, settings.EMBED_CONCURRENCY)
+    rows = []
+    pending: List[Tuple[str, int, Optional[int]]] = []
+
+    def embed_pending():
+        vectors = embed_texts([ch for ch, _, _ in pending])
+        rows.extend(
+            {"document_id": doc.id, "text": ch, "embedding": np.asarray(vec, dtype=np.float32), "page": page, "offset": offset}
+            for (ch, offset, page), vec in zip(pending, vectors)
+        )
+        pending.clear()
+
+    # Embed everything before touching the database so no transaction is held open during API calls
+    for chunk in iter_chunks(pages, settings.CHUNK_MAX_TOKENS, settings.CHUNK_OVERLAP_TOKENS):
+        pending.append((chunk.text, chunk.offset, chunk.page))
+        if len(pending) >= flush_size:
+            embed_pending()
+    if pending:
+        embed_pending()
+
+    if replace:
+        db.execute(delete(Chunk).where(Chunk.document_id == doc.id))
+    for i in range(0, len(rows), 500):
+        db.execute(insert(Chunk), rows[i:i + 500])
+    if commit:
+        db.commit()
+    return len(rows)
+
+
+def pgvector_search(
+    db: Session,
+    query_vec: List[float],
+    user_id: int,
+    top_k: int = 3,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+) -> List[Tuple[Chunk, float]]:
+    """Nearest chunks among the user's documents, fetched with their documents in one query.
+
+    With a quantized index the index distance only picks EMBED_RERANK_FACTOR * top_k
+    candidates, which are then re-ranked by full-precision cosine distance.
+    """
+    full_distance = Chunk.embedding.cosine_distance(query_vec)
+    index_distance, quantized = candidate_distance(Chunk.embedding, query_vec)
+    stmt = (
+        select(Chunk, (1 - full_distance).label("score"))
+        .join(Chunk.document)
+        .options(contains_eager(Chunk.document))
+        .where(Document.user_id == user_id)
+    )
+    if quantized:
+        candidate_count = top_k * max(1, settings.EMBED_RERANK_FACTOR)
+        apply_search_params(db, candidate_count, ef_search, probes)
+        candidates = (
+            select(Chunk.id)
+            .join(Chunk.document)
+            .where(Document.user_id == user_id)
+            .order_by(index_distance)
+            .limit(candidate_count)
+            .subquery()
+        )
+        stmt = stmt.join(candidates, candidates.c.id == Chunk.id)
+    else:
+        apply_search_params(db, top_k, ef_search, probes)
+    stmt = stmt.order_by(full_distance).limit(top_k)
+    return [(chunk, float(score)) for chunk, score in db.execute(stmt).all()]
 
 
 def embed_query(question: str) -> List[float]:
-    return _embed(question)
+    cached = embedding_cache.get_many(EMBED_CACHE_MODEL, [question])[0]
+    if cached is not None:
+        return cached
+    vec = _embed(question)
+    embedding_cache.put_many(EMBED_CACHE_MODEL, [question], [vec])
+    return vec
 
 
-def answer_with_citations(question: str, hits: List[Tuple[Chunk, float]]) -> Tuple[str, str]:
+async def embed_query_async(question: str) -> List[float]:
+    """embed_query without blocking the event loop on the Gemini call"""
+    cached = embedding_cache.get_many(EMBED_CACHE_MODEL, [question])[0]
+    if cached is not None:
+        return cached
+    vec = await _embed_async(question)
+    embedding_cache.put_many(EMBED_CACHE_MODEL, [question], [vec])
+    return vec
+
+
+def _answer_prompt(question: str, hits: List[Tuple[Chunk, float]]) -> str:
     context = "\n\n".join([h[0].text for h in hits]) or "No context"
-    model = genai.GenerativeModel("gemini-2.0-flash")
-    prompt = (
+    return (
         "Answer the legal question using the context.\n\n"
         f"Question:\n{question}\n\nContext:\n{context}\n\n"
         "Include brief citations from the snippets."
     )
-    out = model.generate_content(prompt)
-    answer = getattr(out, "text", None) or "No answer."
+
+
+def answer_confidence(hits: List[Tuple[Chunk, float]]) -> str:
     avg = sum([h[1] for h in hits]) / max(1, len(hits))
-    confidence = "high" if avg > 0.8 else "medium" if avg > 0.6 else "low"
-    return answer, confidence
\ No newline at end of file
+    return "high" if avg > 0.8 else "medium" if avg > 0.6 else "low"
+
+
+def answer_with_citations(question: str, hits: List[Tuple[Chunk, float]]) -> Tuple[str, str]:
+    model = genai.GenerativeModel(ANSWER_MODEL)
+    out = model.generate_content(_answer_prompt(question, hits))
+    answer = getattr(out, "text", None) or "No answer."
+    return answer, answer_confidence(hits)
+
+
+async def answer_with_citations_async(question: str, hits: List[Tuple[Chunk, float]]) -> Tuple[str, str]:
+    model = genai.GenerativeModel(ANSWER_MODEL)
+    out = await model.generate_content_async(_answer_prompt(question, hits))
+    answer = getattr(out, "text", None) or "No answer."
+    return answer, answer_confidence(hits)
+
+
+def stream_answer_with_citations(question: str, hits: List[Tuple[Chunk, float]]) -> Iterator[str]:
+    """Same prompt as answer_with_citations, yielding answer text as Gemini produces it"""
+    model = genai.GenerativeModel(ANSWER_MODEL)
+    yield from stream_text(model, _answer_prompt(question, hits))
+
+
+async def stream_answer_with_citations_async(question: str, hits: List[Tuple[Chunk, float]]) -> AsyncIterator[str]:
+    model = genai.GenerativeModel(ANSWER_MODEL)
+    async for text in stream_text_async(model, _answer_prompt(question, hits)):
+        yield text
@@ -0,0 +1,112 @@
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from .config import settings
+from .models import Chunk
+
+
+class CrossEncoderReranker:
+    """Optional CPU cross-encoder stage between retrieval and generation.
+
+    Scores (question, chunk) pairs in batches and keeps the best top_k. Scores are
+    cached per (question hash, chunk id); the chunk text's CRC is stored with each
+    score so a re-ingested chunk that reuses an id is never served a stale score.
+    """
+
+    def __init__(self, model_name: str, enabled: bool, cache_size: int):
+        self.model_name = model_name
+        self.enabled = enabled
+        self.cache_size = cache_size
+        self._model = None
+        self._load_failed = False
+        self._model_lock = threading.Lock()
+        self._cache: "OrderedDict[Tuple[str, int], Tuple[int, float]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _get_model(self):
+        if self._model is None and not self._load_failed:
+            with self._model_lock:
+                if self._model is None and not self._load_failed:
+                    try:
+                        from sentence_transformers import CrossEncoder
+                        self._model = CrossEncoder(self.model_name, max_length=settings.RERANK_MAX_LENGTH, device="cpu")
+                        print(f"✅ Re-ranker loaded: {self.model_name}")
+                    except Exception as e:
+                        self._load_failed = True
+                        print(f"⚠️  Re-ranker unavailable, keeping retrieval order: {e}")
+        return self._model
+
+    def warm_up(self):
+        if self.enabled:
+            self._get_model()
+
+    @property
+    def active(self) -> bool:
+        return self.enabled and not self._load_failed
+
+    def candidate_count(self, top_k: int) -> int:
+        """How many hits to retrieve so the re-ranker has something to choose from"""
+        return max(top_k, settings.RERANK_CANDIDATES) if self.active else top_k
+
+    def _query_hash(self, question: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{question.strip()}".encode("utf-8")).hexdigest()
+
+    def rerank(self, question: str, hits: List[Tuple[Chunk, float]], top_k: int) -> List[Tuple[Chunk, float]]:
+        """Reorder hits by cross-encoder score and keep top_k; hit scores are left as retrieved"""
+        if not self.active or len(hits) <= 1:
+            return hits[:top_k]
+        model = self._get_model()
+        if model is None:
+            return hits[:top_k]
+
+        query_hash = self._query_hash(question)
+        scores: List[Optional[float]] = []
+        missing: List[int] = []
+        with self._cache_lock:
+            for idx, (chunk, _) in enumerate(hits):
+                key = (query_hash, chunk.id)
+                cached = self._cache.get(key)
+                if cached is not None and cached[0] == zlib.crc32(chunk.text.encode("utf-8")):
+                    self._cache.move_to_end(key)
+                    scores.append(cached[1])
+                    self.hits += 1
+                else:
+                    scores.append(None)
+                    missing.append(idx)
+                    self.misses += 1
+
+        if missing:
+            try:
+                pairs = [(question, hits[idx][0].text) for idx in missing]
+                fresh = model.predict(pairs, batch_size=settings.RERANK_BATCH_SIZE, show_progress_bar=False)
+            except Exception as e:
+                print(f"Re-ranking failed, keeping retrieval order: {e}")
+                return hits[:top_k]
+            with self._cache_lock:
+                for idx, score in zip(missing, fresh):
+                    chunk = hits[idx][0]
+                    scores[idx] = float(score)
+                    self._cache[(query_hash, chunk.id)] = (zlib.crc32(chunk.text.encode("utf-8")), float(score))
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        order = sorted(range(len(hits)), key=lambda i: scores[i], reverse=True)
+        return [hits[i] for i in order[:top_k]]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "model": self.model_name,
+            "loaded": self._model is not None,
+            "cache_entries": len(self._cache),
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Global instance
+reranker = CrossEncoderReranker(settings.RERANK_MODEL, settings.RERANK_ENABLED, settings.RERANK_CACHE_SIZE)
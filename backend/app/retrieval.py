@@ -0,0 +1,336 @@
+"""Hybrid lexical + vector retrieval over a user's document chunks.
+
+The full-text leg (Postgres tsvector or SQLite FTS5) and the vector leg run
+concurrently in their own sessions, each with its own timeout, and their rankings
+are merged with reciprocal rank fusion. A leg that fails or runs out of time is
+dropped instead of failing the query, and its statement is cancelled in the database
+so it does not keep holding a pool thread. hybrid_search_async does the same on the event
+loop with async sessions.
+"""
+import asyncio
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import func, literal_column, select, text
+from sqlalchemy.orm import Session, contains_eager, joinedload
+from .config import settings
+from .database import AsyncSessionLocal, SessionLocal, engine
+from .models import Chunk, Document
+from .rag import embed_query, embed_query_async, pgvector_search
+
+# Must match the expression of the GIN index exactly for the planner to use it
+FTS_CONFIG = literal_column("'english'::regconfig")
+FTS_INDEX_NAME = "ix_chunks_text_fts"
+
+_TERM_RE = re.compile(r"\w+")
+
+_leg_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="retrieval")
+
+# Most recent per-leg timings, surfaced in /health/detailed
+last_leg_report: Dict[str, Dict[str, object]] = {}
+
+
+def _is_postgres() -> bool:
+    return engine.dialect.name == "postgresql"
+
+
+def ensure_text_index():
+    """Create the full-text index: a GIN tsvector index on Postgres, an FTS5 table on SQLite"""
+    try:
+        if _is_postgres():
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                conn.execute(text(
+                    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {FTS_INDEX_NAME} "
+                    f"ON chunks USING gin (to_tsvector('english'::regconfig, text))"
+                ))
+            print(f"✅ Full-text index ready: {FTS_INDEX_NAME}")
+            return
+        with engine.begin() as conn:
+            exists = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'chunks_fts'"
+            )).first()
+            conn.execute(text(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts "
+                "USING fts5(text, content='chunks', content_rowid='id', tokenize='porter unicode61')"
+            ))
+            # External-content FTS5 tables are kept in sync by triggers on the content table
+            conn.execute(text(
+                "CREATE TRIGGER IF NOT EXISTS chunks_fts_ai AFTER INSERT ON chunks BEGIN "
+                "INSERT INTO chunks_fts(rowid, text) VALUES (new.id, new.text); END"
+            ))
+            conn.execute(text(
+                "CREATE TRIGGER IF NOT EXISTS chunks_fts_ad AFTER DELETE ON chunks BEGIN "
+                "INSERT INTO chunks_fts(chunks_fts, rowid, text) VALUES ('delete', old.id, old.text); END"
+            ))
+            conn.execute(text(
+                "CREATE TRIGGER IF NOT EXISTS chunks_fts_au AFTER UPDATE ON chunks BEGIN "
+                "INSERT INTO chunks_fts(chunks_fts, rowid, text) VALUES ('delete', old.id, old.text); "
+                "INSERT INTO chunks_fts(rowid, text) VALUES (new.id, new.text); END"
+            ))
+            if not exists:
+                conn.execute(text("INSERT INTO chunks_fts(chunks_fts) VALUES ('rebuild')"))
+        print("✅ Full-text index ready: chunks_fts")
+    except Exception as e:
+        print(f"⚠️  Could not create full-text index: {e}")
+
+
+def _query_terms(question: str) -> List[str]:
+    return list(dict.fromkeys(t.lower() for t in _TERM_RE.findall(question)))
+
+
+def _set_statement_timeout(db: Session, seconds: float):
+    """Let Postgres cancel a leg that overruns its budget instead of leaving it running"""
+    if _is_postgres():
+        db.execute(text("SELECT set_config('statement_timeout', :v, true)"), {"v": str(max(1, int(seconds * 1000)))})
+
+
+def lexical_search(db: Session, question: str, user_id: int, limit: int) -> List[Tuple[Chunk, float]]:
+    """Chunks of the user's documents matching any query term, best full-text rank first"""
+    terms = _query_terms(question)
+    if not terms:
+        return []
+    if _is_postgres():
+        # OR the terms so a chunk citing "Section 138" matches without every other word
+        ts_query = func.to_tsquery(FTS_CONFIG, " | ".join(terms))
+        ts_vector = func.to_tsvector(FTS_CONFIG, Chunk.text)
+        rank = func.ts_rank_cd(ts_vector, ts_query)
+        stmt = (
+            select(Chunk, rank.label("rank"))
+            .join(Chunk.document)
+            .options(contains_eager(Chunk.document))
+            .where(Document.user_id == user_id, ts_vector.op("@@")(ts_query))
+            .order_by(rank.desc())
+            .limit(limit)
+        )
+        return [(chunk, float(r)) for chunk, r in db.execute(stmt).all()]
+
+    match = " OR ".join('"' + t.replace('"', '""') + '"' for t in terms)
+    rows = db.execute(text(
+        "SELECT chunks_fts.rowid, bm25(chunks_fts) AS rank FROM chunks_fts "
+        "JOIN chunks ON chunks.id = chunks_fts.rowid "
+        "JOIN documents ON documents.id = chunks.document_id "
+        "WHERE chunks_fts MATCH :match AND documents.user_id = :user_id "
+        "ORDER BY rank LIMIT :limit"
+    ), {"match": match, "user_id": user_id, "limit": limit}).fetchall()
+    if not rows:
+        return []
+    by_id = {
+        c.id: c for c in db.execute(
+            select(Chunk).options(joinedload(Chunk.document)).where(Chunk.id.in_([r[0] for r in rows]))
+        ).scalars()
+    }
+    # bm25() is lower-is-better; negate so larger means more relevant like ts_rank_cd
+    return [(by_id[r[0]], -float(r[1])) for r in rows if r[0] in by_id]
+
+
+def _set_sqlite_deadline(db: Session, deadline: float, cancelled: threading.Event):
+    """SQLite counterpart of the statement timeout: abort the running query once the leg is given up"""
+    def check():
+        return 1 if cancelled.is_set() or time.perf_counter() > deadline else 0
+    db.connection().connection.driver_connection.set_progress_handler(check, 10000)
+
+
+def _clear_sqlite_deadline(db: Session):
+    db.connection().connection.driver_connection.set_progress_handler(None, 0)
+
+
+class _Leg:
+    """One retrieval leg on the shared pool.
+
+    Its budget starts when a pool thread picks it up, so time spent queued behind other
+    requests' legs does not count against it. The database enforces the same deadline
+    (statement_timeout on Postgres, a progress handler on SQLite), and a leg given up
+    while still queued never runs.
+    """
+
+    def __init__(self, name: str, fn, timeout: float):
+        self.name = name
+        self.timeout = timeout
+        self.started = threading.Event()
+        self.cancelled = threading.Event()
+        self.started_at = 0.0
+        self.future = _leg_pool.submit(self._run, fn)
+
+    def _run(self, fn):
+        if self.cancelled.is_set():
+            return []
+        self.started_at = time.perf_counter()
+        self.started.set()
+        db = SessionLocal()
+        db.info["deadline"] = self.started_at + self.timeout
+        try:
+            if _is_postgres():
+                _set_statement_timeout(db, self.timeout)
+            else:
+                _set_sqlite_deadline(db, self.started_at + self.timeout, self.cancelled)
+            try:
+                return fn(db)
+            finally:
+                if not _is_postgres():
+                    _clear_sqlite_deadline(db)
+        finally:
+            db.close()
+
+    def result(self) -> List[Tuple[Chunk, float]]:
+        """Wait for the leg: up to its timeout to be dequeued, then up to its timeout to run"""
+        if not self.started.wait(self.timeout):
+            self.cancel()
+            raise FutureTimeoutError(f"queued for more than {self.timeout:.2f}s")
+        remaining = self.started_at + self.timeout - time.perf_counter()
+        try:
+            return self.future.result(timeout=max(0.0, remaining))
+        except FutureTimeoutError:
+            self.cancel()
+            raise
+        except Exception as e:
+            # The database may abort the query at the deadline just before we stop waiting
+            if time.perf_counter() >= self.started_at + self.timeout:
+                raise FutureTimeoutError(str(e)) from e
+            raise
+
+    def cancel(self):
+        self.cancelled.set()
+        self.future.cancel()
+
+
+def _cosine(a, b) -> float:
+    a = np.asarray(a, dtype=np.float32)
+    b = np.asarray(b, dtype=np.float32)
+    denom = float(np.linalg.norm(a) * np.linalg.norm(b))
+    return float(a @ b) / denom if denom else 0.0
+
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = 60) -> Dict[int, float]:
+    """RRF score per id: sum over rankings of 1 / (k + rank)"""
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank)
+    return scores
+
+
+def hybrid_search(
+    question: str,
+    user_id: int,
+    top_k: int = 3,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+    query_vec: Optional[List[float]] = None,
+) -> List[Tuple[Chunk, float]]:
+    """Top chunks by RRF over the lexical and vector legs.
+
+    The returned score is the chunk's cosine similarity to the question (the ranking
+    itself is by fused rank), so confidence thresholds keep their meaning.
+    """
+    mode = settings.RETRIEVAL_MODE.lower()
+    depth = max(top_k, settings.HYBRID_CANDIDATES)
+    question_vec: Dict[str, List[float]] = {}
+
+    def vector_leg(db: Session):
+        # Embedding the question happens inside the leg so it overlaps the lexical query
+        question_vec["v"] = query_vec or embed_query(question)
+        # The query only gets what the embedding call left of the leg's budget
+        remaining = db.info["deadline"] - time.perf_counter()
+        if remaining <= 0:
+            return []
+        _set_statement_timeout(db, remaining)
+        return pgvector_search(db, question_vec["v"], user_id, top_k=depth, ef_search=ef_search, probes=probes)
+
+    legs = []
+    if mode in ("hybrid", "vector"):
+        legs.append(_Leg("vector", vector_leg, settings.HYBRID_VECTOR_TIMEOUT))
+    if mode in ("hybrid", "lexical"):
+        legs.append(_Leg("lexical", lambda db: lexical_search(db, question, user_id, depth), settings.HYBRID_LEXICAL_TIMEOUT))
+
+    results: Dict[str, List[Tuple[Chunk, float]]] = {}
+    for leg in legs:
+        name, timeout = leg.name, leg.timeout
+        try:
+            results[name] = leg.result()
+            last_leg_report[name] = {"status": "ok", "hits": len(results[name]), "ms": round((time.perf_counter() - leg.started_at) * 1000, 1)}
+        except FutureTimeoutError:
+            last_leg_report[name] = {"status": "timeout", "hits": 0, "ms": round(timeout * 1000, 1)}
+            print(f"Retrieval leg '{name}' exceeded {timeout:.2f}s; continuing without it")
+        except Exception as e:
+            last_leg_report[name] = {"status": "error", "hits": 0, "error": str(e)}
+            print(f"Retrieval leg '{name}' failed: {e}")
+
+    return _fuse(results, question_vec.get("v"), top_k)
+
+
+def _fuse(results: Dict[str, List[Tuple[Chunk, float]]], question_vec: Optional[List[float]], top_k: int) -> List[Tuple[Chunk, float]]:
+    chunks: Dict[int, Chunk] = {}
+    similarity: Dict[int, float] = {}
+    rankings = []
+    for name in ("vector", "lexical"):
+        hits = results.get(name, [])
+        rankings.append([chunk.id for chunk, _ in hits])
+        for chunk, score in hits:
+            chunks.setdefault(chunk.id, chunk)
+            if name == "vector":
+                similarity[chunk.id] = score
+
+    fused = reciprocal_rank_fusion(rankings, k=settings.HYBRID_RRF_K)
+    top_ids = sorted(fused, key=fused.get, reverse=True)[:top_k]
+    hits = []
+    for chunk_id in top_ids:
+        score = similarity.get(chunk_id)
+        if score is None:
+            chunk = chunks[chunk_id]
+            score = _cosine(question_vec, chunk.embedding) if question_vec is not None and chunk.embedding is not None else 0.0
+        hits.append((chunks[chunk_id], score))
+    return hits
+
+
+async def _run_leg_async(name: str, fn, timeout: float, started: float):
+    """Async counterpart of _run_leg: own AsyncSession, statement timeout and wait_for budget"""
+    async def leg():
+        async with AsyncSessionLocal() as db:
+            await db.run_sync(_set_statement_timeout, timeout)
+            return await fn(db)
+    try:
+        hits = await asyncio.wait_for(leg(), timeout)
+        last_leg_report[name] = {"status": "ok", "hits": len(hits), "ms": round((time.perf_counter() - started) * 1000, 1)}
+        return hits
+    except asyncio.TimeoutError:
+        last_leg_report[name] = {"status": "timeout", "hits": 0, "ms": round(timeout * 1000, 1)}
+        print(f"Retrieval leg '{name}' exceeded {timeout:.2f}s; continuing without it")
+    except Exception as e:
+        last_leg_report[name] = {"status": "error", "hits": 0, "error": str(e)}
+        print(f"Retrieval leg '{name}' failed: {e}")
+    return None
+
+
+async def hybrid_search_async(
+    question: str,
+    user_id: int,
+    top_k: int = 3,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+    query_vec: Optional[List[float]] = None,
+) -> List[Tuple[Chunk, float]]:
+    """hybrid_search without worker threads: both legs are coroutines on the event loop"""
+    mode = settings.RETRIEVAL_MODE.lower()
+    depth = max(top_k, settings.HYBRID_CANDIDATES)
+    question_vec: Dict[str, List[float]] = {}
+
+    async def vector_leg(db):
+        question_vec["v"] = query_vec or await embed_query_async(question)
+        return await db.run_sync(pgvector_search, question_vec["v"], user_id, depth, ef_search, probes)
+
+    async def lexical_leg(db):
+        return await db.run_sync(lexical_search, question, user_id, depth)
+
+    legs = {}
+    if mode in ("hybrid", "vector"):
+        legs["vector"] = (vector_leg, settings.HYBRID_VECTOR_TIMEOUT)
+    if mode in ("hybrid", "lexical"):
+        legs["lexical"] = (lexical_leg, settings.HYBRID_LEXICAL_TIMEOUT)
+
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(*(_run_leg_async(name, fn, timeout, started) for name, (fn, timeout) in legs.items()))
+    results = {name: hits for name, hits in zip(legs, outcomes) if hits is not None}
+    return _fuse(results, question_vec.get("v"), top_k)
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from typing import List, Optional
+from pydantic import BaseModel, EmailStr, Field
+from typing import Any, Dict, List, Optional
 
 
 class RegisterRequest(BaseModel):
@@ -20,6 +20,24 @@ class TokenResponse(BaseModel):
 
 class IngestResponse(BaseModel):
     ingested_chunks: int
+    new_documents: int = 0
+    updated_documents: int = 0
+    skipped_documents: int = 0
+    failed_documents: int = 0
+
+
+class IngestJobResponse(BaseModel):
+    id: int
+    status: str  # 'queued', 'running', 'completed', 'failed'
+    progress: float
+    document_id: Optional[int] = None
+    total_documents: int = 0
+    processed_documents: int = 0
+    result: Optional[dict] = None
+    error_message: Optional[str] = None
+    created_at: Optional[str] = None
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
 
 
 class SourceItem(BaseModel):
@@ -33,6 +51,8 @@ class SourceItem(BaseModel):
 class QueryRequest(BaseModel):
     question: str
     top_k: int = 3
+    ef_search: Optional[int] = Field(None, ge=1, le=1000)  # HNSW recall/latency trade-off
+    probes: Optional[int] = Field(None, ge=1, le=1000)  # IVFFlat lists scanned
 
 
 class QueryResponse(BaseModel):
@@ -145,6 +165,7 @@ class LegalResearchResponse(BaseModel):
     statutes: List[LegalStatuteResponse]
     total_results: int
     search_time: float
+    providers: Dict[str, Dict[str, Any]] = {}  # per provider call: status, result count, ms
 
 
 class HybridQueryRequest(BaseModel):
@@ -0,0 +1,29 @@
+import threading
+from .config import settings
+
+_service = None
+_lock = threading.Lock()
+
+
+def get_similarity_service():
+    """Case, statute and document similarity service chosen by SIMILARITY_SERVICE.
+
+    'faiss' uses sentence embeddings in FAISS indexes (vector_similarity); when its
+    dependencies or model cannot be loaded, the text similarity service is used instead.
+    Both services are imported lazily, so only the selected one builds its indexes.
+    """
+    global _service
+    if _service is None:
+        with _lock:
+            if _service is None:
+                if settings.SIMILARITY_SERVICE == "faiss":
+                    try:
+                        from .vector_similarity import vector_similarity_service
+                        _service = vector_similarity_service
+                        print(f"✅ FAISS similarity service ready ({settings.FAISS_INDEX_TYPE})")
+                        return _service
+                    except Exception as e:
+                        print(f"⚠️  FAISS similarity service unavailable, using text similarity: {e}")
+                from .simple_vector_similarity import simple_vector_similarity_service
+                _service = simple_vector_similarity_service
+    return _service
@@ -1,78 +1,237 @@
 import numpy as np
 import pickle
 import os
-from typing import List, Dict, Any
+import threading
+from typing import List, Dict, Any, Optional
 from sqlalchemy.orm import Session
 from .models import LegalCase, LegalStatute, Document, Chunk
 from .schemas import LegalCaseResponse, LegalStatuteResponse
 import json
 import hashlib
+from .bm25_index import BM25Index, STOP_WORDS
+from .tfidf_index import TfidfIndex
+from .index_store import IndexStore
+from .config import settings
+
+# Entry field that identifies a case, statute or document; adding an entry with a known key replaces it
+KEY_FIELDS = {"case": "case_id", "statute": "statute_id", "document": "id"}
+
+
+def _fingerprint(entry: Dict[str, Any]) -> str:
+    """Content hash of an entry as stored, so a re-added entry can be compared with its live copy"""
+    return hashlib.sha1(json.dumps(entry, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
 
 class SimpleVectorSimilarityService:
-    def __init__(self):
-        # Simple TF-IDF based similarity (no external dependencies)
-        self.case_documents = []
-        self.statute_documents = []
-        self.document_documents = []
-        
-        # File paths for persistence
-        self.data_dir = "data"
-        self.case_data_path = os.path.join(self.data_dir, "case_data.pkl")
-        self.statute_data_path = os.path.join(self.data_dir, "statute_data.pkl")
-        self.document_data_path = os.path.join(self.data_dir, "document_data.pkl")
-        
-        # Create data directory if it doesn't exist
+    def __init__(self, data_dir: str = "data"):
+        # Text similarity over BM25 or TF-IDF indexes (SIMILARITY_BACKEND); entries live in
+        # append-only stores, so adding a batch writes only that batch
+        self.data_dir = data_dir
         os.makedirs(self.data_dir, exist_ok=True)
-        
-        # Load existing data
-        self._load_data()
+        self.case_documents = self._open_store("case")
+        self.statute_documents = self._open_store("statute")
+        self.document_documents = self._open_store("document")
+        self._unsaved = {"case": 0, "statute": 0, "document": 0}
+        self._keys: Dict[str, Dict[str, int]] = {}  # per kind: key -> entry number of its live entry
+        self._locks = {name: threading.RLock() for name in KEY_FIELDS}
+        self._compacting = set()
+        self._build_indexes()
+
+    def _open_store(self, name: str) -> IndexStore:
+        store = IndexStore(
+            os.path.join(self.data_dir, f"{name}_store"),
+            max_segments=settings.INDEX_STORE_MAX_SEGMENTS,
+            merge_factor=settings.INDEX_STORE_MERGE_FACTOR,
+        )
+        # One-time migration of the old pickle snapshot
+        pickle_path = os.path.join(self.data_dir, f"{name}_data.pkl")
+        if not store and os.path.exists(pickle_path):
+            try:
+                with open(pickle_path, 'rb') as f:
+                    store.append(pickle.load(f))
+                os.replace(pickle_path, f"{pickle_path}.migrated")
+                print(f"✅ Migrated {len(store)} {name} entries from {pickle_path}")
+            except Exception as e:
+                print(f"⚠️  Could not migrate {pickle_path}: {e}")
+        return store
+
+    def _new_index(self, name: str):
+        if settings.SIMILARITY_BACKEND == "tfidf":
+            return TfidfIndex(os.path.join(self.data_dir, f"{name}_tfidf"))
+        return BM25Index(os.path.join(self.data_dir, f"{name}_bm25"))
+
+    def _index_for(self, name: str, store: IndexStore):
+        """Index over the entries' full_text; document number i is store[i]"""
+        index = self._new_index(name)
+        # A saved index may lag the store; only the entries after it are indexed again
+        covered = index.load(len(store), store.generation)
+        if covered < len(store):
+            index.add_many(e['full_text'] for e in store.entries(covered))
+            index.save(store.generation)
+        return index
+
+    def _build_indexes(self):
+        self.case_index = self._index_for("case", self.case_documents)
+        self.statute_index = self._index_for("statute", self.statute_documents)
+        self.document_index = self._index_for("document", self.document_documents)
+        for name in KEY_FIELDS:
+            self._load_keys(name)
+
+    @staticmethod
+    def _key(name: str, entry: Dict[str, Any]) -> Optional[str]:
+        key = entry.get(KEY_FIELDS[name])
+        return None if key is None else str(key)
+
+    def _load_keys(self, name: str):
+        """Map keys to live entries; older duplicates (stored before upserts existed) are deleted.
+        Only the entries after the saved key map are read."""
+        store = getattr(self, f"{name}_documents")
+        keys, covered = self._read_keys(name, store)
+        duplicates = []
+        for number, entry in enumerate(store.entries(covered), start=covered):
+            key = self._key(name, entry)
+            if key is None or store.is_deleted(number):
+                continue
+            if key in keys:
+                duplicates.append(keys[key])
+            keys[key] = number
+        store.delete(duplicates)
+        self._keys[name] = keys
+        if duplicates:
+            print(f"Removed {len(duplicates)} duplicate {name} entries from similarity index")
+        if covered < len(store):
+            self._save_keys(name)
+        self._maybe_compact(name)
 
-    def _load_data(self):
-        """Load existing data from files"""
+    def _keys_path(self, name: str) -> str:
+        return os.path.join(self.data_dir, f"{name}_keys.json")
+
+    def _read_keys(self, name: str, store: IndexStore):
+        """Saved key map of the store's current generation and the entries it covers"""
         try:
-            if os.path.exists(self.case_data_path):
-                with open(self.case_data_path, 'rb') as f:
-                    self.case_documents = pickle.load(f)
-            
-            if os.path.exists(self.statute_data_path):
-                with open(self.statute_data_path, 'rb') as f:
-                    self.statute_documents = pickle.load(f)
-            
-            if os.path.exists(self.document_data_path):
-                with open(self.document_data_path, 'rb') as f:
-                    self.document_documents = pickle.load(f)
+            with open(self._keys_path(name), encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return {}, 0
+        if saved.get("generation") != store.generation or saved.get("entries", 0) > len(store):
+            return {}, 0
+        # Entries deleted since the save are tombstoned in the store, not in the map
+        return {key: number for key, number in saved["keys"].items() if not store.is_deleted(number)}, saved["entries"]
+
+    def _save_keys(self, name: str):
+        store = getattr(self, f"{name}_documents")
+        path = self._keys_path(name)
+        try:
+            with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+                json.dump({"generation": store.generation, "entries": len(store), "keys": self._keys[name]}, f)
+            os.replace(f"{path}.tmp", path)
         except Exception as e:
-            print(f"Error loading data: {e}")
-            self.case_documents = []
-            self.statute_documents = []
-            self.document_documents = []
+            print(f"Error saving {name} key map: {e}")
+
+    def _save(self, name: str):
+        """Persist the index and key map of a kind, stamped with its store's generation"""
+        getattr(self, f"{name}_index").save(getattr(self, f"{name}_documents").generation)
+        self._save_keys(name)
 
-    def _save_data(self):
-        """Save data to files"""
+    def _upsert(self, name: str, entries: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Add entries, replacing the live entry with the same key and skipping those identical
+        to it; the index itself is saved every INDEX_SAVE_EVERY entries"""
+        batch, keyed = [], {}
+        for entry in entries:
+            key = self._key(name, entry)
+            if key is None:
+                batch.append(entry)
+            elif key in keyed:
+                batch[keyed[key]] = entry  # the last entry for a key in one batch wins
+            else:
+                keyed[key] = len(batch)
+                batch.append(entry)
+
+        with self._locks[name]:
+            store, index, keys = getattr(self, f"{name}_documents"), getattr(self, f"{name}_index"), self._keys[name]
+            # Re-adding an unchanged corpus must not append (and later compact) all of it again
+            unchanged = {key for key, position in keyed.items() if key in keys and _fingerprint(store[keys[key]]) == _fingerprint(batch[position])}
+            if unchanged:
+                batch = [entry for entry in batch if self._key(name, entry) not in unchanged]
+                keyed = {self._key(name, entry): position for position, entry in enumerate(batch) if self._key(name, entry) is not None}
+            if not batch:
+                return {"added": 0, "updated": 0}
+            replaced = [keys[key] for key in keyed if key in keys]
+            try:
+                numbers = store.append(batch)
+                store.delete(replaced)
+            except Exception as e:
+                print(f"Error saving {name} entries: {e}")
+                return {"added": 0, "updated": 0}
+            index.add_many(e['full_text'] for e in batch)
+            keys.update((key, numbers[position]) for key, position in keyed.items())
+            self._unsaved[name] += len(batch)
+            if self._unsaved[name] >= settings.INDEX_SAVE_EVERY:
+                self._save(name)
+                self._unsaved[name] = 0
+        self._maybe_compact(name)
+        return {"added": len(batch) - len(replaced), "updated": len(replaced)}
+
+    def _delete(self, name: str, keys: List[Any]) -> int:
+        with self._locks[name]:
+            live = self._keys[name]
+            numbers = [live.pop(str(key)) for key in keys if str(key) in live]
+            getattr(self, f"{name}_documents").delete(numbers)
+        self._maybe_compact(name)
+        return len(numbers)
+
+    def _maybe_compact(self, name: str):
+        """Start a background compaction once enough entries are deleted"""
+        store = getattr(self, f"{name}_documents")
+        if store.deleted < max(settings.INDEX_COMPACT_MIN_DELETED, settings.INDEX_COMPACT_DELETED_RATIO * len(store)):
+            return
+        with self._locks[name]:
+            if name in self._compacting:
+                return
+            self._compacting.add(name)
+        threading.Thread(target=self._compact, args=(name,), daemon=True).start()
+
+    def _compact(self, name: str):
+        """Drop deleted entries and renumber the rest. The new index is built without holding
+        the lock; entries added meanwhile are indexed at the swap, and entries deleted
+        meanwhile stay tombstoned under their new numbers."""
+        store = getattr(self, f"{name}_documents")
         try:
-            with open(self.case_data_path, 'wb') as f:
-                pickle.dump(self.case_documents, f)
-            
-            with open(self.statute_data_path, 'wb') as f:
-                pickle.dump(self.statute_documents, f)
-            
-            with open(self.document_data_path, 'wb') as f:
-                pickle.dump(self.document_documents, f)
+            with self._locks[name]:
+                total = len(store)
+                keep = [i for i in range(total) if not store.is_deleted(i)]
+            index = self._new_index(name)
+            index.add_many(store[i]['full_text'] for i in keep)
+            with self._locks[name]:
+                tail = list(range(total, len(store)))
+                index.add_many(store[i]['full_text'] for i in tail)
+                keep += tail
+                store.rewrite(keep)
+                renumbered = {old: new for new, old in enumerate(keep)}
+                self._keys[name] = {key: renumbered[number] for key, number in self._keys[name].items()}
+                setattr(self, f"{name}_index", index)
+                # Saved under the new generation; an index saved before the rewrite no longer loads
+                self._save(name)
+                self._unsaved[name] = 0
+            print(f"✅ Compacted {name} similarity index to {len(store) - store.deleted} entries")
         except Exception as e:
-            print(f"Error saving data: {e}")
+            print(f"⚠️  Compacting {name} similarity index failed: {e}")
+        finally:
+            with self._locks[name]:
+                self._compacting.discard(name)
 
-    def _simple_text_similarity(self, text1: str, text2: str) -> float:
-        """Calculate simple text similarity using word overlap"""
-        words1 = set(text1.lower().split())
-        words2 = set(text2.lower().split())
-        
-        if not words1 or not words2:
-            return 0.0
-        
-        intersection = words1.intersection(words2)
-        union = words1.union(words2)
-        
-        return len(intersection) / len(union) if union else 0.0
+    def _search(self, name: str, query: str, k: int) -> List[Dict[str, Any]]:
+        with self._locks[name]:
+            store, index = getattr(self, f"{name}_documents"), getattr(self, f"{name}_index")
+            # Deleted entries are still indexed; fetch more until k live hits are found
+            fetch = k
+            while True:
+                hits = index.search(query, fetch)
+                live = [(position, score) for position, score in hits if not store.is_deleted(position)]
+                if len(live) >= k or len(hits) < fetch:
+                    break
+                fetch *= 2
+            return [{**store[position], 'similarity_score': score} for position, score in live[:k]]
 
     def _extract_keywords(self, text: str) -> List[str]:
         """Extract important keywords from text"""
@@ -80,22 +239,17 @@ class SimpleVectorSimilarityService:
         words = text.lower().split()
         
         # Filter out common words
-        stop_words = {
-            'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by',
-            'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did',
-            'will', 'would', 'could', 'should', 'may', 'might', 'can', 'this', 'that', 'these', 'those'
-        }
-        
-        keywords = [word for word in words if len(word) > 3 and word not in stop_words]
+        keywords = [word for word in words if len(word) > 3 and word not in STOP_WORDS]
         return keywords[:20]  # Limit to top 20 keywords
 
-    def add_cases_to_index(self, cases: List[LegalCaseResponse]):
-        """Add cases to the similarity index"""
+    def add_cases_to_index(self, cases: List[LegalCaseResponse]) -> Dict[str, int]:
+        """Add cases to the similarity index, replacing those with the same case_id"""
         if not cases:
-            return
+            return {"added": 0, "updated": 0}
         
+        batch = []
         for case in cases:
-            case_data = {
+            batch.append({
                 'id': case.id,
                 'case_id': case.case_id,
                 'title': case.title,
@@ -109,19 +263,20 @@ class SimpleVectorSimilarityService:
                 'relevance_score': case.relevance_score,
                 'keywords': self._extract_keywords(f"{case.title} {case.summary} {case.citation}"),
                 'full_text': f"{case.title} {case.summary} {case.citation} {case.court}"
-            }
-            self.case_documents.append(case_data)
+            })
         
-        self._save_data()
-        print(f"Added {len(cases)} cases to similarity index")
+        counts = self._upsert("case", batch)
+        print(f"Added {counts['added']} and updated {counts['updated']} cases in similarity index")
+        return counts
 
-    def add_statutes_to_index(self, statutes: List[LegalStatuteResponse]):
-        """Add statutes to the similarity index"""
+    def add_statutes_to_index(self, statutes: List[LegalStatuteResponse]) -> Dict[str, int]:
+        """Add statutes to the similarity index, replacing those with the same statute_id"""
         if not statutes:
-            return
+            return {"added": 0, "updated": 0}
         
+        batch = []
         for statute in statutes:
-            statute_data = {
+            batch.append({
                 'id': statute.id,
                 'statute_id': statute.statute_id,
                 'title': statute.title,
@@ -133,19 +288,20 @@ class SimpleVectorSimilarityService:
                 'relevance_score': statute.relevance_score,
                 'keywords': self._extract_keywords(f"{statute.title} {statute.summary} {statute.section_number}"),
                 'full_text': f"{statute.title} {statute.summary} {statute.section_number} {statute.jurisdiction}"
-            }
-            self.statute_documents.append(statute_data)
+            })
         
-        self._save_data()
-        print(f"Added {len(statutes)} statutes to similarity index")
+        counts = self._upsert("statute", batch)
+        print(f"Added {counts['added']} and updated {counts['updated']} statutes in similarity index")
+        return counts
 
-    def add_documents_to_index(self, documents: List[Dict[str, Any]]):
-        """Add documents to the similarity index"""
+    def add_documents_to_index(self, documents: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Add documents to the similarity index, replacing those with the same id"""
         if not documents:
-            return
+            return {"added": 0, "updated": 0}
         
+        batch = []
         for doc in documents:
-            doc_data = {
+            batch.append({
                 'id': doc.get('id'),
                 'title': doc.get('title', ''),
                 'filename': doc.get('filename', ''),
@@ -154,83 +310,53 @@ class SimpleVectorSimilarityService:
                 'created_at': doc.get('created_at'),
                 'keywords': self._extract_keywords(doc.get('content', '')),
                 'full_text': f"{doc.get('title', '')} {doc.get('content', '')}"
-            }
-            self.document_documents.append(doc_data)
+            })
         
-        self._save_data()
-        print(f"Added {len(documents)} documents to similarity index")
+        counts = self._upsert("document", batch)
+        print(f"Added {counts['added']} and updated {counts['updated']} documents in similarity index")
+        return counts
+
+    def delete_cases(self, case_ids: List[str]) -> int:
+        """Remove cases from the similarity index; returns how many were indexed"""
+        return self._delete("case", case_ids)
+
+    def delete_statutes(self, statute_ids: List[str]) -> int:
+        return self._delete("statute", statute_ids)
+
+    def delete_documents(self, document_ids: List[Any]) -> int:
+        return self._delete("document", document_ids)
 
     def find_similar_cases(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
-        """Find similar cases using text similarity"""
+        """Find similar cases by BM25 score or TF-IDF cosine similarity, per SIMILARITY_BACKEND"""
         if not self.case_documents:
             return []
+        return self._search("case", query, k)
+
+    def find_similar_cases_batch(self, queries: List[str], k: int = 5) -> List[List[Dict[str, Any]]]:
+        """find_similar_cases for many query texts, scored together"""
+        if not self.case_documents:
+            return [[] for _ in queries]
         
-        # Calculate similarity scores
-        similarities = []
-        for case in self.case_documents:
-            similarity = self._simple_text_similarity(query, case['full_text'])
-            similarities.append((similarity, case))
-        
-        # Sort by similarity score (descending)
-        similarities.sort(key=lambda x: x[0], reverse=True)
-        
-        # Return top k results
-        results = []
-        for similarity, case in similarities[:k]:
-            if similarity > 0.1:  # Only return results with meaningful similarity
-                result = case.copy()
-                result['similarity_score'] = similarity
-                results.append(result)
-        
-        return results
+        with self._locks["case"]:
+            store, index = self.case_documents, self.case_index
+            # Enough extra hits that k live ones remain after dropping deleted entries
+            fetch = min(len(index), k + store.deleted)
+            return [
+                [{**store[position], 'similarity_score': score} for position, score in hits if not store.is_deleted(position)][:k]
+                for hits in index.search_batch(queries, fetch)
+            ]
 
     def find_similar_statutes(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
-        """Find similar statutes using text similarity"""
+        """Find similar statutes over the statute index"""
         if not self.statute_documents:
             return []
-        
-        # Calculate similarity scores
-        similarities = []
-        for statute in self.statute_documents:
-            similarity = self._simple_text_similarity(query, statute['full_text'])
-            similarities.append((similarity, statute))
-        
-        # Sort by similarity score (descending)
-        similarities.sort(key=lambda x: x[0], reverse=True)
-        
-        # Return top k results
-        results = []
-        for similarity, statute in similarities[:k]:
-            if similarity > 0.1:  # Only return results with meaningful similarity
-                result = statute.copy()
-                result['similarity_score'] = similarity
-                results.append(result)
-        
-        return results
+        return self._search("statute", query, k)
 
     def find_similar_documents(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
-        """Find similar documents using text similarity"""
+        """Find similar documents over the document index"""
         if not self.document_documents:
             return []
-        
-        # Calculate similarity scores
-        similarities = []
-        for doc in self.document_documents:
-            similarity = self._simple_text_similarity(query, doc['full_text'])
-            similarities.append((similarity, doc))
-        
-        # Sort by similarity score (descending)
-        similarities.sort(key=lambda x: x[0], reverse=True)
-        
-        # Return top k results
-        results = []
-        for similarity, doc in similarities[:k]:
-            if similarity > 0.1:  # Only return results with meaningful similarity
-                result = doc.copy()
-                result['similarity_score'] = similarity
-                results.append(result)
-        
-        return results
+        return self._search("document", query, k)
 
     def find_similar_cases_by_case_text(self, case_text: str, k: int = 5) -> List[Dict[str, Any]]:
         """Find similar cases based on case text content"""
@@ -254,15 +380,17 @@ class SimpleVectorSimilarityService:
         """Rebuild all indices from database"""
         try:
             # Clear existing data
-            self.case_documents = []
-            self.statute_documents = []
-            self.document_documents = []
+            for name in KEY_FIELDS:
+                with self._locks[name]:
+                    getattr(self, f"{name}_documents").clear()
+            self._build_indexes()
+            for name in KEY_FIELDS:
+                self._save(name)  # overwrite saved indexes of the old entries
             
             # Rebuild from database
             # This would require implementing database queries to get all cases, statutes, and documents
             # For now, we'll keep the existing functionality
             
-            self._save_data()
             print("Indices rebuilt successfully")
         except Exception as e:
             print(f"Error rebuilding indices: {e}")
@@ -0,0 +1,43 @@
+import json
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, Optional, Union
+from fastapi.responses import StreamingResponse
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # stop nginx-style proxies from buffering the stream
+}
+
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format one Server-Sent Event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def sse_response(events: Union[Iterable[str], AsyncIterator[str]], headers: Optional[Dict[str, str]] = None) -> StreamingResponse:
+    """Event stream response; extra headers (e.g. X-Cache) never override SSE_HEADERS, so a
+    cached answer's max-age cannot make a proxy cache the stream"""
+    return StreamingResponse(events, media_type="text/event-stream", headers={**(headers or {}), **SSE_HEADERS})
+
+
+def _piece_text(piece) -> str:
+    try:
+        return piece.text
+    except ValueError:
+        # A chunk without text parts (e.g. only safety metadata)
+        return ""
+
+
+def stream_text(model, prompt: str) -> Iterator[str]:
+    """Yield generated text pieces from a Gemini model as they arrive"""
+    for piece in model.generate_content(prompt, stream=True):
+        text = _piece_text(piece)
+        if text:
+            yield text
+
+
+async def stream_text_async(model, prompt: str) -> AsyncIterator[str]:
+    """stream_text on the event loop, using the async Gemini client"""
+    async for piece in await model.generate_content_async(prompt, stream=True):
+        text = _piece_text(piece)
+        if text:
+            yield text
@@ -0,0 +1,185 @@
+"""Vectorized TF-IDF similarity over a sparse document-term matrix.
+
+Raw term counts are kept as a scipy CSR matrix with a persisted vocabulary, so term
+ids stay stable across restarts. Scoring uses sublinear tf, smoothed idf and
+L2-normalized rows, which makes a query's scores its cosine similarity to every
+document. One query is a single sparse matrix-vector product; a batch of queries is a
+single sparse matrix-matrix product. Top k comes from argpartition over the nonzero
+scores only.
+"""
+import json
+import os
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from scipy import sparse
+from .bm25_index import tokenize
+
+
+class TfidfIndex:
+    """Append-only TF-IDF index over documents numbered 0..n-1 in insertion order"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path  # prefix for <path>.vocab.json, <path>.counts.npz and <path>.meta.json
+        self.vocabulary: Dict[str, int] = {}
+        self._counts = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self._pending: List[Tuple[np.ndarray, np.ndarray]] = []  # rows added since the last flush
+        self._matrix: Optional[sparse.csc_matrix] = None  # weighted, normalized, column-major; rebuilt after adds
+        self._idf: Optional[np.ndarray] = None
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return self._counts.shape[0] + len(self._pending)
+
+    def add(self, text: str) -> int:
+        """Index one document and return its number"""
+        counts = Counter(tokenize(text))
+        with self._lock:
+            ids = np.fromiter((self.vocabulary.setdefault(t, len(self.vocabulary)) for t in counts), dtype=np.int32, count=len(counts))
+            self._pending.append((ids, np.fromiter(counts.values(), dtype=np.float32, count=len(counts))))
+            self._matrix = None
+            return len(self) - 1
+
+    def add_many(self, texts: Iterable[str]) -> List[int]:
+        return [self.add(text) for text in texts]
+
+    def _rows(self, rows: List[Tuple[np.ndarray, np.ndarray]]) -> sparse.csr_matrix:
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum([len(ids) for ids, _ in rows], out=indptr[1:])
+        indices = np.concatenate([ids for ids, _ in rows]) if rows else np.zeros(0, dtype=np.int32)
+        data = np.concatenate([values for _, values in rows]) if rows else np.zeros(0, dtype=np.float32)
+        return sparse.csr_matrix((data, indices, indptr), shape=(len(rows), len(self.vocabulary)))
+
+    def _flush(self):
+        if not self._pending:
+            return
+        new_rows = self._rows(self._pending)
+        counts = self._counts
+        counts.resize((counts.shape[0], len(self.vocabulary)))  # new terms add columns
+        self._counts = sparse.vstack([counts, new_rows], format="csr")
+        self._pending = []
+
+    def _weigh(self, counts: sparse.csr_matrix) -> sparse.csr_matrix:
+        weighted = counts.astype(np.float32)
+        weighted.data = 1 + np.log(weighted.data)
+        weighted = weighted @ sparse.diags(self._idf, format="csr")
+        norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return (sparse.diags(1 / norms, format="csr") @ weighted).astype(np.float32).tocsr()
+
+    def _prepare(self) -> sparse.csc_matrix:
+        if self._matrix is None:
+            self._flush()
+            n = self._counts.shape[0]
+            df = np.bincount(self._counts.indices, minlength=len(self.vocabulary))
+            self._idf = (np.log((1 + n) / (1 + df)) + 1).astype(np.float32)
+            # Column-major so a query only reads the columns (postings) of its own terms
+            self._matrix = self._weigh(self._counts).tocsc()
+        return self._matrix
+
+    @staticmethod
+    def _scores(matrix: sparse.csc_matrix, queries: sparse.csr_matrix) -> sparse.csr_matrix:
+        """queries x documents similarity, restricted to the columns the queries use"""
+        terms = np.unique(queries.indices)
+        return (queries[:, terms] @ matrix[:, terms].T).tocsr()
+
+    def _query_matrix(self, queries: List[str]) -> sparse.csr_matrix:
+        rows = []
+        for query in queries:
+            # Terms outside the vocabulary cannot match anything and are dropped
+            counts = Counter(self.vocabulary[t] for t in tokenize(query) if t in self.vocabulary)
+            rows.append((np.fromiter(counts, dtype=np.int32, count=len(counts)), np.fromiter(counts.values(), dtype=np.float32, count=len(counts))))
+        return self._weigh(self._rows(rows))
+
+    @staticmethod
+    def _top_k(doc_ids: np.ndarray, scores: np.ndarray, k: int, min_score: float) -> List[Tuple[int, float]]:
+        if min_score > 0:
+            keep = scores > min_score
+            doc_ids, scores = doc_ids[keep], scores[keep]
+        if len(scores) > k:
+            part = np.argpartition(-scores, k - 1)[:k]
+            doc_ids, scores = doc_ids[part], scores[part]
+        order = np.lexsort((doc_ids, -scores))  # ties go to the earlier document
+        return [(int(doc_ids[i]), float(scores[i])) for i in order]
+
+    def search(self, query: str, k: int = 10, min_score: float = 0.0) -> List[Tuple[int, float]]:
+        """Top k (document number, cosine similarity) pairs, best first"""
+        with self._lock:
+            if len(self) == 0 or k <= 0:
+                return []
+            matrix = self._prepare()
+            q = self._query_matrix([query])
+        if q.nnz == 0:
+            return []
+        scores = self._scores(matrix, q)  # 1 x n, nonzero only where a query term occurs
+        return self._top_k(scores.indices, scores.data, k, min_score)
+
+    def search_batch(self, queries: List[str], k: int = 10, min_score: float = 0.0) -> List[List[Tuple[int, float]]]:
+        """search() for many queries with one sparse matrix product"""
+        with self._lock:
+            if len(self) == 0 or k <= 0 or not queries:
+                return [[] for _ in queries]
+            matrix = self._prepare()
+            q = self._query_matrix(queries)
+        scores = self._scores(matrix, q)  # m x n
+        return [
+            self._top_k(scores.indices[start:end], scores.data[start:end], k, min_score)
+            for start, end in zip(scores.indptr[:-1], scores.indptr[1:])
+        ]
+
+    def save(self, generation: int = 0):
+        """Persist the vocabulary and the raw count matrix, stamped with the generation of
+        the entry store they were built from. The stamp is written last, so a save cut
+        short is never loaded."""
+        if not self.path:
+            return
+        with self._lock:
+            self._flush()
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                if os.path.exists(f"{self.path}.meta.json"):
+                    os.remove(f"{self.path}.meta.json")
+                sparse.save_npz(f"{self.path}.counts.npz", self._counts)
+                with open(f"{self.path}.vocab.json", "w", encoding="utf-8") as f:
+                    json.dump(self.vocabulary, f)
+                with open(f"{self.path}.meta.json", "w", encoding="utf-8") as f:
+                    json.dump({"documents": self._counts.shape[0], "generation": generation}, f)
+            except Exception as e:
+                print(f"Error saving TF-IDF index: {e}")
+
+    def load(self, max_rows: int, generation: int = 0) -> int:
+        """Load the saved index; returns the documents it covers, 0 if there is none, it was
+        saved for another store generation or it covers more than max_rows (it belongs to a
+        different corpus)"""
+        paths = [f"{self.path}.{ext}" for ext in ("meta.json", "vocab.json", "counts.npz")] if self.path else []
+        if not paths or not all(os.path.exists(p) for p in paths):
+            return 0
+        try:
+            with open(f"{self.path}.meta.json", encoding="utf-8") as f:
+                meta = json.load(f)
+            counts = sparse.load_npz(f"{self.path}.counts.npz").tocsr()
+            with open(f"{self.path}.vocab.json", encoding="utf-8") as f:
+                vocabulary = json.load(f)
+        except Exception as e:
+            print(f"Error loading TF-IDF index: {e}")
+            return 0
+        if meta.get("generation") != generation or meta.get("documents") != counts.shape[0]:
+            return 0
+        if counts.shape[0] > max_rows or counts.shape[1] != len(vocabulary):
+            return 0
+        with self._lock:
+            self.vocabulary = vocabulary
+            self._counts = counts.astype(np.float32)
+            self._pending = []
+            self._matrix = None
+        return counts.shape[0]
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        with self._lock:
+            self._flush()
+            return {
+                "documents": self._counts.shape[0],
+                "terms": len(self.vocabulary),
+                "nonzeros": int(self._counts.nnz),
+            }
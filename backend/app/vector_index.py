@@ -0,0 +1,268 @@
+"""ANN index management for chunks.embedding (pgvector HNSW or IVFFlat).
+
+Startup refuses to run when the embedding column does not match the configured
+storage type and dimension; the column is only changed by the operator-run migration
+
+    python -m app.vector_index migrate [--clear-embeddings]
+
+The index is created on startup if missing and rebuilt when its type or quantization
+changes, and per-query search parameters are applied with SET LOCAL semantics.
+"""
+import argparse
+import math
+import re
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import Float, cast, func, text
+from sqlalchemy.orm import Session
+from pgvector.sqlalchemy import BIT, HALFVEC, Vector
+from .config import settings
+from .database import engine
+
+INDEX_PREFIX = "ix_chunks_embedding_"
+INDEX_TYPES = ("hnsw", "ivfflat")
+
+# Widest vectors pgvector can build HNSW/IVFFlat indexes on, per indexed type
+MAX_INDEXED_DIM = {"vector": 2000, "halfvec": 4000, "bit": 64000}
+
+_status: Dict[str, Any] = {"type": None, "index": None, "extension_version": None, "error": None}
+
+
+def _is_postgres() -> bool:
+    return engine.dialect.name == "postgresql"
+
+
+def storage_type() -> str:
+    return "halfvec" if settings.EMBED_STORAGE.lower() == "halfvec" else "vector"
+
+
+def index_quantization() -> str:
+    """'binary', 'halfvec' or 'none'; a halfvec index over a halfvec column is just the column"""
+    quantization = (settings.VECTOR_INDEX_QUANTIZATION or "none").lower()
+    if quantization == "binary" or (quantization == "halfvec" and storage_type() == "vector"):
+        return quantization
+    return "none"
+
+
+def _index_definition() -> Tuple[str, str, str]:
+    """(indexed expression, operator class, indexed type) for the configured quantization"""
+    dim = settings.EMBED_DIM
+    quantization = index_quantization()
+    if quantization == "binary":
+        return f"(binary_quantize(embedding)::bit({dim}))", "bit_hamming_ops", "bit"
+    if quantization == "halfvec":
+        return f"(embedding::halfvec({dim}))", "halfvec_cosine_ops", "halfvec"
+    return "embedding", f"{storage_type()}_cosine_ops", storage_type()
+
+
+def _index_name(index_type: str) -> str:
+    quantization = index_quantization()
+    return f"{INDEX_PREFIX}{index_type}" + ("" if quantization == "none" else f"_{quantization}")
+
+
+def candidate_distance(column, query_vec: List[float]):
+    """Distance expression matching the ANN index, and whether it is quantized (needs re-ranking)"""
+    dim = settings.EMBED_DIM
+    quantization = index_quantization()
+    if quantization == "binary":
+        query_bits = cast(func.binary_quantize(cast(query_vec, Vector(dim))), BIT(dim))
+        return cast(func.binary_quantize(column), BIT(dim)).op("<~>", return_type=Float)(query_bits), True
+    if quantization == "halfvec":
+        return cast(column, HALFVEC(dim)).op("<=>", return_type=Float)(cast(query_vec, HALFVEC(dim))), True
+    return column.cosine_distance(query_vec), False
+
+
+def _ann_index_names(conn) -> List[str]:
+    return conn.execute(text(
+        "SELECT indexname FROM pg_indexes WHERE tablename = 'chunks' AND indexname LIKE :prefix"
+    ), {"prefix": INDEX_PREFIX + "%"}).scalars().all()
+
+
+def _drop_ann_indexes(conn, keep: Optional[str] = None):
+    for name in _ann_index_names(conn):
+        if name != keep:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+
+class EmbeddingSchemaError(RuntimeError):
+    """chunks.embedding does not match EMBED_DIM / EMBED_STORAGE"""
+
+
+def validate_embedding_settings():
+    """Raise ValueError for an EMBED_DIM the configured ANN index cannot be built on"""
+    if settings.EMBED_DIM < 1:
+        raise ValueError(f"EMBED_DIM must be positive, got {settings.EMBED_DIM}")
+    index_type = (settings.VECTOR_INDEX_TYPE or "none").lower()
+    _, _, indexed_type = _index_definition()
+    if index_type in INDEX_TYPES and settings.EMBED_DIM > MAX_INDEXED_DIM[indexed_type]:
+        raise ValueError(
+            f"EMBED_DIM={settings.EMBED_DIM} exceeds the {MAX_INDEXED_DIM[indexed_type]} dimensions pgvector can index "
+            f"as {indexed_type}; lower EMBED_DIM, use EMBED_STORAGE or VECTOR_INDEX_QUANTIZATION 'halfvec'/'binary', "
+            f"or set VECTOR_INDEX_TYPE=none"
+        )
+
+
+def _embedding_column(conn) -> Tuple[Optional[str], str]:
+    """(current type of chunks.embedding or None if there is no such column, configured type)"""
+    current = conn.execute(text(
+        "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+        "WHERE attrelid = to_regclass('chunks') AND attname = 'embedding' AND NOT attisdropped"
+    )).scalar()
+    return current, f"{storage_type()}({settings.EMBED_DIM})"
+
+
+def check_embedding_column():
+    """Raise EmbeddingSchemaError when chunks.embedding differs from the configured type"""
+    if not _is_postgres():
+        return
+    with engine.connect() as conn:
+        current, expected = _embedding_column(conn)
+    if current is None or current == expected:
+        return
+    same_dim = _dimension(current) == settings.EMBED_DIM
+    raise EmbeddingSchemaError(
+        f"chunks.embedding is {current} but EMBED_DIM/EMBED_STORAGE configure {expected}. "
+        + ("Run `python -m app.vector_index migrate` to convert the stored vectors, "
+           if same_dim else
+           "Stored vectors cannot be converted to another dimension: set EMBED_DIM to match, or run "
+           "`python -m app.vector_index migrate --clear-embeddings`, which deletes all chunks for re-ingestion, ")
+        + "then start the API again."
+    )
+
+
+def _dimension(column_type: str) -> Optional[int]:
+    match = re.search(r"\((\d+)\)", column_type)
+    return int(match.group(1)) if match else None
+
+
+def migrate_embedding_column(clear_embeddings: bool = False):
+    """Change chunks.embedding to the configured type and dimension.
+
+    A type change with the same dimension converts the stored vectors in place. A
+    dimension change cannot be converted; it deletes all chunks and ingestion state so
+    documents are re-ingested, and only runs with clear_embeddings=True.
+    """
+    validate_embedding_settings()
+    with engine.begin() as conn:
+        current, expected = _embedding_column(conn)
+        if current is None or current == expected:
+            print(f"✅ chunks.embedding is already {expected}")
+            return
+        same_dim = _dimension(current) == settings.EMBED_DIM
+        if not same_dim and not clear_embeddings:
+            raise EmbeddingSchemaError(
+                f"Changing chunks.embedding from {current} to {expected} deletes all chunks; "
+                f"re-run with --clear-embeddings to do that"
+            )
+        # The existing index's operator class may not apply to the new type
+        for name in _ann_index_names(conn):
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        if same_dim:
+            conn.execute(text(f"ALTER TABLE chunks ALTER COLUMN embedding TYPE {expected} USING embedding::{expected}"))
+            print(f"✅ Converted chunks.embedding from {current} to {expected}")
+        else:
+            deleted = conn.execute(text("DELETE FROM chunks")).rowcount
+            conn.execute(text("DELETE FROM document_ingestions"))
+            conn.execute(text(f"ALTER TABLE chunks ALTER COLUMN embedding TYPE {expected} USING NULL"))
+            print(f"⚠️  Deleted {deleted} chunks and changed chunks.embedding from {current} to {expected}; documents must be re-ingested")
+
+
+def ensure_vector_index():
+    """Create the configured ANN index (dropping any other) without blocking writes"""
+    if not _is_postgres():
+        return
+    index_type = (settings.VECTOR_INDEX_TYPE or "none").lower()
+    try:
+        # A mismatched column is reported by check_embedding_column at startup; never build on it
+        check_embedding_column()
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            row = conn.execute(text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")).first()
+            _status["extension_version"] = row[0] if row else None
+            # Search filters on the owning user's documents before ranking
+            conn.execute(text("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_documents_user_id ON documents (user_id)"))
+
+            name = _index_name(index_type) if index_type in INDEX_TYPES else None
+            _drop_ann_indexes(conn, keep=name)
+            if name is None:
+                _status.update(type=None, index=None, error=None)
+                return
+
+            expression, opclass, indexed_type = _index_definition()
+            if settings.EMBED_DIM > MAX_INDEXED_DIM[indexed_type]:
+                _status.update(type=None, index=None, error=(
+                    f"{indexed_type} indexes support at most {MAX_INDEXED_DIM[indexed_type]} dimensions; "
+                    f"searching without an ANN index"
+                ))
+                print(f"⚠️  Skipping {index_type} index: {_status['error']}")
+                return
+
+            if index_type == "hnsw":
+                ddl = (
+                    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON chunks "
+                    f"USING hnsw ({expression} {opclass}) "
+                    f"WITH (m = {int(settings.HNSW_M)}, ef_construction = {int(settings.HNSW_EF_CONSTRUCTION)})"
+                )
+            else:
+                row_count = conn.execute(text("SELECT count(*) FROM chunks")).scalar() or 0
+                if row_count == 0:
+                    # IVFFlat centroids are learned from existing rows; building on an empty table is useless
+                    _status.update(type=None, index=None, error="ivfflat index deferred until chunks exist")
+                    print("⚠️  Deferring ivfflat index until the chunks table has rows")
+                    return
+                lists = settings.IVFFLAT_LISTS or (
+                    max(1, row_count // 1000) if row_count <= 1_000_000 else int(math.sqrt(row_count))
+                )
+                ddl = (
+                    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON chunks "
+                    f"USING ivfflat ({expression} {opclass}) WITH (lists = {int(lists)})"
+                )
+            conn.execute(text(ddl))
+            _status.update(type=index_type, index=name, error=None)
+            print(f"✅ Vector index ready: {name}")
+    except Exception as e:
+        _status["error"] = str(e)
+        print(f"⚠️  Could not create vector index: {e}")
+
+
+def apply_search_params(db: Session, top_k: int, ef_search: Optional[int] = None, probes: Optional[int] = None):
+    """Set ANN search parameters for the current transaction only"""
+    if not _is_postgres():
+        return
+    if _status["type"] == "hnsw":
+        # ef_search below top_k would cap the number of rows the index can return
+        ef = max(top_k, ef_search or settings.HNSW_EF_SEARCH)
+        db.execute(text("SELECT set_config('hnsw.ef_search', :v, true)"), {"v": str(ef)})
+        if _supports_iterative_scan():
+            # Keep scanning the graph when the user filter discards candidates
+            db.execute(text("SELECT set_config('hnsw.iterative_scan', 'relaxed_order', true)"))
+    elif _status["type"] == "ivfflat":
+        db.execute(text("SELECT set_config('ivfflat.probes', :v, true)"), {"v": str(probes or settings.IVFFLAT_PROBES)})
+        if _supports_iterative_scan():
+            db.execute(text("SELECT set_config('ivfflat.iterative_scan', 'relaxed_order', true)"))
+
+
+def _supports_iterative_scan() -> bool:
+    version = _status["extension_version"]
+    if not version:
+        return False
+    try:
+        major, minor = (int(p) for p in version.split(".")[:2])
+    except ValueError:
+        return False
+    return (major, minor) >= (0, 8)
+
+
+def vector_index_status() -> Dict[str, Any]:
+    return {
+        **_status,
+        "storage": f"{storage_type()}({settings.EMBED_DIM})",
+        "quantization": index_quantization(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate chunks.embedding to EMBED_DIM / EMBED_STORAGE")
+    parser.add_argument("command", choices=["migrate"])
+    parser.add_argument("--clear-embeddings", action="store_true", help="allow a dimension change, which deletes all chunks")
+    args = parser.parse_args()
+    migrate_embedding_column(clear_embeddings=args.clear_embeddings)
@@ -2,11 +2,13 @@ import faiss
 import numpy as np
 import pickle
 import os
-from typing import List, Dict, Any, Tuple
+import threading
+from typing import List, Dict, Any, Optional, Tuple
 from sentence_transformers import SentenceTransformer
 from sqlalchemy.orm import Session
 from .models import LegalCase, LegalStatute, Document, Chunk
 from .schemas import LegalCaseResponse, LegalStatuteResponse
+from .config import settings
 import json
 
 class VectorSimilarityService:
@@ -20,10 +22,13 @@ class VectorSimilarityService:
         self.statute_index = None
         self.document_index = None
         
-        # Metadata storage
-        self.case_metadata = []
-        self.statute_metadata = []
-        self.document_metadata = []
+        # Metadata storage: FAISS id -> metadata, and key (case_id, statute_id, document id) -> FAISS id
+        self.case_metadata: Dict[int, Dict[str, Any]] = {}
+        self.statute_metadata: Dict[int, Dict[str, Any]] = {}
+        self.document_metadata: Dict[int, Dict[str, Any]] = {}
+        self.case_ids: Dict[str, int] = {}
+        self.statute_ids: Dict[str, int] = {}
+        self.document_ids: Dict[str, int] = {}
         
         # File paths for persistence
         self.case_index_path = "data/case_index.faiss"
@@ -34,39 +39,184 @@ class VectorSimilarityService:
         # Create data directory if it doesn't exist
         os.makedirs("data", exist_ok=True)
         
+        # Guards index updates and index swaps against concurrent searches
+        self._lock = threading.RLock()
+        self._rebuilding = set()  # kinds with a background rebuild running
+        
         # Load existing indices if they exist
         self._load_indices()
 
+    def _new_index(self):
+        """Empty index of FAISS_INDEX_TYPE; IVF-PQ starts flat until there is enough to train on"""
+        return self._build_index(np.zeros((0, self.embedding_dim), dtype='float32'), np.zeros(0, dtype='int64'))
+
+    def _build_index(self, vectors: np.ndarray, ids: np.ndarray):
+        # IndexIDMap2 keeps our ids on the vectors, so entries can be replaced and removed
+        index_type = settings.FAISS_INDEX_TYPE
+        if index_type == "hnsw":
+            inner = faiss.IndexHNSWFlat(self.embedding_dim, settings.FAISS_HNSW_M, faiss.METRIC_INNER_PRODUCT)
+            inner.hnsw.efConstruction = settings.FAISS_HNSW_EF_CONSTRUCTION
+        elif index_type == "ivfpq" and len(vectors) >= settings.FAISS_TRAIN_MIN:
+            nlist = max(1, min(settings.FAISS_IVF_NLIST, len(vectors) // 39))  # FAISS wants ~39 training points per list
+            inner = faiss.IndexIVFPQ(
+                faiss.IndexFlatIP(self.embedding_dim), self.embedding_dim, nlist,
+                settings.FAISS_PQ_M, settings.FAISS_PQ_BITS, faiss.METRIC_INNER_PRODUCT
+            )
+            sample = np.random.default_rng(0).choice(len(vectors), min(len(vectors), settings.FAISS_TRAIN_SAMPLE), replace=False)
+            inner.train(vectors[np.sort(sample)])
+        else:
+            inner = faiss.IndexFlatIP(self.embedding_dim)
+        index = faiss.IndexIDMap2(inner)
+        if len(vectors):
+            index.add_with_ids(vectors, ids)
+        return index
+
+    @staticmethod
+    def _inner(index):
+        return faiss.downcast_index(index.index)
+
+    @classmethod
+    def _removes_in_place(cls, index) -> bool:
+        """Only a flat index can drop vectors through IndexIDMap2: HNSW cannot remove them at
+        all, and IVF keeps the positions the wrapper gave it while the wrapper renumbers, so
+        labels would shift. Elsewhere removed vectors stay until the next rebuild and searches
+        skip them by their missing metadata."""
+        return isinstance(cls._inner(index), faiss.IndexFlat)
+
+    def _needs_rebuild(self, name: str) -> bool:
+        """Whether an index should be rebuilt as FAISS_INDEX_TYPE: flat -> IVF-PQ once
+        FAISS_TRAIN_MIN vectors exist, IVF-PQ -> IVF-PQ once it outgrows the nlist it was
+        trained with, HNSW or IVF-PQ -> itself to drop replaced and deleted vectors (see
+        _removes_in_place), and any index of another type"""
+        index, metadata = getattr(self, f"{name}_index"), getattr(self, f"{name}_metadata")
+        inner, index_type = self._inner(index), settings.FAISS_INDEX_TYPE
+        dead = index.ntotal - len(metadata)
+        compact = dead >= max(settings.INDEX_COMPACT_MIN_DELETED, settings.INDEX_COMPACT_DELETED_RATIO * index.ntotal)
+        if isinstance(inner, faiss.IndexIVF):
+            if index_type != "ivfpq" or compact:
+                return True
+            # nlist was capped at training vectors / 39; retrain once well past that
+            return inner.nlist < settings.FAISS_IVF_NLIST and len(metadata) > inner.nlist * 39 * settings.FAISS_IVF_RETRAIN_GROWTH
+        if isinstance(inner, faiss.IndexHNSW):
+            return index_type != "hnsw" or compact
+        return index_type == "hnsw" or (index_type == "ivfpq" and len(metadata) >= settings.FAISS_TRAIN_MIN)
+
+    def _maybe_rebuild(self, name: str):
+        """Start a background rebuild if the index needs one; searches and updates keep using
+        the current index until the new one is swapped in"""
+        with self._lock:
+            if name in self._rebuilding or not self._needs_rebuild(name):
+                return
+            self._rebuilding.add(name)
+        threading.Thread(target=self._rebuild, args=(name,), daemon=True).start()
+
+    def _vectors(self, name: str, index, ids: np.ndarray, entries: List[Dict[str, Any]]) -> np.ndarray:
+        """Full-precision vectors for ids: read back from a flat or HNSW index, embedded again
+        from their metadata for IVF-PQ, which only keeps compressed codes"""
+        if not len(ids):
+            return np.zeros((0, self.embedding_dim), dtype='float32')
+        if isinstance(self._inner(index), faiss.IndexIVF):
+            return self._embed([self._embedding_text(name, entry) for entry in entries])
+        return np.vstack([index.reconstruct(int(i)) for i in ids])
+
+    def _rebuild(self, name: str):
+        """Build the new index without holding the lock (training and HNSW construction are the
+        slow part), then add the vectors indexed meanwhile, drop those removed meanwhile and
+        swap it in"""
+        try:
+            with self._lock:
+                old, metadata = getattr(self, f"{name}_index"), getattr(self, f"{name}_metadata")
+                ids = np.array(sorted(metadata), dtype='int64')
+                entries = [metadata[i] for i in ids]
+                exact = not isinstance(self._inner(old), faiss.IndexIVF)
+                vectors = self._vectors(name, old, ids, entries) if exact else None
+            if vectors is None:
+                vectors = self._vectors(name, old, ids, entries)
+            index = self._build_index(vectors, ids)
+            with self._lock:
+                if getattr(self, f"{name}_index") is not old:
+                    return  # replaced meanwhile (rebuild_index_from_database)
+                metadata, snapshot = getattr(self, f"{name}_metadata"), set(ids.tolist())
+                added = np.array(sorted(set(metadata) - snapshot), dtype='int64')
+                if len(added):
+                    index.add_with_ids(self._vectors(name, old, added, [metadata[i] for i in added]), added)
+                removed = [i for i in snapshot if i not in metadata]
+                if removed and self._removes_in_place(index):
+                    index.remove_ids(np.array(removed, dtype='int64'))
+                setattr(self, f"{name}_index", index)
+                self._save_indices()
+                print(f"✅ Rebuilt {name} index as {settings.FAISS_INDEX_TYPE} with {index.ntotal} vectors")
+        except Exception as e:
+            print(f"⚠️  Rebuilding {name} index failed: {e}")
+        finally:
+            with self._lock:
+                self._rebuilding.discard(name)
+
+    @staticmethod
+    def _embedding_text(name: str, entry: Dict[str, Any]) -> str:
+        """Text an entry's vector is embedded from; its metadata holds every field used"""
+        if name == 'case':
+            return f"{entry['title']} {entry['summary']} {entry['citation']} {entry['court']}"
+        if name == 'statute':
+            return f"{entry['title']} {entry['summary']} {entry['section_number']} {entry['jurisdiction']}"
+        return f"{entry.get('title') or ''} {entry.get('content') or ''} {entry.get('filename') or ''}"
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        """Normalized float32 embeddings, so inner product is cosine similarity"""
+        embeddings = self.model.encode(texts, convert_to_tensor=False).astype('float32')
+        faiss.normalize_L2(embeddings)
+        return embeddings
+
+    def _read_index(self, path: str, metadata):
+        """Load an index with its metadata as {id: metadata}; indexes saved before ids existed
+        are positional and get ids 0..n-1"""
+        if not os.path.exists(path):
+            return self._new_index(), {}
+        index = faiss.read_index(path)
+        if isinstance(metadata, list):
+            metadata = dict(enumerate(metadata))
+        if not isinstance(index, faiss.IndexIDMap2):
+            mapped = self._new_index()
+            if index.ntotal:
+                mapped.add_with_ids(index.reconstruct_n(0, index.ntotal), np.arange(index.ntotal, dtype='int64'))
+            index = mapped
+        return index, metadata
+
+    def _load_keys(self, name: str, key_field: str):
+        """key -> id; for keys indexed more than once only the newest id is kept"""
+        metadata = getattr(self, f"{name}_metadata")
+        keys, duplicates = {}, []
+        for faiss_id in sorted(metadata):
+            key = metadata[faiss_id].get(key_field)
+            if key is None:
+                continue
+            if str(key) in keys:
+                duplicates.append(keys[str(key)])
+            keys[str(key)] = faiss_id
+        setattr(self, f"{name}_ids", keys)
+        self._remove(name, duplicates)
+        self._maybe_rebuild(name)
+
     def _load_indices(self):
         """Load existing FAISS indices and metadata"""
         try:
-            if os.path.exists(self.case_index_path):
-                self.case_index = faiss.read_index(self.case_index_path)
-            else:
-                self.case_index = faiss.IndexFlatIP(self.embedding_dim)
-            
-            if os.path.exists(self.statute_index_path):
-                self.statute_index = faiss.read_index(self.statute_index_path)
-            else:
-                self.statute_index = faiss.IndexFlatIP(self.embedding_dim)
-            
-            if os.path.exists(self.document_index_path):
-                self.document_index = faiss.read_index(self.document_index_path)
-            else:
-                self.document_index = faiss.IndexFlatIP(self.embedding_dim)
-            
+            metadata = {}
             if os.path.exists(self.metadata_path):
                 with open(self.metadata_path, 'rb') as f:
                     metadata = pickle.load(f)
-                    self.case_metadata = metadata.get('cases', [])
-                    self.statute_metadata = metadata.get('statutes', [])
-                    self.document_metadata = metadata.get('documents', [])
+            self.case_index, self.case_metadata = self._read_index(self.case_index_path, metadata.get('cases', {}))
+            self.statute_index, self.statute_metadata = self._read_index(self.statute_index_path, metadata.get('statutes', {}))
+            self.document_index, self.document_metadata = self._read_index(self.document_index_path, metadata.get('documents', {}))
         except Exception as e:
             print(f"Error loading indices: {e}")
             # Initialize empty indices
-            self.case_index = faiss.IndexFlatIP(self.embedding_dim)
-            self.statute_index = faiss.IndexFlatIP(self.embedding_dim)
-            self.document_index = faiss.IndexFlatIP(self.embedding_dim)
+            self.case_index = self._new_index()
+            self.statute_index = self._new_index()
+            self.document_index = self._new_index()
+            self.case_metadata, self.statute_metadata, self.document_metadata = {}, {}, {}
+        self._load_keys('case', 'case_id')
+        self._load_keys('statute', 'statute_id')
+        self._load_keys('document', 'id')
 
     def _save_indices(self):
         """Save FAISS indices and metadata"""
@@ -86,184 +236,168 @@ class VectorSimilarityService:
         except Exception as e:
             print(f"Error saving indices: {e}")
 
-    def add_cases_to_index(self, cases: List[LegalCaseResponse]):
-        """Add cases to the FAISS index"""
-        if not cases:
+    def _remove(self, name: str, faiss_ids: List[int]):
+        """Forget entries; outside a flat index their vectors stay until the next rebuild and
+        searches skip them by their missing metadata"""
+        if not faiss_ids:
             return
+        index, metadata = getattr(self, f"{name}_index"), getattr(self, f"{name}_metadata")
+        if self._removes_in_place(index):
+            index.remove_ids(np.array(faiss_ids, dtype='int64'))
+        for faiss_id in faiss_ids:
+            metadata.pop(faiss_id, None)
+
+    def _upsert(self, name: str, keys: List[Any], embeddings: np.ndarray, entries: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Add embeddings, replacing those already indexed under the same key"""
+        latest = {}  # key -> row; the last row for a key in one batch wins
+        rows = []
+        for row, key in enumerate(keys):
+            if key is None:
+                rows.append(row)
+            else:
+                latest[str(key)] = row
+        rows += latest.values()
+
+        with self._lock:
+            index, metadata, ids = getattr(self, f"{name}_index"), getattr(self, f"{name}_metadata"), getattr(self, f"{name}_ids")
+            # New ids never reuse one still held by a vector (HNSW and IVF keep removed vectors until a rebuild)
+            next_id = max(max(metadata, default=-1), int(faiss.vector_to_array(index.id_map).max()) if index.ntotal else -1) + 1
+            faiss_ids = list(range(next_id, next_id + len(rows)))
+            replaced = [ids[key] for key in latest if key in ids]
+            self._remove(name, replaced)
+            index.add_with_ids(embeddings[rows], np.array(faiss_ids, dtype='int64'))
+            for row, faiss_id in zip(rows, faiss_ids):
+                metadata[faiss_id] = entries[row]
+            ids.update(zip(latest, faiss_ids[len(rows) - len(latest):]))
+            self._maybe_rebuild(name)
+            self._save_indices()
+        return {"added": len(rows) - len(replaced), "updated": len(replaced)}
+
+    def _delete(self, name: str, keys: List[Any]) -> int:
+        with self._lock:
+            ids = getattr(self, f"{name}_ids")
+            faiss_ids = [ids.pop(str(key)) for key in keys if str(key) in ids]
+            if faiss_ids:
+                self._remove(name, faiss_ids)
+                self._maybe_rebuild(name)
+                self._save_indices()
+        return len(faiss_ids)
+
+    def _search(self, name: str, query: str, k: int, nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Top k entries by cosine similarity. nprobe (IVF lists scanned) and ef_search (HNSW
+        candidate list size) trade recall for speed per query; None uses the configured default."""
+        # Generate query embedding
+        query_embedding = self.model.encode([query], convert_to_tensor=False)
+        query_embedding = query_embedding.astype('float32')
+        faiss.normalize_L2(query_embedding)
         
-        # Prepare text for embedding
-        texts = []
-        for case in cases:
-            text = f"{case.title} {case.summary} {case.citation} {case.court}"
-            texts.append(text)
-        
-        # Generate embeddings
-        embeddings = self.model.encode(texts, convert_to_tensor=False)
-        embeddings = embeddings.astype('float32')
-        
-        # Normalize embeddings for cosine similarity
-        faiss.normalize_L2(embeddings)
-        
-        # Add to index
-        self.case_index.add(embeddings)
+        with self._lock:
+            index, metadata = getattr(self, f"{name}_index"), getattr(self, f"{name}_metadata")
+            if not metadata or k <= 0:
+                return []
+            # Vectors without metadata (replaced or deleted, HNSW and IVF) may take up result slots
+            fetch = min(index.ntotal, k + index.ntotal - len(metadata))
+            inner = self._inner(index)
+            params = None
+            if isinstance(inner, faiss.IndexIVF):
+                params = faiss.SearchParametersIVF(nprobe=nprobe or settings.FAISS_NPROBE)
+            elif isinstance(inner, faiss.IndexHNSW):
+                params = faiss.SearchParametersHNSW(efSearch=max(fetch, ef_search or settings.FAISS_HNSW_EF_SEARCH))
+            scores, indices = index.search(query_embedding, fetch, params=params)
+            
+            # Return results with metadata
+            results = []
+            for score, idx in zip(scores[0], indices[0]):
+                if idx in metadata:
+                    results.append({**metadata[idx], 'similarity_score': float(score)})
+            return results[:k]
+
+    def add_cases_to_index(self, cases: List[LegalCaseResponse]) -> Dict[str, int]:
+        """Add cases to the FAISS index, replacing those with the same case_id"""
+        if not cases:
+            return {"added": 0, "updated": 0}
         
         # Store metadata
-        for i, case in enumerate(cases):
-            self.case_metadata.append({
-                'id': case.id,
-                'case_id': case.case_id,
-                'title': case.title,
-                'court': case.court,
-                'citation': case.citation,
-                'summary': case.summary,
-                'case_date': case.case_date,
-                'case_type': case.case_type,
-                'jurisdiction': case.jurisdiction,
-                'source': case.source,
-                'relevance_score': case.relevance_score
-            })
-        
-        self._save_indices()
+        entries = [{
+            'id': case.id,
+            'case_id': case.case_id,
+            'title': case.title,
+            'court': case.court,
+            'citation': case.citation,
+            'summary': case.summary,
+            'case_date': case.case_date,
+            'case_type': case.case_type,
+            'jurisdiction': case.jurisdiction,
+            'source': case.source,
+            'relevance_score': case.relevance_score
+        } for case in cases]
+        embeddings = self._embed([self._embedding_text('case', entry) for entry in entries])
+        
+        # Add to index, replacing entries with the same key
+        return self._upsert('case', [case.case_id for case in cases], embeddings, entries)
 
-    def add_statutes_to_index(self, statutes: List[LegalStatuteResponse]):
-        """Add statutes to the FAISS index"""
+    def add_statutes_to_index(self, statutes: List[LegalStatuteResponse]) -> Dict[str, int]:
+        """Add statutes to the FAISS index, replacing those with the same statute_id"""
         if not statutes:
-            return
-        
-        # Prepare text for embedding
-        texts = []
-        for statute in statutes:
-            text = f"{statute.title} {statute.summary} {statute.section_number} {statute.jurisdiction}"
-            texts.append(text)
-        
-        # Generate embeddings
-        embeddings = self.model.encode(texts, convert_to_tensor=False)
-        embeddings = embeddings.astype('float32')
-        
-        # Normalize embeddings for cosine similarity
-        faiss.normalize_L2(embeddings)
-        
-        # Add to index
-        self.statute_index.add(embeddings)
+            return {"added": 0, "updated": 0}
         
         # Store metadata
-        for i, statute in enumerate(statutes):
-            self.statute_metadata.append({
-                'id': statute.id,
-                'statute_id': statute.statute_id,
-                'title': statute.title,
-                'jurisdiction': statute.jurisdiction,
-                'section_number': statute.section_number,
-                'summary': statute.summary,
-                'effective_date': statute.effective_date,
-                'source': statute.source,
-                'relevance_score': statute.relevance_score
-            })
-        
-        self._save_indices()
+        entries = [{
+            'id': statute.id,
+            'statute_id': statute.statute_id,
+            'title': statute.title,
+            'jurisdiction': statute.jurisdiction,
+            'section_number': statute.section_number,
+            'summary': statute.summary,
+            'effective_date': statute.effective_date,
+            'source': statute.source,
+            'relevance_score': statute.relevance_score
+        } for statute in statutes]
+        embeddings = self._embed([self._embedding_text('statute', entry) for entry in entries])
+        
+        # Add to index, replacing entries with the same key
+        return self._upsert('statute', [statute.statute_id for statute in statutes], embeddings, entries)
 
-    def add_documents_to_index(self, documents: List[Dict[str, Any]]):
-        """Add documents to the FAISS index"""
+    def add_documents_to_index(self, documents: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Add documents to the FAISS index, replacing those with the same id"""
         if not documents:
-            return
-        
-        # Prepare text for embedding
-        texts = []
-        for doc in documents:
-            text = f"{doc.get('title', '')} {doc.get('content', '')} {doc.get('filename', '')}"
-            texts.append(text)
-        
-        # Generate embeddings
-        embeddings = self.model.encode(texts, convert_to_tensor=False)
-        embeddings = embeddings.astype('float32')
-        
-        # Normalize embeddings for cosine similarity
-        faiss.normalize_L2(embeddings)
-        
-        # Add to index
-        self.document_index.add(embeddings)
+            return {"added": 0, "updated": 0}
         
         # Store metadata
-        for i, doc in enumerate(documents):
-            self.document_metadata.append({
-                'id': doc.get('id'),
-                'title': doc.get('title'),
-                'filename': doc.get('filename'),
-                'content': doc.get('content'),
-                'user_id': doc.get('user_id'),
-                'created_at': doc.get('created_at')
-            })
-        
-        self._save_indices()
+        entries = [{
+            'id': doc.get('id'),
+            'title': doc.get('title'),
+            'filename': doc.get('filename'),
+            'content': doc.get('content'),
+            'user_id': doc.get('user_id'),
+            'created_at': doc.get('created_at')
+        } for doc in documents]
+        embeddings = self._embed([self._embedding_text('document', entry) for entry in entries])
+        
+        # Add to index, replacing entries with the same key
+        return self._upsert('document', [doc.get('id') for doc in documents], embeddings, entries)
+
+    def delete_cases(self, case_ids: List[str]) -> int:
+        """Remove cases from the FAISS index; returns how many were indexed"""
+        return self._delete('case', case_ids)
+
+    def delete_statutes(self, statute_ids: List[str]) -> int:
+        return self._delete('statute', statute_ids)
+
+    def delete_documents(self, document_ids: List[Any]) -> int:
+        return self._delete('document', document_ids)
 
-    def find_similar_cases(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+    def find_similar_cases(self, query: str, k: int = 5, nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> List[Dict[str, Any]]:
         """Find similar cases using FAISS"""
-        if self.case_index.ntotal == 0:
-            return []
-        
-        # Generate query embedding
-        query_embedding = self.model.encode([query], convert_to_tensor=False)
-        query_embedding = query_embedding.astype('float32')
-        faiss.normalize_L2(query_embedding)
-        
-        # Search
-        scores, indices = self.case_index.search(query_embedding, min(k, self.case_index.ntotal))
-        
-        # Return results with metadata
-        results = []
-        for i, (score, idx) in enumerate(zip(scores[0], indices[0])):
-            if idx < len(self.case_metadata):
-                result = self.case_metadata[idx].copy()
-                result['similarity_score'] = float(score)
-                results.append(result)
-        
-        return results
+        return self._search('case', query, k, nprobe, ef_search)
 
-    def find_similar_statutes(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+    def find_similar_statutes(self, query: str, k: int = 5, nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> List[Dict[str, Any]]:
         """Find similar statutes using FAISS"""
-        if self.statute_index.ntotal == 0:
-            return []
-        
-        # Generate query embedding
-        query_embedding = self.model.encode([query], convert_to_tensor=False)
-        query_embedding = query_embedding.astype('float32')
-        faiss.normalize_L2(query_embedding)
-        
-        # Search
-        scores, indices = self.statute_index.search(query_embedding, min(k, self.statute_index.ntotal))
-        
-        # Return results with metadata
-        results = []
-        for i, (score, idx) in enumerate(zip(scores[0], indices[0])):
-            if idx < len(self.statute_metadata):
-                result = self.statute_metadata[idx].copy()
-                result['similarity_score'] = float(score)
-                results.append(result)
-        
-        return results
+        return self._search('statute', query, k, nprobe, ef_search)
 
-    def find_similar_documents(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+    def find_similar_documents(self, query: str, k: int = 5, nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> List[Dict[str, Any]]:
         """Find similar documents using FAISS"""
-        if self.document_index.ntotal == 0:
-            return []
-        
-        # Generate query embedding
-        query_embedding = self.model.encode([query], convert_to_tensor=False)
-        query_embedding = query_embedding.astype('float32')
-        faiss.normalize_L2(query_embedding)
-        
-        # Search
-        scores, indices = self.document_index.search(query_embedding, min(k, self.document_index.ntotal))
-        
-        # Return results with metadata
-        results = []
-        for i, (score, idx) in enumerate(zip(scores[0], indices[0])):
-            if idx < len(self.document_metadata):
-                result = self.document_metadata[idx].copy()
-                result['similarity_score'] = float(score)
-                results.append(result)
-        
-        return results
+        return self._search('document', query, k, nprobe, ef_search)
 
     def find_similar_cases_by_case_text(self, case_text: str, k: int = 5) -> List[Dict[str, Any]]:
         """Find similar cases based on case text content"""
@@ -286,20 +420,20 @@ class VectorSimilarityService:
     def rebuild_index_from_database(self, db: Session):
         """Rebuild all indices from database"""
         try:
-            # Clear existing indices
-            self.case_index = faiss.IndexFlatIP(self.embedding_dim)
-            self.statute_index = faiss.IndexFlatIP(self.embedding_dim)
-            self.document_index = faiss.IndexFlatIP(self.embedding_dim)
-            self.case_metadata = []
-            self.statute_metadata = []
-            self.document_metadata = []
+            with self._lock:
+                # Clear existing indices
+                self.case_index = self._new_index()
+                self.statute_index = self._new_index()
+                self.document_index = self._new_index()
+                self.case_metadata, self.statute_metadata, self.document_metadata = {}, {}, {}
+                self.case_ids, self.statute_ids, self.document_ids = {}, {}, {}
             
-            # Rebuild from database
-            # This would require implementing database queries to get all cases, statutes, and documents
-            # For now, we'll keep the existing functionality
+                # Rebuild from database
+                # This would require implementing database queries to get all cases, statutes, and documents
+                # For now, we'll keep the existing functionality
             
-            self._save_indices()
-            print("Indices rebuilt successfully")
+                self._save_indices()
+                print("Indices rebuilt successfully")
         except Exception as e:
             print(f"Error rebuilding indices: {e}")
 
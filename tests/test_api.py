@@ -16,3 +16,57 @@ def test_register_and_login():
     r2 = client.post("/login", json={"email": "unit@example.com", "password": "pw"})
     assert r2.status_code == 200
     assert r2.json()["access_token"]
+
+def test_query_retrieves_and_answers_on_cache_miss(monkeypatch):
+    import app.main as main
+
+    async def no_hits(*args, **kwargs):
+        return []
+
+    async def answer(question, hits):
+        return "No relevant documents.", "low"
+
+    async def embed(question):
+        return [0.0]
+
+    monkeypatch.setattr(main, "hybrid_search_async", no_hits)
+    monkeypatch.setattr(main, "answer_with_citations_async", answer)
+    monkeypatch.setattr(main, "embed_query_async", embed)
+    r = client.post("/register", json={"email": "query@example.com", "password": "pw", "role": "lawyer"})
+    token = r.json().get("access_token") or client.post("/login", json={"email": "query@example.com", "password": "pw"}).json()["access_token"]
+    r = client.post("/query", json={"question": "What is Section 138?"}, headers={"Authorization": f"Bearer {token}"})
+    assert r.status_code == 200
+    assert r.json()["answer"] == "No relevant documents."
+
+def test_query_stream_logs_failed_generations_and_is_not_cached(monkeypatch):
+    import app.main as main
+    from app.database import SessionLocal
+    from app.models import QueryLog
+
+    async def no_hits(*args, **kwargs):
+        return []
+
+    async def embed(question):
+        return [0.0]
+
+    async def failing_stream(question, hits):
+        yield "Section 138 "
+        raise RuntimeError("quota exceeded")
+
+    monkeypatch.setattr(main, "hybrid_search_async", no_hits)
+    monkeypatch.setattr(main, "embed_query_async", embed)
+    monkeypatch.setattr(main, "stream_answer_with_citations_async", failing_stream)
+    monkeypatch.setattr(main.answer_cache, "headers", lambda entry, status: {"X-Cache": status, "Cache-Control": "private, max-age=60"})
+    r = client.post("/register", json={"email": "stream@example.com", "password": "pw", "role": "lawyer"})
+    token = r.json().get("access_token") or client.post("/login", json={"email": "stream@example.com", "password": "pw"}).json()["access_token"]
+    question = "Is a stream failure logged?"
+    with SessionLocal() as db:
+        before = db.query(QueryLog).filter(QueryLog.question == question).count()
+
+    r = client.post("/query/stream", json={"question": question}, headers={"Authorization": f"Bearer {token}"})
+
+    assert r.status_code == 200
+    assert r.headers["cache-control"] == "no-cache"
+    assert "event: error" in r.text
+    with SessionLocal() as db:
+        assert db.query(QueryLog).filter(QueryLog.question == question).count() == before + 1
@@ -0,0 +1,43 @@
+from app.bm25_index import BM25Index
+
+
+def test_ranks_documents_by_query_terms():
+    index = BM25Index()
+    index.add_many([
+        "Cheque dishonour under Section 138 of the Negotiable Instruments Act",
+        "Bail conditions for anticipatory bail in criminal matters",
+        "Section 138 complaint dismissed; cheque dishonour not proved",
+    ])
+    hits = index.search("cheque dishonour section 138", k=2)
+    assert [doc for doc, _ in hits] in ([0, 2], [2, 0])
+    assert all(score > 0 for _, score in hits)
+    assert index.search("anticipatory bail", k=5)[0][0] == 1
+
+
+def test_unknown_and_stop_word_queries_return_nothing():
+    index = BM25Index()
+    index.add("Contract for the sale of goods")
+    assert index.search("the of", k=3) == []
+    assert index.search("habeas corpus", k=3) == []
+
+
+def test_large_candidate_sets_return_best_k_in_order():
+    index = BM25Index()
+    index.add_many(f"lease agreement clause {i} " + "rent " * (i % 7) for i in range(5000))
+    hits = index.search("rent lease", k=10)
+    assert len(hits) == 10
+    scores = [score for _, score in hits]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_saved_postings_reload_for_the_same_generation(tmp_path):
+    index = BM25Index(str(tmp_path / "case_bm25"))
+    index.add_many(["Cheque dishonour under Section 138", "Bail conditions for anticipatory bail"])
+    index.save(generation=2)
+
+    reloaded = BM25Index(str(tmp_path / "case_bm25"))
+    assert reloaded.load(2, generation=2) == 2
+    assert reloaded.search("anticipatory bail", k=2) == index.search("anticipatory bail", k=2)
+    assert reloaded.add("Writ of habeas corpus") == 2
+    assert BM25Index(str(tmp_path / "case_bm25")).load(2, generation=3) == 0
+    assert BM25Index(str(tmp_path / "case_bm25")).load(1, generation=2) == 0
@@ -0,0 +1,24 @@
+from app.chunking import estimate_tokens, iter_chunks
+
+
+def test_chunks_respect_token_budget():
+    text = " ".join(f"Sentence number {i} is here." for i in range(200))
+    chunks = list(iter_chunks([(None, text)], max_tokens=50, overlap_tokens=10))
+    assert len(chunks) > 1
+    assert all(c.tokens <= 50 for c in chunks)
+    assert all(estimate_tokens(c.text) <= 50 for c in chunks)
+
+
+def test_offsets_and_pages_map_into_joined_text():
+    pages = [(1, "1. Definitions. The Party agrees.\nSec. 138 applies here."), (2, "ARTICLE II\nPayment is due.")]
+    joined = "\n\n".join(text for _, text in pages)
+    chunks = list(iter_chunks(pages, max_tokens=12, overlap_tokens=0))
+    for c in chunks:
+        assert joined[c.offset:c.offset + len(c.text)] == c.text
+    assert chunks[0].page == 1
+    assert chunks[-1].page == 2
+
+
+def test_abbreviations_do_not_split_sentences():
+    chunks = list(iter_chunks([(None, "See Sec. 138 of the Act. State v. Rao was cited.")], max_tokens=10, overlap_tokens=0))
+    assert chunks[0].text.startswith("See Sec. 138 of the Act.")
@@ -0,0 +1,69 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from app import http_client
+
+
+@pytest.fixture
+def server():
+    hits = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits.append(self.path)
+            self.send_response(429)
+            self.send_header("Retry-After", self.path.strip("/"))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}", hits
+    httpd.shutdown()
+    http_client.close_session()
+
+
+def test_long_retry_after_is_returned_not_slept(server):
+    url, hits = server
+    started = time.perf_counter()
+
+    response = http_client.get(f"{url}/3600", timeout=5)
+
+    assert response.status_code == 429
+    assert len(hits) == 1
+    assert time.perf_counter() - started < 2
+
+
+def test_short_retry_after_is_retried(server):
+    url, hits = server
+
+    assert http_client.get(f"{url}/0", timeout=5).status_code == 429
+
+    assert len(hits) == 1 + http_client.settings.HTTP_RETRIES
+
+
+def test_async_client_returns_long_retry_after(server):
+    url, hits = server
+
+    async def call():
+        try:
+            return await http_client.get_async(f"{url}/3600", timeout=5)
+        finally:
+            await http_client.close_async_client()
+
+    assert asyncio.run(call()).status_code == 429
+    assert len(hits) == 1
+
+
+def test_retry_that_would_overrun_the_budget_is_not_made(server):
+    url, hits = server
+
+    response = http_client.get(f"{url}/0", timeout=5, budget=1)
+
+    assert response.status_code == 429
+    assert len(hits) == 1
@@ -0,0 +1,54 @@
+import numpy as np
+from app.index_store import IndexStore
+
+
+def test_entries_survive_reopen(tmp_path):
+    store = IndexStore(str(tmp_path / "cases"))
+    assert store.append([{"id": 1, "title": "A v. B"}, {"id": 2, "title": "C v. D"}]) == [0, 1]
+    assert store.append([{"id": 3, "title": "E v. F"}]) == [2]
+    reopened = IndexStore(str(tmp_path / "cases"))
+    assert len(reopened) == 3
+    assert reopened[1]["title"] == "C v. D"
+    assert [e["id"] for e in reopened.entries(1)] == [2, 3]
+
+
+def test_compaction_keeps_order_and_vectors(tmp_path):
+    store = IndexStore(str(tmp_path / "docs"), dim=4, max_segments=2)
+    for i in range(5):
+        store.append([{"id": i}], np.full((1, 4), i, dtype=np.float32))
+    assert store.stats()["segments"] <= 2
+    assert [e["id"] for e in store] == list(range(5))
+    assert np.array_equal(store.vectors()[:, 0], np.arange(5, dtype=np.float32))
+    assert store.vector(3)[0] == 3.0
+    store.clear()
+    assert len(IndexStore(str(tmp_path / "docs"), dim=4)) == 0
+
+
+def test_deleted_entries_are_dropped_on_rewrite(tmp_path):
+    store = IndexStore(str(tmp_path / "statutes"))
+    store.append([{"id": i} for i in range(4)])
+    store.delete([1, 3])
+    assert IndexStore(str(tmp_path / "statutes")).is_deleted(3)
+    store.rewrite([0, 2, 3])
+    reopened = IndexStore(str(tmp_path / "statutes"))
+    assert [e["id"] for e in reopened] == [0, 2, 3]
+    assert reopened.deleted == 1 and reopened.is_deleted(2)
+
+
+def test_merges_are_size_tiered(tmp_path):
+    store = IndexStore(str(tmp_path / "cases"), max_segments=100, merge_factor=4)
+    merged_sizes = []
+    original_merge = store._merge
+
+    def merge(start, end):
+        merged_sizes.append(sum(len(s) for s in store._segments[start:end]))
+        original_merge(start, end)
+
+    store._merge = merge
+    for i in range(64):
+        store.append([{"id": i}])
+
+    # 16 merges of 4, 4 of 16 and one of 64: each entry copied three times, not on every merge
+    assert sorted(merged_sizes) == [4] * 16 + [16] * 4 + [64]
+    assert store.stats()["segments"] == 1
+    assert [e["id"] for e in store] == list(range(64))
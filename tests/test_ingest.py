@@ -0,0 +1,75 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app import ingest, ingestion_service
+from app.database import Base
+from app.models import Document, DocumentIngestion
+
+
+def _text_layer(pages, fail_after):
+    def layer(path):
+        for page_number, text in enumerate(pages, start=1):
+            if page_number > fail_after:
+                raise ValueError("broken xref")
+            yield page_number, text
+    return layer
+
+
+def test_pdfminer_failure_ocrs_remaining_pages(monkeypatch):
+    layer = ["text layer of page one", "", "text layer of page three"]
+    monkeypatch.setattr(ingest, "_iter_pdf_text_layer", _text_layer(layer, fail_after=2))
+    monkeypatch.setattr(ingest, "_ocr_pdf_page_numbers", lambda path, numbers: [f"ocr {n}" for n in numbers])
+
+    def ocr_rest(path, first_page=1):
+        for page_number in range(first_page, 5):
+            yield page_number, f"ocr {page_number}"
+
+    monkeypatch.setattr(ingest, "_iter_ocr_pdf_pages", ocr_rest)
+
+    pages = list(ingest.iter_pdf_pages("doc.pdf"))
+
+    assert pages == [(1, "text layer of page one"), (2, "ocr 2"), (3, "ocr 3"), (4, "ocr 4")]
+
+
+def test_extraction_with_failed_ocr_pages_is_not_cached(monkeypatch, tmp_path):
+    pdf = tmp_path / "scan.pdf"
+    pdf.write_bytes(b"%PDF-1.4 scanned")
+    stored = []
+    monkeypatch.setattr(ingest.extraction_cache, "get", lambda content_hash, version: None)
+    monkeypatch.setattr(ingest.extraction_cache, "put", lambda content_hash, version, pages: stored.append(pages))
+    monkeypatch.setattr(ingest, "_iter_pdf_text_layer", _text_layer(["text layer of page one", ""], fail_after=2))
+    monkeypatch.setattr(ingest, "_ocr_pdf_page_numbers", lambda path, numbers: [None] * len(numbers))
+
+    pages = list(ingest.iter_document_pages(str(pdf)))
+
+    assert pages == [(1, "text layer of page one")]
+    assert stored == []
+
+    monkeypatch.setattr(ingest, "_ocr_pdf_page_numbers", lambda path, numbers: [f"ocr {n}" for n in numbers])
+    assert list(ingest.iter_document_pages(str(pdf))) == [(1, "text layer of page one"), (2, "ocr 2")]
+    assert stored == [[(1, "text layer of page one"), (2, "ocr 2")]]
+
+
+def test_document_with_failed_ocr_pages_is_extracted_again(monkeypatch, tmp_path):
+    pdf = tmp_path / "scan.pdf"
+    pdf.write_bytes(b"%PDF-1.4 scanned")
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    doc = Document(user_id=1, title="scan", path=str(pdf), content_type="application/pdf")
+    db.add(doc)
+    db.commit()
+    monkeypatch.setattr(ingest.extraction_cache, "get", lambda content_hash, version: None)
+    monkeypatch.setattr(ingest.extraction_cache, "put", lambda content_hash, version, pages: None)
+    monkeypatch.setattr(ingestion_service, "upsert_document_chunks", lambda db, doc, pages, **kwargs: len(list(pages)))
+    monkeypatch.setattr(ingestion_service.answer_cache, "invalidate_user", lambda db, user_id: None)
+    monkeypatch.setattr(ingest, "_iter_pdf_text_layer", _text_layer(["text layer of page one", ""], fail_after=2))
+    monkeypatch.setattr(ingest, "_ocr_pdf_page_numbers", lambda path, numbers: [None] * len(numbers))
+
+    with pytest.raises(RuntimeError, match="OCR failed"):
+        ingestion_service.ingest_document(db, doc)
+    assert db.query(DocumentIngestion).count() == 0
+
+    monkeypatch.setattr(ingest, "_ocr_pdf_page_numbers", lambda path, numbers: [f"ocr {n}" for n in numbers])
+    assert ingestion_service.ingest_document(db, doc) == ("new", 2)
+    assert ingestion_service.ingest_document(db, doc) == ("skipped", 2)
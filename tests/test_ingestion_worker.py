@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.config import settings
+from app.database import Base
+from app.ingestion_worker import claim_next_job
+from app.models import IngestionJob
+
+
+def _session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)()
+
+
+def _expire(db, job_id):
+    db.query(IngestionJob).filter(IngestionJob.id == job_id).update(
+        {"lease_expires_at": datetime.now(timezone.utc) - timedelta(seconds=1)}
+    )
+    db.commit()
+
+
+def test_job_with_expired_lease_is_claimed_again(monkeypatch):
+    monkeypatch.setattr(settings, "INGEST_MAX_ATTEMPTS", 2)
+    db = _session()
+    db.add(IngestionJob(user_id=1, status="queued"))
+    db.commit()
+
+    job_id = claim_next_job(db, "worker-a")
+    assert job_id is not None
+    assert claim_next_job(db, "worker-b") is None  # lease still held
+
+    _expire(db, job_id)
+    assert claim_next_job(db, "worker-b") == job_id
+    job = db.get(IngestionJob, job_id)
+    db.refresh(job)
+    assert (job.worker_id, job.attempts, job.status) == ("worker-b", 2, "running")
+
+    _expire(db, job_id)
+    assert claim_next_job(db, "worker-c") is None
+    db.refresh(job)
+    assert job.status == "failed"
@@ -0,0 +1,113 @@
+import asyncio
+import time
+import pytest
+import app.legal_providers as legal_providers
+from app.legal_providers import ProviderCall, fan_out, fan_out_async, merge_results
+from app.provider_cache import ProviderCache
+from app.provider_guard import ProviderGuard
+
+
+class FakeResponse:
+    def __init__(self, data, status_code=200):
+        self.status_code = status_code
+        self._data = data
+        self.text = str(data)
+
+    def json(self):
+        return self._data
+
+
+@pytest.fixture
+def guard(tmp_path, monkeypatch):
+    guard = ProviderGuard({}, default_rate=100.0, burst=10, threshold=1, cooldown=0.05)
+    monkeypatch.setattr(legal_providers, "provider_guard", guard)
+    monkeypatch.setattr(legal_providers, "provider_cache", ProviderCache(str(tmp_path / "cache.db"), 60, {}, 60, 100))
+    return guard
+
+
+def _call(provider, **kwargs):
+    return ProviderCall(provider, f"{provider} cases", f"https://{provider}.example/search", parse=lambda data: data["items"], fallback=lambda: ["mock"], **kwargs)
+
+
+def test_fan_out_returns_at_the_deadline(guard, monkeypatch):
+    def get(url, params=None, timeout=None, budget=None):
+        if "slow" in url:
+            time.sleep(0.5)
+        return FakeResponse({"items": [url]})
+
+    monkeypatch.setattr(legal_providers, "get", get)
+    started = time.perf_counter()
+    items, report = merge_results(fan_out([_call("fast"), _call("slow")], deadline=0.2))
+    assert time.perf_counter() - started < 0.45
+    assert items == ["https://fast.example/search"]
+    assert report["fast cases"]["status"] == "ok"
+    assert report["slow cases"]["status"] == "timeout"
+
+
+def test_cached_response_is_served_without_a_request(guard, monkeypatch):
+    calls = []
+
+    def get(url, params=None, timeout=None, budget=None):
+        calls.append(url)
+        return FakeResponse({"items": ["a"]})
+
+    monkeypatch.setattr(legal_providers, "get", get)
+    assert fan_out([_call("canlii")])[0].status == "ok"
+    assert fan_out([_call("canlii")])[0].status == "cached"
+    assert len(calls) == 1
+
+
+
+def test_unparseable_cache_entry_is_evicted_and_fetched_live(guard, monkeypatch):
+    calls = []
+
+    def get(url, params=None, timeout=None, budget=None):
+        calls.append(url)
+        return FakeResponse({"items": ["a"]})
+
+    monkeypatch.setattr(legal_providers, "get", get)
+    call = _call("canlii")
+    key = legal_providers.provider_cache.key(call.provider, call.url, call.params)
+    legal_providers.provider_cache.put(call.provider, key, {"unexpected": []}, is_json=True)
+
+    result = fan_out([call])[0]
+
+    assert (result.items, result.status) == (["a"], "ok")
+    assert len(calls) == 1
+    assert guard.acquire(call.provider) is None
+    assert fan_out([call])[0].status == "cached"
+
+
+def test_cancelled_half_open_trial_does_not_wedge_the_circuit(guard, monkeypatch):
+    async def get_async(url, params=None, timeout=None, budget=None):
+        await asyncio.sleep(1)
+        return FakeResponse({"items": []})
+
+    monkeypatch.setattr(legal_providers, "get_async", get_async)
+    guard = ProviderGuard({}, default_rate=100.0, burst=10, threshold=1, cooldown=0.3)
+    monkeypatch.setattr(legal_providers, "provider_guard", guard)
+    guard.record("canlii", ok=False)
+    time.sleep(0.31)
+    results = asyncio.run(fan_out_async([_call("canlii")], deadline=0.02))
+    assert results[0].status == "timeout"
+    asyncio.run(asyncio.sleep(0))
+    assert guard.acquire("canlii") is None
+
+
+def test_open_circuit_skips_the_request(guard, monkeypatch):
+    monkeypatch.setattr(legal_providers, "get", lambda *a, **k: pytest.fail("request sent"))
+    guard.record("canlii", ok=False)
+    result = fan_out([_call("canlii")])[0]
+    assert (result.status, result.items) == ("circuit_open", ["mock"])
+
+
+def test_unparseable_response_does_not_close_a_half_open_circuit(guard, monkeypatch):
+    monkeypatch.setattr(legal_providers, "get", lambda url, params=None, timeout=None, budget=None: FakeResponse("<html>error</html>"))
+    guard.record("canlii", ok=False)
+    time.sleep(0.06)
+
+    result = fan_out([_call("canlii")])[0]
+
+    assert (result.status, result.items) == ("fallback", ["mock"])
+    status = guard.status()["canlii"]
+    assert (status["circuit"], status["consecutive_failures"]) == ("open", 2)
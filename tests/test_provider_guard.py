@@ -0,0 +1,38 @@
+import time
+from app.provider_guard import CircuitBreaker, ProviderGuard, TokenBucket
+
+
+def test_token_bucket_allows_burst_then_refills():
+    bucket = TokenBucket(rate=100.0, burst=2)
+    assert bucket.take() and bucket.take()
+    assert not bucket.take()
+    time.sleep(0.02)
+    assert bucket.take()
+
+
+def test_breaker_opens_after_threshold_and_closes_on_trial_success():
+    breaker = CircuitBreaker(threshold=2, cooldown=0.05)
+    breaker.failure()
+    assert breaker.allow()
+    breaker.failure()
+    assert breaker.state == "open" and not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow() and breaker.state == "half_open"
+    assert not breaker.allow()  # one trial at a time
+    breaker.success()
+    assert breaker.state == "closed" and breaker.failures == 0
+
+
+def test_released_or_stuck_trial_lets_the_next_caller_try():
+    guard = ProviderGuard({}, default_rate=100.0, burst=10, threshold=1, cooldown=0.05)
+    guard.record("canlii", ok=False)
+    assert guard.acquire("canlii") == "circuit_open"
+    time.sleep(0.06)
+    assert guard.acquire("canlii") is None  # the half-open trial
+    assert guard.acquire("canlii") == "circuit_open"
+    guard.release("canlii")
+    assert guard.acquire("canlii") is None
+    # A trial that never reports back expires after another cooldown
+    time.sleep(0.06)
+    assert guard.acquire("canlii") is None
+    assert guard.status()["canlii"]["circuit"] == "half_open"
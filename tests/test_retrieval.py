@@ -0,0 +1,45 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import pytest
+from sqlalchemy import text
+from app import retrieval
+
+
+@pytest.fixture
+def one_thread_pool(monkeypatch):
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(retrieval, "_leg_pool", pool)
+    yield pool
+    pool.shutdown(wait=True)
+
+
+def test_leg_budget_starts_when_dequeued(one_thread_pool):
+    one_thread_pool.submit(time.sleep, 0.3)
+
+    leg = retrieval._Leg("lexical", lambda db: time.sleep(0.2) or ["hit"], timeout=0.4)
+
+    assert leg.result() == ["hit"]
+
+
+def test_leg_given_up_in_queue_never_runs(one_thread_pool):
+    ran = []
+    one_thread_pool.submit(time.sleep, 0.3)
+
+    leg = retrieval._Leg("lexical", lambda db: ran.append(True), timeout=0.1)
+    with pytest.raises(FutureTimeoutError):
+        leg.result()
+    one_thread_pool.shutdown(wait=True)
+
+    assert ran == []
+
+
+@pytest.mark.skipif(retrieval._is_postgres(), reason="SQLite progress handler")
+def test_timed_out_leg_query_is_interrupted(one_thread_pool):
+    endless = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT count(*) FROM n"
+    leg = retrieval._Leg("lexical", lambda db: db.execute(text(endless)).all(), timeout=0.2)
+
+    with pytest.raises(FutureTimeoutError):
+        leg.result()
+
+    with pytest.raises(Exception, match="interrupted"):
+        leg.future.result(timeout=2)
@@ -0,0 +1,92 @@
+import pytest
+from app.config import settings
+from app.index_store import IndexStore
+from app.simple_vector_similarity import SimpleVectorSimilarityService
+
+
+def _case(case_id, title, summary="Cheque dishonour under Section 138"):
+    return {"case_id": case_id, "title": title, "summary": summary, "full_text": f"{title} {summary}"}
+
+
+@pytest.fixture(params=["bm25", "tfidf"])
+def service(request, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "SIMILARITY_BACKEND", request.param)
+    # Compaction is run explicitly by the tests, not in a background thread
+    monkeypatch.setattr(settings, "INDEX_COMPACT_MIN_DELETED", 10 ** 9)
+    return SimpleVectorSimilarityService(str(tmp_path))
+
+
+def test_upsert_replaces_changed_entries_and_skips_unchanged(service):
+    assert service._upsert("case", [_case("c1", "A v. B"), _case("c2", "C v. D")]) == {"added": 2, "updated": 0}
+
+    assert service._upsert("case", [_case("c1", "A v. B"), _case("c2", "C v. D")]) == {"added": 0, "updated": 0}
+    assert len(service.case_documents) == 2
+
+    assert service._upsert("case", [_case("c1", "A v. B", "Bail granted"), _case("c3", "E v. F")]) == {"added": 1, "updated": 1}
+    hits = service.find_similar_cases("bail granted", k=5)
+    assert [hit["case_id"] for hit in hits] == ["c1"]
+    assert service.case_documents.deleted == 1
+
+
+def test_delete_hides_entries_from_search(service):
+    service._upsert("case", [_case("c1", "A v. B"), _case("c2", "C v. D")])
+
+    assert service._delete("case", ["c1", "missing"]) == 1
+
+    assert [hit["case_id"] for hit in service.find_similar_cases("cheque dishonour", k=5)] == ["c2"]
+
+
+def test_compaction_renumbers_and_survives_reopen(service, tmp_path):
+    service._upsert("case", [_case(f"c{i}", f"Party {i} v. State") for i in range(6)])
+    service._delete("case", ["c0", "c2"])
+    service._upsert("case", [_case("c4", "Party 4 v. State", "Anticipatory bail")])
+
+    service._compact("case")
+
+    store = service.case_documents
+    assert len(store) == 4 and store.deleted == 0
+    assert service._keys["case"] == {"c1": 0, "c3": 1, "c5": 2, "c4": 3}
+    assert service.find_similar_cases("anticipatory bail", k=1)[0]["case_id"] == "c4"
+
+    reopened = SimpleVectorSimilarityService(str(tmp_path))
+    assert reopened._keys["case"] == service._keys["case"]
+    assert reopened.find_similar_cases("anticipatory bail", k=1)[0]["case_id"] == "c4"
+
+
+def test_index_saved_before_a_rewrite_is_rebuilt(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "SIMILARITY_BACKEND", "tfidf")
+    monkeypatch.setattr(settings, "INDEX_COMPACT_MIN_DELETED", 10 ** 9)
+    service = SimpleVectorSimilarityService(str(tmp_path))
+    service._upsert("case", [_case("c1", "A v. B", "Bail granted"), _case("c2", "C v. D")])
+    service.case_index.save(service.case_documents.generation)
+    service._upsert("case", [_case("c3", "E v. F"), _case("c4", "G v. H")])
+    service._delete("case", ["c1"])
+
+    # A crash between the store rewrite and the index save leaves the old numbering on disk
+    service.case_documents.rewrite([1, 2, 3])
+
+    reopened = SimpleVectorSimilarityService(str(tmp_path))
+    assert reopened.find_similar_cases("bail granted", k=5) == []
+    assert sorted(hit["case_id"] for hit in reopened.find_similar_cases("cheque dishonour", k=5)) == ["c2", "c3", "c4"]
+
+
+def test_reopen_reads_only_entries_after_the_saved_state(service, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "INDEX_SAVE_EVERY", 2)
+    service._upsert("case", [_case("c1", "A v. B"), _case("c2", "C v. D", "Bail granted")])
+    service._upsert("case", [_case("c3", "E v. F")])
+    service._delete("case", ["c1"])
+
+    starts = []
+    entries = IndexStore.entries
+
+    def recording_entries(store, start=0):
+        if store.directory.endswith("case_store"):
+            starts.append(start)
+        return entries(store, start)
+
+    monkeypatch.setattr(IndexStore, "entries", recording_entries)
+    reopened = SimpleVectorSimilarityService(str(tmp_path))
+
+    assert starts == [2, 2]
+    assert reopened._keys["case"] == {"c2": 1, "c3": 2}
+    assert reopened.find_similar_cases("bail granted", k=1)[0]["case_id"] == "c2"
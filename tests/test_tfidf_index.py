@@ -0,0 +1,43 @@
+from app.tfidf_index import TfidfIndex
+
+TEXTS = [
+    "Cheque dishonour under Section 138 of the Negotiable Instruments Act",
+    "Bail conditions for anticipatory bail in criminal matters",
+    "Section 138 complaint dismissed; cheque dishonour not proved",
+]
+
+
+def test_search_returns_cosine_ranked_matches():
+    index = TfidfIndex()
+    index.add_many(TEXTS)
+    hits = index.search("anticipatory bail", k=3)
+    assert hits[0][0] == 1
+    assert 0 < hits[0][1] <= 1.0
+    assert index.search("habeas corpus", k=3) == []
+
+
+def test_batch_matches_single_queries_and_sees_new_documents():
+    index = TfidfIndex()
+    index.add_many(TEXTS)
+    queries = ["cheque dishonour", "criminal bail"]
+    assert index.search_batch(queries, k=2) == [index.search(q, k=2) for q in queries]
+    doc = index.add("Writ of habeas corpus")
+    assert index.search("habeas corpus", k=1)[0][0] == doc
+
+
+def test_saved_index_reloads(tmp_path):
+    index = TfidfIndex(str(tmp_path / "case_tfidf"))
+    index.add_many(TEXTS)
+    index.save()
+    reloaded = TfidfIndex(str(tmp_path / "case_tfidf"))
+    assert reloaded.load(len(TEXTS)) == len(TEXTS)
+    assert TfidfIndex(str(tmp_path / "case_tfidf")).load(len(TEXTS) - 1) == 0
+    assert reloaded.search("section 138", k=3) == index.search("section 138", k=3)
+
+
+def test_saved_index_of_another_store_generation_is_not_loaded(tmp_path):
+    index = TfidfIndex(str(tmp_path / "case_tfidf"))
+    index.add_many(TEXTS)
+    index.save(generation=3)
+    assert TfidfIndex(str(tmp_path / "case_tfidf")).load(len(TEXTS), generation=3) == len(TEXTS)
+    assert TfidfIndex(str(tmp_path / "case_tfidf")).load(len(TEXTS), generation=4) == 0
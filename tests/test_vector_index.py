@@ -0,0 +1,17 @@
+import pytest
+from app.config import settings
+from app.vector_index import validate_embedding_settings
+
+
+def test_embed_dim_must_fit_the_ann_index(monkeypatch):
+    monkeypatch.setattr(settings, "VECTOR_INDEX_TYPE", "hnsw")
+    monkeypatch.setattr(settings, "VECTOR_INDEX_QUANTIZATION", "none")
+    monkeypatch.setattr(settings, "EMBED_DIM", 3072)
+    monkeypatch.setattr(settings, "EMBED_STORAGE", "vector")
+    with pytest.raises(ValueError):
+        validate_embedding_settings()
+    monkeypatch.setattr(settings, "EMBED_STORAGE", "halfvec")
+    validate_embedding_settings()
+    monkeypatch.setattr(settings, "VECTOR_INDEX_TYPE", "none")
+    monkeypatch.setattr(settings, "EMBED_STORAGE", "vector")
+    validate_embedding_settings()
@@ -0,0 +1,113 @@
+import hashlib
+import threading
+import time
+import numpy as np
+import pytest
+
+pytest.importorskip("sentence_transformers")
+faiss = pytest.importorskip("faiss")
+
+from app.config import settings
+from app.vector_similarity import VectorSimilarityService
+
+
+class HashEncoder:
+    """Deterministic stand-in for the sentence-transformers model"""
+
+    def encode(self, texts, convert_to_tensor=False):
+        return np.stack([
+            np.random.default_rng(int(hashlib.md5(t.encode()).hexdigest()[:8], 16)).standard_normal(384)
+            for t in texts
+        ]).astype("float32")
+
+
+@pytest.fixture
+def service(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("app.vector_similarity.SentenceTransformer", lambda name: HashEncoder())
+    return VectorSimilarityService()
+
+
+def _wait_for_rebuilds(service):
+    deadline = time.time() + 30
+    while service._rebuilding and time.time() < deadline:
+        time.sleep(0.01)
+    assert not service._rebuilding
+
+
+def _entry(key):
+    return {"id": key, "title": f"Document {key}", "content": "text", "filename": f"{key}.pdf"}
+
+
+def _query(key):
+    # The stand-in encoder only matches identical texts
+    return VectorSimilarityService._embedding_text("document", _entry(key))
+
+
+def _add(service, keys):
+    entries = [_entry(key) for key in keys]
+    embeddings = service._embed([service._embedding_text("document", e) for e in entries])
+    return service._upsert("document", list(keys), embeddings, entries)
+
+
+def test_rebuild_runs_in_background_and_keeps_concurrent_updates(service, monkeypatch):
+    monkeypatch.setattr(settings, "FAISS_INDEX_TYPE", "flat")
+    _add(service, [f"d{i}" for i in range(20)])
+    monkeypatch.setattr(settings, "FAISS_INDEX_TYPE", "hnsw")
+
+    release = threading.Event()
+    build_index = service._build_index
+
+    def slow_build(vectors, ids):
+        release.wait(10)
+        return build_index(vectors, ids)
+
+    monkeypatch.setattr(service, "_build_index", slow_build)
+    started = time.perf_counter()
+    _add(service, ["d20"])  # triggers the rebuild, which now waits in the background
+    assert time.perf_counter() - started < 5
+
+    # Updates and searches are not blocked by the rebuild
+    _add(service, ["d21"])
+    service._delete("document", ["d0"])
+    assert service.find_similar_documents(_query("d21"), k=1)[0]["filename"] == "d21.pdf"
+
+    release.set()
+    _wait_for_rebuilds(service)
+
+    assert isinstance(faiss.downcast_index(service.document_index.index), faiss.IndexHNSW)
+    assert service.find_similar_documents(_query("d21"), k=1)[0]["filename"] == "d21.pdf"
+    assert "d0.pdf" not in [hit["filename"] for hit in service.find_similar_documents(_query("d0"), k=25)]
+
+
+def test_ivfpq_is_retrained_once_it_outgrows_nlist(service, monkeypatch):
+    for name, value in {"FAISS_INDEX_TYPE": "ivfpq", "FAISS_TRAIN_MIN": 200, "FAISS_IVF_NLIST": 64,
+                        "FAISS_PQ_M": 8, "FAISS_PQ_BITS": 4, "FAISS_IVF_RETRAIN_GROWTH": 2.0}.items():
+        monkeypatch.setattr(settings, name, value)
+    _add(service, [f"d{i}" for i in range(200)])
+    _wait_for_rebuilds(service)
+    assert faiss.downcast_index(service.document_index.index).nlist == 200 // 39
+
+    _add(service, [f"d{i}" for i in range(200, 400)])
+    _wait_for_rebuilds(service)
+
+    inner = faiss.downcast_index(service.document_index.index)
+    assert inner.nlist == 400 // 39
+    assert service.document_index.ntotal == 400
+
+
+def test_removals_from_trained_ivfpq_keep_result_labels(service, monkeypatch):
+    for name, value in {"FAISS_INDEX_TYPE": "ivfpq", "FAISS_TRAIN_MIN": 400, "FAISS_IVF_NLIST": 16,
+                        "FAISS_PQ_M": 8, "FAISS_PQ_BITS": 8, "FAISS_NPROBE": 16}.items():
+        monkeypatch.setattr(settings, name, value)
+    _add(service, [f"d{i}" for i in range(1000)])
+    _wait_for_rebuilds(service)
+    assert isinstance(faiss.downcast_index(service.document_index.index), faiss.IndexIVFPQ)
+
+    assert service.delete_documents(["d3"]) == 1
+    assert service.delete_documents(["d7"]) == 1
+    _add(service, ["d10"])  # replaces an entry
+
+    for key in ["d100", "d500", "d10"]:
+        assert service.find_similar_documents(_query(key), k=1)[0]["filename"] == f"{key}.pdf"
+    assert {"d3.pdf", "d7.pdf"}.isdisjoint(hit["filename"] for hit in service.find_similar_documents(_query("d3"), k=20))